@@ -52,6 +52,18 @@ class CacheManager:
         
         return ":".join(key_parts)
     
+    def build_key(self, *parts: Any) -> str:
+        """
+        构建带前缀的缓存键，供调用方自行管理缓存时使用
+        
+        Args:
+            *parts: 用于构建键的部分
+            
+        Returns:
+            str: 格式化的缓存键
+        """
+        return self._build_key(*parts)
+    
     def get(self, key: str, default: Any = None) -> Any:
         """
         获取缓存值
@@ -37,6 +37,8 @@ TTL_CONFIG = {
     "dataset_list": 300,  # 5分钟
     "data_table": 1800,  # 30分钟
     "data_preview": 600,  # 10分钟
+    "data_sample": 3600,  # 1小时，键中包含数据块校验和，数据变化后自然失效
+    "pipeline_result": 3600 * 24,  # 24小时，键中包含管道定义哈希和输入校验和
     
     # 匹配相关
     "match_rules": 3600 * 8,  # 8小时
@@ -75,5 +75,6 @@ CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_user_settings_user_id ON user_settings(user_id);
 CREATE INDEX IF NOT EXISTS idx_datasets_owner_id ON datasets(owner_id);
 CREATE INDEX IF NOT EXISTS idx_datasets_name ON datasets(name);
+CREATE INDEX IF NOT EXISTS idx_datasets_updated_at ON datasets(updated_at DESC, dataset_id DESC);
 CREATE INDEX IF NOT EXISTS idx_matching_tasks_status ON matching_tasks(status);
 CREATE INDEX IF NOT EXISTS idx_matching_tasks_created_by ON matching_tasks(created_by);
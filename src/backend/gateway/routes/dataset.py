@@ -8,6 +8,7 @@ from ..auth.models import User
 from ..database import get_db
 from ...services.data.models import Dataset, DatasetVersion, PermissionLevel, DatasetPermission
 from ...services.data.service import DatasetService
+from ...services.data.pagination import InvalidCursorError
 
 router = APIRouter()
 
@@ -23,16 +24,34 @@ async def create_dataset(
 
 @router.get("/datasets/", response_model=List[Dataset])
 async def list_datasets(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="上一页响应头X-Next-Cursor中的游标"),
     search: Optional[str] = None,
     tags: Optional[List[str]] = None,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """获取数据集列表"""
+    """获取数据集列表
+    
+    不指定skip时使用游标分页，下一页的游标在响应头X-Next-Cursor中返回；
+    指定skip时按偏移分页。
+    """
     service = DatasetService(db)
-    return service.list_datasets(current_user.id, skip, limit, search, tags)
+    if skip:
+        if cursor:
+            raise HTTPException(status_code=400, detail="skip和cursor不能同时使用")
+        return service.list_datasets(current_user.id, skip, limit, search, tags)
+    try:
+        datasets, next_cursor = service.list_datasets_page(
+            current_user.id, limit, cursor, search, tags
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return datasets
 
 @router.get("/datasets/{dataset_id}", response_model=Dataset)
 async def get_dataset(
@@ -1,24 +1,57 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
 from sqlalchemy.orm import Session
 import pandas as pd
 
 from ...core.database import get_db
 from ...core.auth import get_current_user
 from ...services.data.pipeline import PipelineService
-from ...services.data.storage import DataPipeline, DataValidationRule, DataTransform
+from ...services.data.scheduler import PipelineScheduler, start_scheduler, stop_scheduler
+from ...services.data.storage import DataPipeline, PipelineRun
+from ...services.data.storage import save_upload, UploadTooLargeError
+from ...services.data.models import DataTable
+from ...services.data.import_service import iter_file_chunks
+from ...services.data.csv_reader import CsvEngineError
+from ...services.data.config import DEFAULT_BLOCK_ROWS, SCHEDULER_CONFIG
 
 router = APIRouter()
 
+@router.on_event("startup")
+async def start_pipeline_scheduler():
+    """启动定时调度线程，多个副本中只有取得领导锁的一个实际调度"""
+    if SCHEDULER_CONFIG["enabled"]:
+        start_scheduler()
+
+@router.on_event("shutdown")
+async def stop_pipeline_scheduler():
+    """停止定时调度线程并释放领导锁"""
+    stop_scheduler()
+
 @router.post("/pipelines/", response_model=DataPipeline)
 async def create_pipeline(
     pipeline: DataPipeline,
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """创建数据处理管道"""
+    """创建数据处理管道，schedule中可配置cron或interval定时执行"""
+    pipeline_service = PipelineService(db)
+    try:
+        return pipeline_service.create_pipeline(pipeline, current_user.id)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/pipelines/functions")
+async def list_pipeline_functions(
+    kind: Optional[str] = Query(None, description="函数类型：validator或transform"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """可在自定义验证和转换步骤中按名称引用的注册函数"""
     pipeline_service = PipelineService(db)
-    return pipeline_service.create_pipeline(pipeline, current_user.id)
+    return pipeline_service.list_functions(kind)
 
 @router.get("/pipelines/{pipeline_id}", response_model=DataPipeline)
 async def get_pipeline(
@@ -30,6 +63,21 @@ async def get_pipeline(
     pipeline_service = PipelineService(db)
     return pipeline_service.get_pipeline(pipeline_id, current_user.id)
 
+@router.get("/pipelines/{pipeline_id}/profile")
+async def get_pipeline_profile(
+    pipeline_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """管道各步骤的执行方式，逐值执行的自定义函数带有性能警告"""
+    pipeline_service = PipelineService(db)
+    try:
+        return pipeline_service.get_step_profile(pipeline_id, current_user.id)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/pipelines/{pipeline_id}", response_model=DataPipeline)
 async def update_pipeline(
     pipeline_id: int,
@@ -39,7 +87,12 @@ async def update_pipeline(
 ):
     """更新数据处理管道"""
     pipeline_service = PipelineService(db)
-    return pipeline_service.update_pipeline(pipeline_id, pipeline, current_user.id)
+    try:
+        return pipeline_service.update_pipeline(pipeline_id, pipeline, current_user.id)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/pipelines/{pipeline_id}")
 async def delete_pipeline(
@@ -59,21 +112,193 @@ async def execute_pipeline(
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
-    """执行数据处理管道"""
+    """执行数据处理管道，相同管道在相同文件上的结果直接从缓存返回"""
     pipeline_service = PipelineService(db)
     
-    # 读取上传的文件
+    # 按扩展名选择读取方式
     if file.filename.endswith('.csv'):
-        data = pd.read_csv(file.file)
+        reader = pd.read_csv
     elif file.filename.endswith('.xlsx'):
-        data = pd.read_excel(file.file)
+        reader = pd.read_excel
     elif file.filename.endswith('.json'):
-        data = pd.read_json(file.file)
+        reader = pd.read_json
     else:
         raise HTTPException(status_code=400, detail="不支持的文件格式")
-        
-    # 执行数据处理管道
-    result = pipeline_service.execute_pipeline(pipeline_id, data, current_user.id)
     
-    # 将结果转换为JSON格式
-    return result.to_dict(orient='records') 
\ No newline at end of file
+    try:
+        file_path, _, checksum = await save_upload(file)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        # 执行数据处理管道，结果已为JSON记录
+        return pipeline_service.execute_upload(
+            pipeline_id, current_user.id, lambda: reader(file_path),
+            f"{reader.__name__}:{checksum}"
+        )
+    finally:
+        os.remove(file_path)
+
+@router.get("/pipelines/cache/stats")
+async def get_pipeline_cache_stats(
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """管道结果缓存的条目数和命中率"""
+    pipeline_service = PipelineService(db)
+    return pipeline_service.get_cache_stats()
+
+@router.post("/pipelines/{pipeline_id}/run", response_model=DataTable)
+async def run_pipeline_on_table(
+    pipeline_id: int,
+    table_name: str = Query(..., description="结果表名"),
+    source_table_id: Optional[int] = Query(None, description="输入数据表ID，默认为管道所属的数据表"),
+    description: Optional[str] = Query(None, description="结果表描述"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """按数据块流式执行管道，结果写入新的数据表"""
+    pipeline_service = PipelineService(db)
+    try:
+        return pipeline_service.execute_pipeline_on_table(
+            pipeline_id, current_user.id, table_name, source_table_id, description
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/pipelines/{pipeline_id}/refresh", response_model=DataTable)
+async def refresh_pipeline_result(
+    pipeline_id: int,
+    result_table_id: int = Query(..., description="该管道在数据表上执行得到的结果表ID"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """增量更新结果表，只处理输入表中新增或变化的数据块"""
+    pipeline_service = PipelineService(db)
+    try:
+        return pipeline_service.refresh_pipeline_result(
+            pipeline_id, current_user.id, result_table_id
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/pipelines/{pipeline_id}/runs", response_model=List[PipelineRun])
+async def list_pipeline_runs(
+    pipeline_id: int,
+    limit: int = Query(50, ge=1, le=500, description="返回的记录数"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """管道的执行记录（状态、耗时、处理的数据块数），按提交时间倒序"""
+    scheduler = PipelineScheduler(db)
+    try:
+        return scheduler.list_runs(pipeline_id, current_user.id, limit)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/pipelines/{pipeline_id}/runs", response_model=PipelineRun)
+async def submit_pipeline_run(
+    pipeline_id: int,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """提交一次后台执行，在管道队列的工作进程中增量更新结果表"""
+    scheduler = PipelineScheduler(db)
+    try:
+        return scheduler.submit(pipeline_id, current_user.id)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/pipelines/{pipeline_id}/run/{file_format}", response_model=DataTable)
+async def run_pipeline_on_upload(
+    pipeline_id: int,
+    file_format: str,
+    table_name: str = Query(..., description="结果表名"),
+    description: Optional[str] = Query(None, description="结果表描述"),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """对上传的文件分块流式执行管道，结果写入新的数据表"""
+    pipeline_service = PipelineService(db)
+    try:
+        file_path, _, _ = await save_upload(file)
+        try:
+            def source(engine: Optional[str] = None):
+                return lambda: iter_file_chunks(file_path, file_format, DEFAULT_BLOCK_ROWS, engine)
+            try:
+                return pipeline_service.execute_pipeline_on_chunks(
+                    pipeline_id, source(), current_user.id, table_name, description
+                )
+            except CsvEngineError:
+                # Arrow解析失败时已写入的数据块已被清理，改用pandas重新执行
+                return pipeline_service.execute_pipeline_on_chunks(
+                    pipeline_id, source("pandas"), current_user.id, table_name, description
+                )
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/pipelines/{pipeline_id}/validate")
+async def validate_table(
+    pipeline_id: int,
+    source_table_id: Optional[int] = Query(None, description="输入数据表ID，默认为管道所属的数据表"),
+    quarantine_table: Optional[str] = Query(None, description="隔离表名，指定时写入验证失败的行"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """一次执行所有验证规则，返回每条规则的失败行数和失败行样本"""
+    pipeline_service = PipelineService(db)
+    try:
+        return pipeline_service.validate_table(
+            pipeline_id, current_user.id, source_table_id, quarantine_table
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/pipelines/{pipeline_id}/validate/{file_format}")
+async def validate_upload(
+    pipeline_id: int,
+    file_format: str,
+    quarantine_table: Optional[str] = Query(None, description="隔离表名，指定时写入验证失败的行"),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """对上传的文件执行所有验证规则，返回验证报告"""
+    pipeline_service = PipelineService(db)
+    try:
+        file_path, _, _ = await save_upload(file)
+        try:
+            def source(engine: Optional[str] = None):
+                return lambda: iter_file_chunks(file_path, file_format, DEFAULT_BLOCK_ROWS, engine)
+            try:
+                return pipeline_service.validate_chunks(
+                    pipeline_id, source(), current_user.id, quarantine_table
+                )
+            except CsvEngineError:
+                return pipeline_service.validate_chunks(
+                    pipeline_id, source("pandas"), current_user.id, quarantine_table
+                )
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,21 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Response
+import os
+import json
+import asyncio
+from urllib.parse import quote
+import pandas as pd
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from ...services.data.models import DataTable, TablePreview, TableExport
+from ...services.data.models import DataTable, TablePreview, TableExport, TableQuery
 from ...services.data.table import DataTableService
-from ...services.data.import_service import DataTableImportService
+from ...services.data.import_service import DataTableImportService, iter_file_chunks
+from ...services.data.csv_reader import CsvEngineError
+from ...services.data.storage import save_upload, UploadTooLargeError
+from ...services.data.filters import FilterSyntaxError
+from ...services.data.jobs import ImportJobService
+from ...services.data.config import IMPORT_JOB_CONFIG, DEFAULT_BLOCK_ROWS
 from ...core.database import get_db
 from ...core.auth import get_current_user
 
@@ -29,17 +40,34 @@ async def create_table(
 @router.get("/datasets/{dataset_id}/tables/", response_model=List[DataTable])
 async def list_tables(
     dataset_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="上一页响应头X-Next-Cursor中的游标"),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """列出数据集下的所有数据表"""
+    """列出数据集下的所有数据表
+    
+    不指定skip时使用游标分页，下一页的游标在响应头X-Next-Cursor中返回；
+    指定skip时按偏移分页。
+    """
     try:
         table_service = DataTableService(db)
-        return table_service.list_tables(dataset_id, current_user["id"], skip, limit)
+        if skip:
+            if cursor:
+                raise ValueError("skip和cursor不能同时使用")
+            return table_service.list_tables(dataset_id, current_user["id"], skip, limit)
+        tables, next_cursor = table_service.list_tables_page(
+            dataset_id, current_user["id"], limit, cursor
+        )
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return tables
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/tables/{table_id}/", response_model=DataTable)
 async def get_table(
@@ -102,22 +130,25 @@ async def import_csv(
     """从CSV文件导入数据表"""
     try:
         import_service = DataTableImportService(db)
-        # 保存上传的文件
-        file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # 流式保存上传的文件
+        file_path, _, content_hash = await save_upload(file)
         
-        # 导入数据表
-        return import_service.import_from_csv(
-            file_path,
-            dataset_id,
-            table_name or file.filename,
-            current_user["id"],
-            description,
-            is_public,
-            tags
-        )
+        # 导入数据表，导入完成后删除临时文件
+        try:
+            return import_service.import_from_csv(
+                file_path,
+                dataset_id,
+                table_name or file.filename,
+                current_user["id"],
+                description,
+                is_public,
+                tags,
+                content_hash=content_hash
+            )
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
@@ -138,23 +169,26 @@ async def import_excel(
     """从Excel文件导入数据表"""
     try:
         import_service = DataTableImportService(db)
-        # 保存上传的文件
-        file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # 流式保存上传的文件
+        file_path, _, content_hash = await save_upload(file)
         
-        # 导入数据表
-        return import_service.import_from_excel(
-            file_path,
-            dataset_id,
-            table_name or file.filename,
-            current_user["id"],
-            sheet_name,
-            description,
-            is_public,
-            tags
-        )
+        # 导入数据表，导入完成后删除临时文件
+        try:
+            return import_service.import_from_excel(
+                file_path,
+                dataset_id,
+                table_name or file.filename,
+                current_user["id"],
+                sheet_name,
+                description,
+                is_public,
+                tags,
+                content_hash=content_hash
+            )
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
@@ -174,40 +208,312 @@ async def import_json(
     """从JSON文件导入数据表"""
     try:
         import_service = DataTableImportService(db)
-        # 保存上传的文件
-        file_path = f"uploads/{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
+        # 流式保存上传的文件
+        file_path, _, content_hash = await save_upload(file)
         
-        # 导入数据表
-        return import_service.import_from_json(
-            file_path,
-            dataset_id,
-            table_name or file.filename,
-            current_user["id"],
-            description,
-            is_public,
-            tags
-        )
+        # 导入数据表，导入完成后删除临时文件
+        try:
+            return import_service.import_from_json(
+                file_path,
+                dataset_id,
+                table_name or file.filename,
+                current_user["id"],
+                description,
+                is_public,
+                tags,
+                content_hash=content_hash
+            )
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/datasets/{dataset_id}/tables/import/{file_format}/jobs/")
+async def submit_import_job(
+    dataset_id: int,
+    file_format: str,
+    file: UploadFile = File(...),
+    table_name: str = None,
+    sheet_name: Optional[str] = None,
+    description: Optional[str] = None,
+    is_public: bool = False,
+    tags: List[str] = None,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """提交后台导入任务，立即返回任务ID"""
+    try:
+        job_service = ImportJobService(db)
+        # 流式保存上传的文件
+        file_path, _, content_hash = await save_upload(file)
+        
+        options = {"description": description, "is_public": is_public, "tags": tags}
+        if file_format == "excel":
+            options["sheet_name"] = sheet_name
+        
+        options["content_hash"] = content_hash
+        
+        try:
+            job_id = job_service.submit_import(
+                file_format,
+                file_path,
+                dataset_id,
+                table_name or file.filename,
+                current_user["id"],
+                options
+            )
+        except Exception:
+            # 任务未提交成功时由接口负责清理临时文件
+            os.remove(file_path)
+            raise
+        return {"job_id": job_id}
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/imports/jobs/{job_id}/")
+async def get_import_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """查询后台导入任务的状态和进度"""
+    try:
+        job_service = ImportJobService(db)
+        return job_service.get_status(job_id, current_user["id"])
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/imports/jobs/{job_id}/events/")
+async def stream_import_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """以服务端事件(SSE)推送后台导入任务进度，任务结束后关闭连接"""
+    try:
+        job_service = ImportJobService(db)
+        status = job_service.get_status(job_id, current_user["id"])
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    async def event_stream():
+        current = status
+        while True:
+            yield f"data: {json.dumps(current)}\n\n"
+            if current["status"] in ("success", "failure", "revoked"):
+                break
+            await asyncio.sleep(IMPORT_JOB_CONFIG["poll_interval"])
+            current = job_service.get_status(job_id, current_user["id"])
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+@router.delete("/imports/jobs/{job_id}/")
+async def cancel_import_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """取消后台导入任务"""
+    try:
+        job_service = ImportJobService(db)
+        job_service.cancel(job_id, current_user["id"])
+        return {"message": "导入任务已取消"}
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.post("/tables/{table_id}/append/{file_format}/", response_model=DataTable)
+async def append_table_rows(
+    table_id: int,
+    file_format: str,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """从上传的文件向数据表追加行"""
+    try:
+        table_service = DataTableService(db)
+        file_path, _, _ = await save_upload(file)
+        try:
+            chunks = iter_file_chunks(file_path, file_format, DEFAULT_BLOCK_ROWS)
+            try:
+                return table_service.append_rows(table_id, chunks, current_user["id"])
+            except CsvEngineError:
+                # Arrow解析失败时已写入的数据块已被清理，改用pandas重新追加
+                chunks = iter_file_chunks(file_path, file_format, DEFAULT_BLOCK_ROWS, "pandas")
+                return table_service.append_rows(table_id, chunks, current_user["id"])
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/tables/{table_id}/upsert/{file_format}/")
+async def upsert_table_rows(
+    table_id: int,
+    file_format: str,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """从上传的文件按主键更新插入数据表的行"""
+    try:
+        table_service = DataTableService(db)
+        file_path, _, _ = await save_upload(file)
+        try:
+            data = pd.concat(
+                iter_file_chunks(file_path, file_format, DEFAULT_BLOCK_ROWS, "pandas"),
+                ignore_index=True
+            )
+            return table_service.upsert_rows(table_id, data, current_user["id"])
+        finally:
+            os.remove(file_path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.post("/tables/{table_id}/indexes/")
+async def create_table_index(
+    table_id: int,
+    column: str = Query(..., description="索引列"),
+    kind: str = Query("hash", description="索引类型：hash（等值查找）或sorted（等值和范围查找）"),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """为数据表的列建立二级索引"""
+    try:
+        table_service = DataTableService(db)
+        return table_service.create_index(table_id, column, kind, current_user["id"])
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/tables/{table_id}/indexes/{column}/")
+async def drop_table_index(
+    table_id: int,
+    column: str,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """删除数据表列上的二级索引"""
+    try:
+        table_service = DataTableService(db)
+        table_service.drop_index(table_id, column, current_user["id"])
+        return {"message": "索引已删除"}
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@router.get("/tables/{table_id}/lookup/")
+async def lookup_table_rows(
+    table_id: int,
+    column: str = Query(..., description="已建立索引的列"),
+    value: Optional[List[str]] = Query(None, description="等值查找的值，可指定多个"),
+    low: Optional[str] = Query(None, description="范围下界（含），需要有序索引"),
+    high: Optional[str] = Query(None, description="范围上界（含），需要有序索引"),
+    columns: Optional[List[str]] = Query(None),
+    limit: Optional[int] = Query(None, ge=1),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """通过二级索引查找数据表的行"""
+    try:
+        table_service = DataTableService(db)
+        return table_service.lookup_rows(
+            table_id, column, current_user["id"], value, low, high, columns, limit
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/tables/{table_id}/rows/")
+async def get_table_rows(
+    table_id: int,
+    response: Response,
+    limit: int = Query(100, ge=1, le=10000),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor"),
+    start_row: Optional[int] = Query(None, ge=0, description="起始行号，与cursor二选一"),
+    columns: Optional[List[str]] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """按行分页读取数据表，下一页的游标同时在响应头X-Next-Cursor中返回"""
+    try:
+        table_service = DataTableService(db)
+        page = table_service.get_table_rows(
+            table_id, current_user["id"], limit, cursor, start_row, columns
+        )
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return page
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/tables/{table_id}/sample/")
+async def sample_table(
+    table_id: int,
+    n: Optional[int] = Query(None, ge=1, description="样本行数，分层抽样时为每层的行数"),
+    fraction: Optional[float] = Query(None, gt=0, le=1, description="抽样比例，与n二选一"),
+    seed: int = Query(0, description="随机种子，相同种子得到相同样本"),
+    stratify_by: Optional[str] = Query(None, description="分层列"),
+    columns: Optional[List[str]] = Query(None),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """抽取数据表的随机样本"""
+    try:
+        table_service = DataTableService(db)
+        return table_service.sample_table(
+            table_id, current_user["id"], n, fraction, seed, stratify_by, columns
+        )
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/tables/{table_id}/preview/", response_model=TablePreview)
 async def preview_table(
     table_id: int,
-    limit: int = 10,
+    limit: int = Query(10, ge=1, le=1000),
+    columns: Optional[List[str]] = Query(None),
+    where: Optional[str] = Query(None, description="过滤表达式，如 gdp > 1000 AND region = '华东'"),
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """预览数据表数据"""
     try:
         table_service = DataTableService(db)
-        return table_service.get_table_preview(table_id, current_user["id"], limit)
+        return table_service.get_table_preview(
+            table_id, current_user["id"], limit, columns, where
+        )
     except PermissionError as e:
         raise HTTPException(status_code=403, detail=str(e))
+    except FilterSyntaxError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -221,21 +527,19 @@ async def export_table(
     """导出数据表"""
     try:
         table_service = DataTableService(db)
-        file_path = table_service.export_table(
+        export_stream = table_service.export_table(
             table_id,
             export_config.dict(),
             current_user["id"]
         )
         
-        # 读取文件并返回
-        with open(file_path, "rb") as f:
-            content = f.read()
-            
-        return Response(
-            content=content,
-            media_type="application/octet-stream",
+        # 以分块响应返回，不在内存中生成完整文件
+        return StreamingResponse(
+            export_stream.chunks,
+            media_type=export_stream.media_type,
             headers={
-                "Content-Disposition": f"attachment; filename={file_path.split('/')[-1]}"
+                "Content-Disposition":
+                    f"attachment; filename*=UTF-8''{quote(export_stream.filename)}"
             }
         )
     except PermissionError as e:
@@ -243,4 +547,36 @@ async def export_table(
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e)) 
\ No newline at end of file
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/tables/{table_id}/query/")
+async def query_table(
+    table_id: int,
+    query: TableQuery,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """对数据表执行即席查询，结果以JSON Lines流式返回，每行一个对象"""
+    try:
+        table_service = DataTableService(db)
+        result = table_service.query_table(table_id, query, current_user["id"])
+        # 返回响应前先取出第一行，使查询和首个数据块中的错误仍以错误状态码返回
+        rows = iter(result.rows)
+        first = next(rows, None)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    def iter_lines():
+        if first is None:
+            return
+        yield json.dumps(first, ensure_ascii=False) + "\n"
+        try:
+            for row in rows:
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # 响应头已发送，以最后一行错误信息告知客户端结果不完整
+            yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(iter_lines(), media_type="application/x-ndjson")
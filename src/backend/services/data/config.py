@@ -0,0 +1,134 @@
+"""
+数据服务配置模块
+
+定义数据存储、导入等数据服务使用的常量和默认配置。
+"""
+
+import os
+
+# 数据块存储根目录
+DATA_STORAGE_PATH = os.environ.get("DATA_STORAGE_PATH", "data/storage")
+
+# 导入时每个数据块包含的行数
+DEFAULT_BLOCK_ROWS = int(os.environ.get("DATA_BLOCK_ROWS", 100000))
+
+# 计算文件内容哈希时每次读取的字节数
+HASH_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+# Celery消息代理与结果存储
+CELERY_BROKER_URL = os.environ.get(
+    "CELERY_BROKER_URL", os.environ.get("REDIS_URL", "redis://redis:6379/0")
+)
+CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+
+# 后台导入任务配置
+IMPORT_JOB_CONFIG = {
+    # 任务附加信息（所有者、取消标记）的保留时间（秒）
+    "ttl": 3600 * 24,
+    # 服务端事件推送进度的间隔（秒）
+    "poll_interval": 1.0,
+}
+
+# 上传文件配置
+UPLOAD_CONFIG = {
+    # 上传文件的临时存放目录
+    "dir": os.environ.get("UPLOAD_DIR", "uploads"),
+    # 单个上传文件的最大字节数
+    "max_size": int(os.environ.get("MAX_UPLOAD_SIZE", 2 * 1024 * 1024 * 1024)),  # 2GB
+    # 每次从请求中读取的字节数
+    "chunk_size": 1024 * 1024,  # 1MB
+}
+
+# CSV解析配置
+CSV_CONFIG = {
+    # 解析引擎：auto（优先使用Arrow，不可用时回退到pandas）、arrow、pandas
+    "engine": os.environ.get("CSV_ENGINE", "auto"),
+    # 检测文件编码时读取的样本字节数
+    "encoding_sample_size": 64 * 1024,  # 64KB
+    # Arrow每次解析的字节数，越大类型推断越稳定
+    "arrow_block_size": 16 * 1024 * 1024,  # 16MB
+}
+
+# 数据块写入Parquet时每个行组的行数，预览和分页只需读取命中的行组
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get("PARQUET_ROW_GROUP_SIZE", 10000))
+
+# 外部排序配置
+EXTERNAL_SORT_CONFIG = {
+    # 排序可使用的内存上限（字节），由所有并行排序进程共享
+    "memory_budget": int(os.environ.get("EXTERNAL_SORT_MEMORY_MB", 512)) * 1024 * 1024,
+    # 并行生成有序段的进程数
+    "max_workers": int(os.environ.get("EXTERNAL_SORT_WORKERS", os.cpu_count() or 1)),
+    # 有序段临时文件目录
+    "temp_dir": os.environ.get("EXTERNAL_SORT_TEMP_DIR") or None,
+    # 归并时每个有序段每次读取的行数
+    "merge_batch_rows": 10000,
+}
+
+# 数据表查询配置
+QUERY_CONFIG = {
+    # 并行扫描数据块的线程数
+    "max_workers": int(os.environ.get("QUERY_WORKERS", os.cpu_count() or 1)),
+    # 聚合查询最多返回的分组数
+    "max_groups": int(os.environ.get("QUERY_MAX_GROUPS", 1000000)),
+}
+
+# 二级索引配置
+INDEX_CONFIG = {
+    # 索引文件存放目录
+    "dir": os.environ.get("TABLE_INDEX_DIR", os.path.join(DATA_STORAGE_PATH, "indexes")),
+    # 进程内缓存的已加载索引个数
+    "cache_size": int(os.environ.get("TABLE_INDEX_CACHE_SIZE", 32)),
+}
+
+# 数据表抽样配置
+SAMPLE_CONFIG = {
+    # 单次抽样最多返回的行数
+    "max_rows": int(os.environ.get("SAMPLE_MAX_ROWS", 100000)),
+}
+
+# 数据处理管道配置
+PIPELINE_CONFIG = {
+    # 进程内缓存的已编译执行计划个数
+    "plan_cache_size": int(os.environ.get("PIPELINE_PLAN_CACHE_SIZE", 128)),
+    # 分块执行时估计分箱分位点的KLL草图精度，k=200时秩误差约1.65%，误差与k近似成反比
+    "quantile_sketch_k": int(os.environ.get("PIPELINE_QUANTILE_SKETCH_K", 200)),
+    # 按数据块并行执行管道的工作进程数，为1时在当前进程中执行。默认不启用：
+    # 网关和Celery工作进程中都有其他线程，只在专用的执行进程中按CPU数调大
+    "workers": int(os.environ.get("PIPELINE_WORKERS", 1)),
+    # 验证报告中每条规则保留的失败行样本数
+    "validation_sample_size": int(os.environ.get("PIPELINE_VALIDATION_SAMPLES", 20)),
+    # 结果缓存最多保留的条目数，超出时淘汰最早写入的条目
+    "result_cache_entries": int(os.environ.get("PIPELINE_RESULT_CACHE_ENTRIES", 1000)),
+    # 单个缓存结果的最大字节数，更大的结果不缓存
+    "result_cache_max_bytes": int(os.environ.get("PIPELINE_RESULT_CACHE_MAX_MB", 8)) * 1024 * 1024,
+    # 并发执行管道中相互独立的步骤的线程数，为1时按顺序执行
+    "branch_workers": int(os.environ.get("PIPELINE_BRANCH_WORKERS", 4)),
+    # 进程内缓存的已编译正则表达式个数
+    "pattern_cache_size": int(os.environ.get("PIPELINE_PATTERN_CACHE_SIZE", 256)),
+}
+
+# 管道定时调度配置
+SCHEDULER_CONFIG = {
+    # 是否在本进程中启动调度器，多个副本中只有持有领导锁的一个实际调度
+    "enabled": os.environ.get("PIPELINE_SCHEDULER_ENABLED", "true").lower() == "true",
+    # 检查到期管道的间隔（秒）
+    "tick_interval": int(os.environ.get("PIPELINE_SCHEDULER_INTERVAL", 30)),
+    # 领导锁的有效期（秒），领导者每次检查时续期，失联超过该时间后由其他副本接替
+    "lock_ttl": int(os.environ.get("PIPELINE_SCHEDULER_LOCK_TTL", 90)),
+    # 同时排队和执行的定时任务总数上限
+    "max_concurrent_runs": int(os.environ.get("PIPELINE_MAX_CONCURRENT_RUNS", 4)),
+    # 每个用户同时排队和执行的任务数上限
+    "max_runs_per_user": int(os.environ.get("PIPELINE_MAX_RUNS_PER_USER", 2)),
+    # cron表达式和执行时段使用的时区
+    "timezone": os.environ.get("PIPELINE_SCHEDULER_TIMEZONE", "UTC"),
+    # 调度配置中 quiet_hours 为true时使用的低峰时段
+    "quiet_hours": os.environ.get("PIPELINE_QUIET_HOURS", "01:00-06:00"),
+    # 排队超过该时间（秒）仍未开始执行的任务视为失败，不再占用并发数
+    "run_timeout": int(os.environ.get("PIPELINE_RUN_TIMEOUT", 6 * 3600)),
+    # 执行中的任务更新心跳的间隔（秒）
+    "heartbeat_interval": int(os.environ.get("PIPELINE_HEARTBEAT_INTERVAL", 60)),
+    # 执行中的任务超过该时间（秒）没有心跳时视为工作进程已崩溃
+    "heartbeat_timeout": int(os.environ.get("PIPELINE_HEARTBEAT_TIMEOUT", 600)),
+    # 执行管道的Celery队列，与交互请求使用的工作进程分开
+    "queue": os.environ.get("PIPELINE_RUN_QUEUE", "pipelines"),
+}
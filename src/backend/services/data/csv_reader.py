@@ -0,0 +1,140 @@
+"""
+CSV读取模块
+
+提供基于字节样本的编码检测，以及分块读取CSV的解析引擎选择：
+可用时使用多线程的Arrow CSV解析器，否则回退到pandas。
+"""
+
+import codecs
+import logging
+from typing import BinaryIO, Iterator, Optional
+
+import pandas as pd
+
+from .config import CSV_CONFIG
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None
+    pa_csv = None
+
+logger = logging.getLogger(__name__)
+
+# 依次尝试的编码，GB18030兼容GBK和GB2312
+ENCODING_CANDIDATES = ("utf-8", "gb18030")
+
+# 多字节编码单个字符的最大字节数，用于判断样本末尾是否截断了字符
+MAX_CHAR_BYTES = 4
+
+
+class CsvEngineError(ValueError):
+    """CSV解析引擎无法处理该文件，可换用其他引擎重试"""
+    pass
+
+
+def detect_encoding(source: BinaryIO, sample_size: Optional[int] = None) -> str:
+    """
+    根据文件开头的字节样本检测编码，检测后将文件位置复原
+
+    Args:
+        source (BinaryIO): 以二进制模式打开的文件
+        sample_size (Optional[int]): 样本字节数，为空时使用配置值
+
+    Returns:
+        str: 编码名称
+    """
+    sample_size = sample_size or CSV_CONFIG["encoding_sample_size"]
+    position = source.tell()
+    sample = source.read(sample_size)
+    source.seek(position)
+
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+
+    truncated = len(sample) == sample_size
+    for encoding in ENCODING_CANDIDATES:
+        try:
+            sample.decode(encoding)
+            return encoding
+        except UnicodeDecodeError as e:
+            # 样本在多字节字符中间截断时，只要截断前的部分能解码即可
+            if truncated and e.start >= len(sample) - MAX_CHAR_BYTES:
+                try:
+                    sample[:e.start].decode(encoding)
+                    return encoding
+                except UnicodeDecodeError:
+                    pass
+
+    logger.warning("无法识别CSV文件编码，按UTF-8读取")
+    return "utf-8"
+
+
+def resolve_engine(engine: Optional[str] = None) -> str:
+    """
+    确定实际使用的解析引擎
+
+    Args:
+        engine (Optional[str]): auto/arrow/pandas，为空时使用配置值
+
+    Returns:
+        str: arrow或pandas
+    """
+    engine = engine or CSV_CONFIG["engine"]
+    if engine == "auto":
+        return "arrow" if pa_csv is not None else "pandas"
+    if engine == "arrow" and pa_csv is None:
+        raise ValueError("未安装pyarrow，无法使用Arrow解析引擎")
+    if engine not in ("arrow", "pandas"):
+        raise ValueError(f"不支持的CSV解析引擎: {engine}")
+    return engine
+
+
+def iter_csv_chunks(
+    source: BinaryIO,
+    chunk_rows: int,
+    encoding: Optional[str] = None,
+    engine: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    分块读取CSV文件
+
+    Args:
+        source (BinaryIO): 以二进制模式打开的文件
+        chunk_rows (int): 每块行数
+        encoding (Optional[str]): 文件编码，为空时自动检测
+        engine (Optional[str]): 解析引擎，为空时使用配置值
+
+    Returns:
+        Iterator[pd.DataFrame]: 数据块迭代器
+    """
+    encoding = encoding or detect_encoding(source)
+    if resolve_engine(engine) == "arrow":
+        return _iter_arrow_chunks(source, chunk_rows, encoding)
+    return iter(pd.read_csv(source, chunksize=chunk_rows, encoding=encoding))
+
+
+def _iter_arrow_chunks(source: BinaryIO, chunk_rows: int, encoding: str) -> Iterator[pd.DataFrame]:
+    """使用Arrow流式CSV读取器分块读取，并按行数重新切分"""
+    read_options = pa_csv.ReadOptions(
+        encoding=encoding,
+        use_threads=True,
+        block_size=CSV_CONFIG["arrow_block_size"],
+    )
+    try:
+        reader = pa_csv.open_csv(source, read_options=read_options)
+        pending = None
+        for batch in reader:
+            table = pa.Table.from_batches([batch])
+            pending = table if pending is None else pa.concat_tables([pending, table])
+            while pending.num_rows >= chunk_rows:
+                yield pending.slice(0, chunk_rows).to_pandas()
+                pending = pending.slice(chunk_rows)
+        if pending is not None and pending.num_rows:
+            yield pending.to_pandas()
+    except pa.ArrowInvalid as e:
+        # 流式读取时列类型由首个分块推断，后续分块类型变化会导致解析失败
+        raise CsvEngineError(f"Arrow解析CSV失败: {e}") from e
@@ -0,0 +1,231 @@
+"""
+数据表导出模块
+
+逐块读取数据表并编码为CSV、JSON Lines或Parquet字节流，导出任意大小的表时
+内存占用只与单个数据块大小有关。
+"""
+
+import io
+import itertools
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from .models import DataTable, DataType, TableExport
+from .storage import DataBlock
+from .storage_engine import StorageEngine
+from .external_sort import ExternalSorter, parse_sort_by
+from .filters import FilterExpression, compile_filter
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 各导出格式的MIME类型和文件扩展名
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "json": ("application/x-ndjson", "jsonl"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+# 系统数据类型对应的Arrow类型，用于统一各数据块的Parquet模式
+ARROW_TYPES = {
+    DataType.INTEGER: "int64",
+    DataType.FLOAT: "float64",
+    DataType.BOOLEAN: "bool_",
+    DataType.DATE: "date32",
+    DataType.DATETIME: "timestamp",
+}
+
+
+class TableExportStream:
+    """导出结果，chunks在被迭代时才读取数据"""
+
+    def __init__(self, filename: str, media_type: str, chunks: Iterator[bytes]) -> None:
+        self.filename = filename
+        self.media_type = media_type
+        self.chunks = chunks
+
+
+class _ChunkSink(io.RawIOBase):
+    """收集写入字节的文件对象，供ParquetWriter写入后按块取出"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.buffer: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        data = bytes(data)
+        self.buffer.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.buffer)
+        self.buffer = []
+        return data
+
+
+class TableExporter:
+    """数据表流式导出器"""
+
+    def __init__(self, storage_engine: StorageEngine) -> None:
+        self.storage_engine = storage_engine
+
+    def export(self, table: DataTable, blocks: List[DataBlock],
+               config: TableExport) -> TableExportStream:
+        """
+        按导出配置创建导出流
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 按顺序排列的数据块
+            config (TableExport): 导出配置
+
+        Returns:
+            TableExportStream: 导出流
+        """
+        export_format = config.format.lower()
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(
+                f"不支持的导出格式: {config.format}，流式导出支持 {', '.join(EXPORT_FORMATS)}"
+            )
+        if export_format == "parquet" and pq is None:
+            raise ValueError("未安装pyarrow，无法导出Parquet格式")
+
+        table_columns = [col.name for col in table.columns]
+        columns = config.selected_columns or table_columns
+        unknown = [col for col in columns if col not in table_columns]
+        if unknown:
+            raise ValueError(f"数据表不存在列: {', '.join(unknown)}")
+
+        expression = compile_filter(config.filters)
+        if expression is not None:
+            expression.validate(table_columns, {col.name: col.type for col in table.columns})
+            blocks = expression.prune(blocks)
+
+        sort_columns = parse_sort_by(config.sort_by)[0] if config.sort_by else []
+        unknown = [col for col in sort_columns if col not in table_columns]
+        if unknown:
+            raise ValueError(f"排序条件中的列不存在: {', '.join(unknown)}")
+
+        if sort_columns:
+            frames = self._iter_sorted_frames(blocks, columns, expression, config.sort_by)
+        else:
+            frames = self._iter_frames(blocks, columns, expression)
+        media_type, extension = EXPORT_FORMATS[export_format]
+        if export_format == "csv":
+            chunks = self._iter_csv(frames, config)
+        elif export_format == "json":
+            chunks = self._iter_json_lines(frames)
+        else:
+            chunks = self._iter_parquet(frames, self._arrow_schema(table, columns), config)
+        # 返回前先生成第一块，排序和首个数据块中的错误在发送响应头之前抛出
+        chunks = self._prefetch(chunks)
+
+        filename = f"{table.name}.{extension}"
+        # Parquet自带列压缩，其余格式整体gzip压缩
+        if config.compression and export_format != "parquet":
+            chunks = self._gzip(chunks)
+            filename += ".gz"
+            media_type = "application/gzip"
+
+        return TableExportStream(filename, media_type, chunks)
+
+    def _prefetch(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        first = next(chunks, None)
+        if first is None:
+            return iter(())
+        return itertools.chain([first], chunks)
+
+    def _iter_frames(self, blocks: Iterable[DataBlock], columns: List[str],
+                     expression: Optional[FilterExpression]) -> Iterator[pd.DataFrame]:
+        """逐块读取所需列，过滤条件尽量下推到存储引擎"""
+        for block in blocks:
+            yield self.storage_engine.scan_block(block, columns, expression)
+
+    def _iter_sorted_frames(self, blocks: List[DataBlock], columns: List[str],
+                            expression: Optional[FilterExpression],
+                            sort_by: List[Dict[str, str]]) -> Iterator[pd.DataFrame]:
+        """经外部排序后按顺序输出，过滤在排序进程中完成以减少排序的数据量"""
+        sorter = ExternalSorter(self.storage_engine.config, sort_by)
+        read_columns = list(dict.fromkeys(columns + sorter.by))
+        if expression is not None:
+            read_columns = expression.read_columns(read_columns)
+        predicate = expression.mask if expression is not None else None
+        for data in sorter.sort(blocks, read_columns, predicate):
+            yield data[columns]
+
+    def _iter_csv(self, frames: Iterable[pd.DataFrame], config: TableExport) -> Iterator[bytes]:
+        header = config.include_header
+        for data in frames:
+            text = data.to_csv(index=False, header=header, sep=config.delimiter)
+            header = False
+            yield text.encode(config.encoding, errors="replace")
+
+    def _iter_json_lines(self, frames: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+        for data in frames:
+            if data.empty:
+                continue
+            text = data.to_json(orient="records", lines=True, force_ascii=False,
+                                date_format="iso")
+            if not text.endswith("\n"):
+                text += "\n"
+            yield text.encode("utf-8")
+
+    def _iter_parquet(self, frames: Iterable[pd.DataFrame], schema: "pa.Schema",
+                      config: TableExport) -> Iterator[bytes]:
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema,
+                                  compression="gzip" if config.compression else "snappy")
+        try:
+            for data in frames:
+                writer.write_table(self._to_arrow(data, schema))
+                chunk = sink.drain()
+                if chunk:
+                    yield chunk
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _arrow_schema(self, table: DataTable, columns: List[str]) -> "pa.Schema":
+        """按列元数据构建统一的Arrow模式，避免各数据块推断出的类型不一致"""
+        types = {col.name: col.type for col in table.columns}
+        fields = []
+        for name in columns:
+            type_name = ARROW_TYPES.get(types[name])
+            if type_name == "timestamp":
+                arrow_type = pa.timestamp("us")
+            elif type_name:
+                arrow_type = getattr(pa, type_name)()
+            else:
+                arrow_type = pa.string()
+            fields.append(pa.field(name, arrow_type))
+        return pa.schema(fields)
+
+    def _to_arrow(self, data: pd.DataFrame, schema: "pa.Schema") -> "pa.Table":
+        data = data.copy()
+        for field in schema:
+            if pa.types.is_string(field.type):
+                column = data[field.name]
+                data[field.name] = column.where(column.isna(), column.astype(str))
+        return pa.Table.from_pandas(data, schema=schema, preserve_index=False)
+
+    def _gzip(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(wbits=31)  # 31表示gzip格式
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
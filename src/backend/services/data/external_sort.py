@@ -0,0 +1,305 @@
+"""
+外部排序模块
+
+对超出内存的数据表按多列（可混合升降序）排序：先在进程池中并行将若干数据块
+排序为有序段并写入临时Parquet文件，再以向量化的多路归并流式输出。排序结果只以
+有序批次的形式流式提供给导出和查询，不写回为新的数据块。
+内存占用由配置的预算控制。
+"""
+
+import os
+import shutil
+import tempfile
+import logging
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .storage import DataBlock, StorageConfig
+from .storage_engine import StorageEngineFactory
+from .pipeline_parallel import discard_executor, shared_executor
+from .config import EXTERNAL_SORT_CONFIG
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# 排序时数据的内存放大系数（合并、排序索引和重排后的副本）
+SORT_MEMORY_FACTOR = 3
+
+
+def parse_sort_by(sort_by: List[Dict[str, str]]) -> Tuple[List[str], List[bool]]:
+    """
+    解析排序条件
+
+    Args:
+        sort_by (List[Dict[str, str]]): 排序条件，如 [{"column": "gdp", "order": "desc"}]
+
+    Returns:
+        Tuple[List[str], List[bool]]: (排序列, 是否升序)
+    """
+    columns, ascending = [], []
+    for item in sort_by:
+        column = item.get("column") or item.get("field")
+        if not column:
+            raise ValueError(f"排序条件缺少列名: {item}")
+        order = (item.get("order") or item.get("direction") or "asc").lower()
+        if order not in ("asc", "desc"):
+            raise ValueError(f"不支持的排序方向: {order}")
+        columns.append(column)
+        ascending.append(order == "asc")
+    return columns, ascending
+
+
+def _sort_run(
+    storage_config: StorageConfig,
+    blocks: List[DataBlock],
+    columns: Optional[List[str]],
+    by: List[str],
+    ascending: List[bool],
+    predicate: Optional[Callable[[pd.DataFrame], Any]],
+    run_path: str,
+    row_group_rows: int
+) -> int:
+    """在工作进程中读取一组数据块，排序后写入有序段文件，返回行数"""
+    storage_engine = StorageEngineFactory.create_engine(storage_config)
+    frames = []
+    for block in blocks:
+        data = storage_engine.load_block(block, columns)
+        if predicate is not None:
+            data = data[predicate(data)]
+        frames.append(data)
+    data = pd.concat(frames, ignore_index=True)
+    data = data.sort_values(by, ascending=ascending, na_position="last", kind="stable")
+    data.to_parquet(run_path, index=False, row_group_size=row_group_rows)
+    return len(data)
+
+
+class ExternalSorter:
+    """数据块外部排序器"""
+
+    def __init__(
+        self,
+        storage_config: StorageConfig,
+        sort_by: List[Dict[str, str]],
+        memory_budget: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        temp_dir: Optional[str] = None
+    ) -> None:
+        """
+        初始化外部排序器
+
+        Args:
+            storage_config (StorageConfig): 存储配置，工作进程据此各自读取数据块
+            sort_by (List[Dict[str, str]]): 排序条件
+            memory_budget (Optional[int]): 内存预算（字节）
+            max_workers (Optional[int]): 并行排序进程数
+            temp_dir (Optional[str]): 有序段临时文件目录
+        """
+        self.storage_config = storage_config
+        self.by, self.ascending = parse_sort_by(sort_by)
+        self.memory_budget = memory_budget or EXTERNAL_SORT_CONFIG["memory_budget"]
+        self.max_workers = max_workers or EXTERNAL_SORT_CONFIG["max_workers"]
+        self.temp_dir = temp_dir or EXTERNAL_SORT_CONFIG["temp_dir"]
+
+    def sort(
+        self,
+        blocks: List[DataBlock],
+        columns: Optional[List[str]] = None,
+        predicate: Optional[Callable[[pd.DataFrame], Any]] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        按排序条件流式输出数据块中的所有行
+
+        Args:
+            blocks (List[DataBlock]): 待排序的数据块
+            columns (Optional[List[str]]): 需要读取的列，须包含排序列
+            predicate (Optional[Callable]): 行过滤函数，需可被pickle以传给工作进程
+
+        Returns:
+            Iterator[pd.DataFrame]: 有序的数据批次
+        """
+        if pq is None:
+            raise ValueError("未安装pyarrow，无法进行外部排序")
+        if columns is not None:
+            missing = [col for col in self.by if col not in columns]
+            if missing:
+                raise ValueError(f"排序列不在读取的列中: {', '.join(missing)}")
+        return self._sort_blocks(blocks, columns, predicate)
+
+    def _sort_blocks(
+        self,
+        blocks: List[DataBlock],
+        columns: Optional[List[str]],
+        predicate: Optional[Callable[[pd.DataFrame], Any]]
+    ) -> Iterator[pd.DataFrame]:
+        if not blocks:
+            return
+
+        run_dir = tempfile.mkdtemp(prefix="ecohub_sort_", dir=self.temp_dir)
+        try:
+            row_bytes = self._estimate_row_bytes(blocks[0], columns)
+            runs = self._build_runs(blocks, columns, predicate, run_dir, row_bytes)
+            yield from self._merge_runs(runs, row_bytes)
+        finally:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+    def _estimate_row_bytes(self, block: DataBlock, columns: Optional[List[str]]) -> float:
+        """读取首个数据块估算每行占用的内存"""
+        storage_engine = StorageEngineFactory.create_engine(self.storage_config)
+        sample = storage_engine.head_block(block, 10000, columns)
+        if sample.empty:
+            return 1.0
+        return max(float(sample.memory_usage(deep=True, index=False).sum()) / len(sample), 1.0)
+
+    def _build_runs(
+        self,
+        blocks: List[DataBlock],
+        columns: Optional[List[str]],
+        predicate: Optional[Callable[[pd.DataFrame], Any]],
+        run_dir: str,
+        row_bytes: float
+    ) -> List[str]:
+        """将数据块按内存预算分组，并行排序为有序段文件"""
+        # 所有进程同时持有一个有序段，每段可用的内存为预算的1/进程数
+        worker_budget = self.memory_budget / self.max_workers
+        run_rows = max(int(worker_budget / row_bytes / SORT_MEMORY_FACTOR), 1)
+
+        groups: List[List[DataBlock]] = []
+        group_rows = 0
+        for block in blocks:
+            if groups and group_rows + block.row_count <= run_rows:
+                groups[-1].append(block)
+                group_rows += block.row_count
+            else:
+                groups.append([block])
+                group_rows = block.row_count
+        logger.info(f"外部排序: {len(blocks)} 个数据块分为 {len(groups)} 个有序段")
+
+        row_group_rows = EXTERNAL_SORT_CONFIG["merge_batch_rows"]
+        paths = [os.path.join(run_dir, f"run_{i}.parquet") for i in range(len(groups))]
+        # 使用进程内共享的进程池，工作进程不由调用方进程fork
+        executor = shared_executor("sort", self.max_workers)
+        futures = [
+            executor.submit(
+                _sort_run, self.storage_config, group, columns, self.by,
+                self.ascending, predicate, path, row_group_rows
+            )
+            for group, path in zip(groups, paths)
+        ]
+        try:
+            rows = [future.result() for future in futures]
+        except BrokenProcessPool:
+            discard_executor(executor)
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return [path for path, count in zip(paths, rows) if count]
+
+    def _merge_runs(self, runs: List[str], row_bytes: float) -> Iterator[pd.DataFrame]:
+        """
+        多路归并有序段
+
+        每轮取所有仍有后续数据的有序段当前批次末行中最小者作为分界，各段当前批次中
+        不大于分界的前缀都可以安全输出，合并排序后输出；批次取完的段再读取下一批。
+        每行在归并阶段只参与一次排序。
+        """
+        if not runs:
+            return
+
+        # 所有有序段的读取缓冲合计不超过内存预算
+        batch_rows = int(min(
+            EXTERNAL_SORT_CONFIG["merge_batch_rows"],
+            max(self.memory_budget / len(runs) / row_bytes / SORT_MEMORY_FACTOR, 100)
+        ))
+        readers = [pq.ParquetFile(path).iter_batches(batch_size=batch_rows) for path in runs]
+
+        def read_next(i: int) -> Optional[pd.DataFrame]:
+            batch = next(readers[i], None)
+            return None if batch is None else batch.to_pandas()
+
+        # 每个有序段保留当前批次和预读的下一批次，用于判断是否还有后续数据
+        current = [read_next(i) for i in range(len(runs))]
+        lookahead = [read_next(i) for i in range(len(runs))]
+
+        while True:
+            active = [i for i, batch in enumerate(current) if batch is not None and len(batch)]
+            if not active:
+                return
+
+            bounded = [i for i in active if lookahead[i] is not None]
+            if not bounded:
+                # 所有有序段都已读到最后一批，剩余数据整体排序输出
+                yield self._sort_frame(pd.concat([current[i] for i in active], ignore_index=True))
+                return
+
+            cutoff_run = min(bounded, key=lambda i: self._sort_tuple(current[i].iloc[-1]))
+            cutoff = current[cutoff_run].iloc[-1]
+
+            parts = []
+            for i in active:
+                prefix = int(self._not_after(current[i], cutoff).sum())
+                parts.append(current[i].iloc[:prefix])
+                current[i] = current[i].iloc[prefix:]
+                if len(current[i]) == 0 and lookahead[i] is not None:
+                    current[i], lookahead[i] = lookahead[i], read_next(i)
+
+            yield self._sort_frame(pd.concat(parts, ignore_index=True))
+
+    def _sort_frame(self, data: pd.DataFrame) -> pd.DataFrame:
+        return data.sort_values(
+            self.by, ascending=self.ascending, na_position="last", kind="stable"
+        ).reset_index(drop=True)
+
+    def _sort_tuple(self, row: pd.Series) -> Tuple:
+        """将一行转换为可比较的排序键，空值排在最后，降序列取反比较"""
+        key = []
+        for column, ascending in zip(self.by, self.ascending):
+            value = row[column]
+            if pd.isna(value):
+                key.append((1, 0))
+            else:
+                key.append((0, value if ascending else _Reversed(value)))
+        return tuple(key)
+
+    def _not_after(self, data: pd.DataFrame, cutoff: pd.Series) -> np.ndarray:
+        """按字典序逐列比较，返回排序位置不在分界行之后的行掩码"""
+        before = np.zeros(len(data), dtype=bool)
+        equal = np.ones(len(data), dtype=bool)
+        for column, ascending in zip(self.by, self.ascending):
+            values = data[column].to_numpy()
+            missing = pd.isna(values)
+            bound = cutoff[column]
+            lt = np.zeros(len(data), dtype=bool)
+            eq = np.zeros(len(data), dtype=bool)
+            if pd.isna(bound):
+                # 空值排在最后，任何非空值都在空值之前
+                lt = ~missing
+                eq = missing
+            else:
+                present = ~missing
+                lt[present] = values[present] < bound if ascending else values[present] > bound
+                eq[present] = values[present] == bound
+            before |= equal & lt
+            equal &= eq
+        return before | equal
+
+
+class _Reversed:
+    """反转比较顺序的包装，用于降序列的排序键"""
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __eq__(self, other: "_Reversed") -> bool:
+        return self.value == other.value
+
+    def __lt__(self, other: "_Reversed") -> bool:
+        return other.value < self.value
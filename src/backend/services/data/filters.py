@@ -0,0 +1,614 @@
+"""
+过滤表达式模块
+
+解析类SQL的过滤表达式（比较、IN、BETWEEN、IS NULL、LIKE及AND/OR/NOT组合），
+编译为向量化的行掩码计算。同一表达式还可以下推为Arrow过滤条件按行组跳过数据，
+或根据数据块的列统计直接跳过不可能匹配的数据块。
+
+表达式示例::
+
+    gdp > 1000 AND region IN ('华东', '华北') AND NOT name LIKE '测试%'
+
+也兼容 {列: 值} 形式的字典，值为列表时表示IN，值为字典时按运算符组合，如
+{"gdp": {"gt": 1000, "le": 5000}}。
+"""
+
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+from .models import DataType
+from .storage import DataBlock
+
+try:
+    import pyarrow.compute as pc
+except ImportError:
+    pc = None
+
+# 比较运算符及其取反后的运算符，NOT在解析时下推到叶子节点
+NEGATED_OPS = {
+    "eq": "ne", "ne": "eq",
+    "lt": "ge", "ge": "lt",
+    "gt": "le", "le": "gt",
+    "in": "not_in", "not_in": "in",
+    "between": "not_between", "not_between": "between",
+    "is_null": "not_null", "not_null": "is_null",
+    "like": "not_like", "not_like": "like",
+}
+
+COMPARISON_OPS = {
+    "eq": operator.eq, "ne": operator.ne,
+    "lt": operator.lt, "le": operator.le,
+    "gt": operator.gt, "ge": operator.ge,
+}
+
+SYMBOL_OPS = {
+    "=": "eq", "==": "eq", "!=": "ne", "<>": "ne",
+    "<": "lt", "<=": "le", ">": "gt", ">=": "ge",
+}
+
+# 各数据类型的列可以比较大小的常量类型，字符串列与数值比较会在扫描时出错
+ORDERED_LITERALS = {
+    DataType.INTEGER: (int, float),
+    DataType.FLOAT: (int, float),
+    DataType.BOOLEAN: (bool, int, float),
+    DataType.STRING: (str,),
+}
+
+OP_SYMBOLS = {"eq": "=", "ne": "!=", "lt": "<", "le": "<=", "gt": ">", "ge": ">="}
+
+KEYWORDS = {"AND", "OR", "NOT", "IN", "BETWEEN", "IS", "NULL", "LIKE", "TRUE", "FALSE"}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<number>-?\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)
+      | (?P<string>'(?:[^']|'')*')
+      | (?P<quoted>"(?:[^"]|"")*"|`[^`]*`)
+      | (?P<symbol><=|>=|<>|!=|==|=|<|>|\(|\)|,)
+      | (?P<word>[^\W\d]\w*)
+    )""", re.VERBOSE)
+
+
+class FilterSyntaxError(ValueError):
+    """过滤表达式语法错误"""
+    pass
+
+
+class Predicate:
+    """单列上的过滤条件"""
+
+    def __init__(self, column: str, op: str, value: Any = None) -> None:
+        if op not in NEGATED_OPS:
+            raise FilterSyntaxError(f"不支持的过滤运算符: {op}")
+        if op in ("in", "not_in") and not isinstance(value, (list, tuple)):
+            raise FilterSyntaxError(f"{op} 的取值必须是列表")
+        if op in ("between", "not_between") and (
+            not isinstance(value, (list, tuple)) or len(value) != 2
+        ):
+            raise FilterSyntaxError(f"{op} 的取值必须是两个元素的列表")
+        self.column = column
+        self.op = op
+        self.value = tuple(value) if isinstance(value, list) else value
+        self._regex = _like_to_regex(value) if op in ("like", "not_like") else None
+
+    def negate(self) -> "Predicate":
+        return Predicate(self.column, NEGATED_OPS[self.op], self.value)
+
+    def columns(self) -> List[str]:
+        return [self.column]
+
+    def predicates(self) -> List["Predicate"]:
+        return [self]
+
+    def check_literal(self, column_type: Optional[DataType]) -> None:
+        """
+        检查常量能否与声明类型的列比较，避免在扫描数据块时才出错
+
+        Args:
+            column_type (Optional[DataType]): 列的数据类型，未知时不检查
+        """
+        if column_type is None or self.op in ("is_null", "not_null", "like", "not_like"):
+            return
+        column_type = DataType(column_type)
+        values = self.value if isinstance(self.value, tuple) else (self.value,)
+        if column_type in (DataType.DATE, DataType.DATETIME):
+            for value in values:
+                if not isinstance(value, str):
+                    continue
+                try:
+                    pd.Timestamp(value)
+                except ValueError:
+                    raise ValueError(f"列 {self.column} 为日期时间类型，无法解析常量 {value!r}")
+            return
+        if self.op in ("eq", "ne", "in", "not_in"):
+            # 等值比较类型不一致时只是不匹配
+            return
+        allowed = ORDERED_LITERALS.get(column_type)
+        if allowed and not all(isinstance(value, allowed) for value in values):
+            raise ValueError(f"列 {self.column} 的值无法与 {self.value!r} 比较")
+
+    def mask(self, data: pd.DataFrame) -> np.ndarray:
+        """计算行掩码，空值在除IS NULL以外的条件下都不匹配"""
+        series = data[self.column]
+        if self.op == "is_null":
+            return series.isna().to_numpy()
+        present = series.notna().to_numpy()
+        if self.op == "not_null":
+            return present
+
+        try:
+            if self.op in COMPARISON_OPS:
+                result = COMPARISON_OPS[self.op](series, _coerce(series, self.value))
+            elif self.op in ("in", "not_in"):
+                result = series.isin([_coerce(series, value) for value in self.value])
+            elif self.op in ("between", "not_between"):
+                low, high = (_coerce(series, value) for value in self.value)
+                result = (series >= low) & (series <= high)
+            else:
+                result = series.astype(str).str.fullmatch(self._regex)
+        except TypeError as e:
+            raise ValueError(f"列 {self.column} 的值无法与 {self.value!r} 比较") from e
+
+        result = pd.Series(result).fillna(False).to_numpy(dtype=bool)
+        if self.op in ("not_in", "not_between", "not_like"):
+            result = ~result
+        return result & present
+
+    def may_match(self, statistics: Dict[str, Any]) -> bool:
+        """
+        根据数据块的列统计判断块内是否可能有匹配的行，无法判断时返回True
+
+        Args:
+            statistics (Dict[str, Any]): 数据块各列的统计信息
+        """
+        stats = statistics.get(self.column)
+        if not stats or "count" not in stats:
+            return True
+        count, null_count = stats["count"], stats.get("null_count", 0)
+        if self.op == "is_null":
+            return null_count > 0
+        if count == 0:
+            # 整块都是空值
+            return False
+        if self.op == "not_null":
+            return True
+
+        low, high = stats.get("min"), stats.get("max")
+        if self.op in ("in", "not_in", "between", "not_between"):
+            values = [_coerce_statistic(stats, value) for value in self.value]
+        else:
+            values = [_coerce_statistic(stats, self.value)]
+        bounds = [_coerce_statistic(stats, low), _coerce_statistic(stats, high)]
+        if any(value is None for value in values + bounds):
+            return True
+        low, high = bounds
+
+        try:
+            if self.op == "eq":
+                return low <= values[0] <= high
+            if self.op == "ne":
+                return not (low == high == values[0])
+            if self.op == "lt":
+                return low < values[0]
+            if self.op == "le":
+                return low <= values[0]
+            if self.op == "gt":
+                return high > values[0]
+            if self.op == "ge":
+                return high >= values[0]
+            if self.op == "in":
+                return any(low <= value <= high for value in values)
+            if self.op == "between":
+                return high >= values[0] and low <= values[1]
+            if self.op == "not_between":
+                return low < values[0] or high > values[1]
+        except TypeError:
+            return True
+        return True
+
+    def to_arrow(self) -> Any:
+        """转换为Arrow过滤表达式，无法转换时返回None"""
+        if pc is None or self.op in ("like", "not_like"):
+            return None
+        literals = self.value if isinstance(self.value, tuple) else (self.value,)
+        if not all(isinstance(value, (bool, int, float, str)) for value in literals):
+            return None
+
+        field = pc.field(self.column)
+        if self.op == "is_null":
+            return field.is_null()
+        if self.op == "not_null":
+            return field.is_valid()
+        if self.op in COMPARISON_OPS:
+            return COMPARISON_OPS[self.op](field, self.value)
+        if self.op == "in":
+            return field.isin(list(self.value))
+        if self.op == "not_in":
+            return ~field.isin(list(self.value))
+        if self.op == "between":
+            return (field >= self.value[0]) & (field <= self.value[1])
+        return (field < self.value[0]) | (field > self.value[1])
+
+    def __str__(self) -> str:
+        column = _quote_identifier(self.column)
+        if self.op in OP_SYMBOLS:
+            return f"{column} {OP_SYMBOLS[self.op]} {_format_literal(self.value)}"
+        if self.op in ("in", "not_in"):
+            values = ", ".join(_format_literal(value) for value in self.value)
+            return f"{column} {'NOT IN' if self.op == 'not_in' else 'IN'} ({values})"
+        if self.op in ("between", "not_between"):
+            keyword = "NOT BETWEEN" if self.op == "not_between" else "BETWEEN"
+            low, high = (_format_literal(value) for value in self.value)
+            return f"{column} {keyword} {low} AND {high}"
+        if self.op in ("is_null", "not_null"):
+            return f"{column} IS {'NOT NULL' if self.op == 'not_null' else 'NULL'}"
+        keyword = "NOT LIKE" if self.op == "not_like" else "LIKE"
+        return f"{column} {keyword} {_format_literal(self.value)}"
+
+
+class BooleanExpression:
+    """AND/OR组合的过滤条件"""
+
+    def __init__(self, op: str, children: Sequence[Union["BooleanExpression", Predicate]]) -> None:
+        self.op = op
+        self.children = list(children)
+
+    def negate(self) -> "BooleanExpression":
+        # 德摩根定律
+        return BooleanExpression(
+            "or" if self.op == "and" else "and",
+            [child.negate() for child in self.children]
+        )
+
+    def columns(self) -> List[str]:
+        return [column for child in self.children for column in child.columns()]
+
+    def predicates(self) -> List[Predicate]:
+        return [predicate for child in self.children for predicate in child.predicates()]
+
+    def mask(self, data: pd.DataFrame) -> np.ndarray:
+        combine = np.logical_and if self.op == "and" else np.logical_or
+        result = self.children[0].mask(data)
+        for child in self.children[1:]:
+            result = combine(result, child.mask(data))
+        return result
+
+    def may_match(self, statistics: Dict[str, Any]) -> bool:
+        matches = (child.may_match(statistics) for child in self.children)
+        return all(matches) if self.op == "and" else any(matches)
+
+    def to_arrow(self) -> Any:
+        expressions = [child.to_arrow() for child in self.children]
+        if self.op == "and":
+            # 部分条件无法下推时只下推其余条件，读取后仍会按完整表达式过滤
+            expressions = [expression for expression in expressions if expression is not None]
+            combine = operator.and_
+        elif any(expression is None for expression in expressions):
+            return None
+        else:
+            combine = operator.or_
+        if not expressions:
+            return None
+        result = expressions[0]
+        for expression in expressions[1:]:
+            result = combine(result, expression)
+        return result
+
+    def __str__(self) -> str:
+        return f" {self.op.upper()} ".join(f"({child})" for child in self.children)
+
+
+class FilterExpression:
+    """编译后的过滤表达式"""
+
+    def __init__(self, root: Union[BooleanExpression, Predicate]) -> None:
+        self.root = root
+        self.columns = list(dict.fromkeys(root.columns()))
+
+    def validate(self, columns: Sequence[str],
+                 types: Optional[Dict[str, DataType]] = None) -> None:
+        """
+        检查表达式引用的列是否存在，给定列类型时同时检查常量类型
+
+        Args:
+            columns (Sequence[str]): 数据表的列名
+            types (Optional[Dict[str, DataType]]): 各列的数据类型
+        """
+        unknown = [col for col in self.columns if col not in columns]
+        if unknown:
+            raise ValueError(f"过滤条件中的列不存在: {', '.join(unknown)}")
+        if types:
+            for predicate in self.root.predicates():
+                predicate.check_literal(types.get(predicate.column))
+
+    def read_columns(self, columns: Optional[List[str]]) -> Optional[List[str]]:
+        """需要读取的列：输出列加上过滤用到的列"""
+        if columns is None:
+            return None
+        return list(dict.fromkeys(list(columns) + self.columns))
+
+    def mask(self, data: pd.DataFrame) -> np.ndarray:
+        """
+        计算满足条件的行掩码
+
+        Args:
+            data (pd.DataFrame): 数据，须包含表达式引用的列
+
+        Returns:
+            np.ndarray: 布尔掩码
+        """
+        return self.root.mask(data)
+
+    def apply(self, data: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        过滤数据并按需投影到指定列
+
+        Args:
+            data (pd.DataFrame): 数据
+            columns (Optional[List[str]]): 输出的列，为空时保留全部列
+
+        Returns:
+            pd.DataFrame: 满足条件的行
+        """
+        data = data[self.mask(data)]
+        if columns is not None:
+            data = data[columns]
+        return data.reset_index(drop=True)
+
+    def may_match(self, statistics: Dict[str, Any]) -> bool:
+        """根据列统计判断是否可能存在匹配的行"""
+        return self.root.may_match(statistics or {})
+
+    def prune(self, blocks: List[DataBlock]) -> List[DataBlock]:
+        """
+        跳过根据块统计不可能包含匹配行的数据块
+
+        Args:
+            blocks (List[DataBlock]): 数据块
+
+        Returns:
+            List[DataBlock]: 可能包含匹配行的数据块，保持原顺序
+        """
+        return [block for block in blocks if self.may_match(block.statistics)]
+
+    def to_arrow(self) -> Any:
+        """
+        转换为可传给pyarrow.parquet读取接口的过滤表达式
+
+        下推结果可能比完整表达式宽松（如LIKE不下推），读取后仍需调用apply。
+
+        Returns:
+            Optional[pyarrow.compute.Expression]: 无法下推时为None
+        """
+        return self.root.to_arrow()
+
+    def __str__(self) -> str:
+        return str(self.root)
+
+
+def compile_filter(spec: Union[str, Dict[str, Any], None]) -> Optional[FilterExpression]:
+    """
+    编译过滤条件
+
+    Args:
+        spec (Union[str, Dict[str, Any], None]): 表达式字符串或 {列: 值} 字典
+
+    Returns:
+        Optional[FilterExpression]: 过滤表达式，条件为空时为None
+    """
+    if spec is None:
+        return None
+    if isinstance(spec, str):
+        return _parse_cached(spec.strip()) if spec.strip() else None
+    if isinstance(spec, dict):
+        if not spec:
+            return None
+        return FilterExpression(_from_dict(spec))
+    raise FilterSyntaxError(f"不支持的过滤条件类型: {type(spec).__name__}")
+
+
+@lru_cache(maxsize=256)
+def _parse_cached(text: str) -> FilterExpression:
+    return FilterExpression(_Parser(text).parse())
+
+
+def _from_dict(spec: Dict[str, Any]) -> Union[BooleanExpression, Predicate]:
+    predicates = []
+    for column, value in spec.items():
+        if isinstance(value, dict):
+            for op, operand in value.items():
+                predicates.append(Predicate(column, op, operand))
+        elif isinstance(value, (list, tuple, set)):
+            predicates.append(Predicate(column, "in", list(value)))
+        elif value is None:
+            predicates.append(Predicate(column, "is_null"))
+        else:
+            predicates.append(Predicate(column, "eq", value))
+    return predicates[0] if len(predicates) == 1 else BooleanExpression("and", predicates)
+
+
+class _Parser:
+    """递归下降解析器
+
+    expr := and_expr (OR and_expr)*
+    and_expr := not_expr (AND not_expr)*
+    not_expr := NOT not_expr | '(' expr ')' | predicate
+    """
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = self._tokenize(text)
+        self.position = 0
+
+    def _tokenize(self, text: str) -> List[tuple]:
+        tokens = []
+        position = 0
+        text = text.rstrip()
+        while position < len(text):
+            match = TOKEN_PATTERN.match(text, position)
+            if not match or match.end() == position:
+                raise FilterSyntaxError(f"过滤表达式在第{position + 1}个字符处无法解析: {text}")
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == "word" and value.upper() in KEYWORDS:
+                kind, value = "keyword", value.upper()
+            tokens.append((kind, value))
+            position = match.end()
+        return tokens
+
+    def parse(self) -> Union[BooleanExpression, Predicate]:
+        node = self._parse_or()
+        if self.position < len(self.tokens):
+            raise FilterSyntaxError(f"过滤表达式存在多余内容: {self.tokens[self.position][1]}")
+        return node
+
+    def _peek(self) -> Optional[tuple]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _next(self) -> tuple:
+        token = self._peek()
+        if token is None:
+            raise FilterSyntaxError(f"过滤表达式不完整: {self.text}")
+        self.position += 1
+        return token
+
+    def _accept(self, kind: str, value: Optional[str] = None) -> bool:
+        token = self._peek()
+        if token and token[0] == kind and (value is None or token[1] == value):
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, kind: str, value: str) -> None:
+        if not self._accept(kind, value):
+            token = self._peek()
+            found = token[1] if token else "结尾"
+            raise FilterSyntaxError(f"过滤表达式此处应为 {value}，实际为 {found}")
+
+    def _parse_or(self) -> Union[BooleanExpression, Predicate]:
+        children = [self._parse_and()]
+        while self._accept("keyword", "OR"):
+            children.append(self._parse_and())
+        return children[0] if len(children) == 1 else BooleanExpression("or", children)
+
+    def _parse_and(self) -> Union[BooleanExpression, Predicate]:
+        children = [self._parse_not()]
+        while self._accept("keyword", "AND"):
+            children.append(self._parse_not())
+        return children[0] if len(children) == 1 else BooleanExpression("and", children)
+
+    def _parse_not(self) -> Union[BooleanExpression, Predicate]:
+        if self._accept("keyword", "NOT"):
+            return self._parse_not().negate()
+        if self._accept("symbol", "("):
+            node = self._parse_or()
+            self._expect("symbol", ")")
+            return node
+        return self._parse_predicate()
+
+    def _parse_predicate(self) -> Predicate:
+        kind, value = self._next()
+        if kind == "word":
+            column = value
+        elif kind == "quoted":
+            column = value[1:-1].replace('""', '"') if value[0] == '"' else value[1:-1]
+        else:
+            raise FilterSyntaxError(f"过滤表达式此处应为列名，实际为 {value}")
+
+        if self._accept("keyword", "IS"):
+            negated = self._accept("keyword", "NOT")
+            self._expect("keyword", "NULL")
+            return Predicate(column, "not_null" if negated else "is_null")
+
+        negated = self._accept("keyword", "NOT")
+        if self._accept("keyword", "IN"):
+            self._expect("symbol", "(")
+            values = [self._parse_literal()]
+            while self._accept("symbol", ","):
+                values.append(self._parse_literal())
+            self._expect("symbol", ")")
+            predicate = Predicate(column, "in", values)
+        elif self._accept("keyword", "BETWEEN"):
+            low = self._parse_literal()
+            self._expect("keyword", "AND")
+            predicate = Predicate(column, "between", [low, self._parse_literal()])
+        elif self._accept("keyword", "LIKE"):
+            pattern = self._parse_literal()
+            if not isinstance(pattern, str):
+                raise FilterSyntaxError("LIKE 的模式必须是字符串")
+            predicate = Predicate(column, "like", pattern)
+        elif negated:
+            raise FilterSyntaxError("NOT 之后应为 IN、BETWEEN 或 LIKE")
+        else:
+            kind, symbol = self._next()
+            if kind != "symbol" or symbol not in SYMBOL_OPS:
+                raise FilterSyntaxError(f"列 {column} 之后应为比较运算符，实际为 {symbol}")
+            predicate = Predicate(column, SYMBOL_OPS[symbol], self._parse_literal())
+        return predicate.negate() if negated else predicate
+
+    def _parse_literal(self) -> Any:
+        kind, value = self._next()
+        if kind == "number":
+            return float(value) if any(c in value for c in ".eE") else int(value)
+        if kind == "string":
+            return value[1:-1].replace("''", "'")
+        if kind == "keyword" and value in ("TRUE", "FALSE"):
+            return value == "TRUE"
+        if kind == "keyword" and value == "NULL":
+            raise FilterSyntaxError("与NULL比较请使用 IS NULL 或 IS NOT NULL")
+        raise FilterSyntaxError(f"过滤表达式此处应为常量，实际为 {value}")
+
+
+def _like_to_regex(pattern: str) -> str:
+    """将LIKE模式转换为正则表达式，%匹配任意字符串，_匹配单个字符"""
+    parts = []
+    for char in pattern:
+        if char == "%":
+            parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    return "(?s)" + "".join(parts)
+
+
+def _coerce(series: pd.Series, value: Any) -> Any:
+    """日期时间列与字符串常量比较时先转换为时间戳"""
+    if isinstance(value, str) and pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp(value)
+    return value
+
+
+def _coerce_statistic(stats: Dict[str, Any], value: Any) -> Any:
+    """将统计值和常量转换为可比较的类型，类型不匹配时返回None"""
+    kind = stats.get("kind")
+    if value is None:
+        return None
+    if kind == "datetime":
+        try:
+            return pd.Timestamp(value)
+        except (TypeError, ValueError):
+            return None
+    if kind in ("numeric", "boolean"):
+        return value if isinstance(value, (bool, int, float)) else None
+    if kind == "string":
+        return value if isinstance(value, str) else None
+    return None
+
+
+def _quote_identifier(name: str) -> str:
+    if re.fullmatch(r"[^\W\d]\w*", name) and name.upper() not in KEYWORDS:
+        return name
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _format_literal(value: Any) -> str:
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, str):
+        return "'{}'".format(value.replace("'", "''"))
+    return repr(value)
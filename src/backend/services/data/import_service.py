@@ -0,0 +1,518 @@
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Callable
+import os
+import hashlib
+import pandas as pd
+from sqlalchemy.orm import Session
+from datetime import datetime
+
+from .models import DataTable, ColumnMetadata, DataType
+from .permission import DatasetPermissionService
+from .storage import DataBlock
+from .storage_engine import StorageEngine, StorageEngineFactory
+from .profiling import TableProfiler
+from .csv_reader import iter_csv_chunks, detect_encoding, CsvEngineError
+from .config import DEFAULT_BLOCK_ROWS, HASH_CHUNK_SIZE
+
+def merge_data_type(current: DataType, new: DataType) -> DataType:
+    """合并两个数据块推断出的列类型
+
+    Args:
+        current: 已推断的类型
+        new: 新数据块推断的类型
+
+    Returns:
+        能同时容纳两者的类型
+    """
+    if current == new:
+        return current
+    if {current, new} == {DataType.INTEGER, DataType.FLOAT}:
+        return DataType.FLOAT
+    return DataType.STRING
+
+def infer_data_type(pandas_type: Any) -> DataType:
+    """从pandas数据类型推断系统数据类型
+
+    Args:
+        pandas_type: pandas数据类型
+
+    Returns:
+        系统数据类型
+    """
+    type_str = str(pandas_type).lower()
+
+    if "int" in type_str:
+        return DataType.INTEGER
+    elif "float" in type_str:
+        return DataType.FLOAT
+    elif "bool" in type_str:
+        return DataType.BOOLEAN
+    elif "datetime" in type_str:
+        return DataType.DATETIME
+    elif "date" in type_str:
+        return DataType.DATE
+    elif "object" in type_str:
+        return DataType.STRING
+    else:
+        return DataType.STRING
+
+def iter_file_chunks(file_path: str, file_format: str, chunk_rows: int,
+                     engine: Optional[str] = None) -> Iterator[pd.DataFrame]:
+    """按格式分块读取数据文件，CSV流式读取，Excel和JSON整体读入
+    
+    Args:
+        file_path: 文件路径
+        file_format: csv/excel/json
+        chunk_rows: CSV每块行数
+        engine: CSV解析引擎，为空时使用配置值
+    
+    Returns:
+        数据块迭代器
+    """
+    if file_format == "csv":
+        with open(file_path, "rb") as f:
+            yield from iter_csv_chunks(f, chunk_rows, engine=engine)
+    elif file_format == "excel":
+        yield pd.read_excel(file_path)
+    elif file_format == "json":
+        yield pd.read_json(file_path)
+    else:
+        raise ValueError(f"不支持的文件格式: {file_format}")
+
+class ImportCancelledError(Exception):
+    """导入任务被取消"""
+    pass
+
+class DataTableImportService:
+    """数据表导入服务类"""
+    
+    def __init__(self, db: Session, storage_engine: Optional[StorageEngine] = None,
+                 block_rows: int = DEFAULT_BLOCK_ROWS,
+                 progress_callback: Optional[Callable[[int, int], None]] = None):
+        """初始化导入服务
+        
+        Args:
+            db: 数据库会话
+            storage_engine: 数据块存储引擎，为空时使用默认文件存储
+            block_rows: 每个数据块的行数
+            progress_callback: 进度回调，每写入一个数据块后以(已处理行数, 已处理字节数)调用，
+                回调抛出ImportCancelledError时导入中止并清理已写入的数据
+        """
+        self.db = db
+        self.permission_service = DatasetPermissionService(db)
+        self.storage_engine = storage_engine or StorageEngineFactory.create_default_engine()
+        self.block_rows = block_rows
+        self.progress_callback = progress_callback
+    
+    def import_from_csv(self, file_path: str, dataset_id: int,
+                       table_name: str, user_id: int,
+                       description: Optional[str] = None,
+                       is_public: bool = False,
+                       tags: List[str] = None,
+                       content_hash: Optional[str] = None) -> DataTable:
+        """从CSV文件导入数据表
+        
+        Args:
+            file_path: CSV文件路径
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            description: 表描述
+            is_public: 是否公开
+            tags: 标签列表
+            content_hash: 文件内容的SHA-256哈希，为空时读取文件计算
+        
+        Returns:
+            创建的数据表
+        """
+        # 检查用户是否有权限在该数据集下创建表
+        if not self.permission_service.has_permission(dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限在该数据集下创建表")
+        
+        source = {
+            "content_hash": content_hash or self._calculate_content_hash(file_path),
+            "source_format": "csv"
+        }
+        
+        # 相同内容已导入过时直接复用已有数据块
+        existing = self._find_reusable_table(source, user_id)
+        if existing:
+            return self._create_table_from_existing(
+                existing, dataset_id, table_name, user_id, description, is_public, tags, source
+            )
+        
+        # 分块读取CSV文件，通过文件句柄位置统计已处理字节数
+        with open(file_path, "rb") as f:
+            encoding = detect_encoding(f)
+            try:
+                chunks = iter_csv_chunks(f, self.block_rows, encoding)
+                return self._create_table_from_chunks(
+                    chunks, dataset_id, table_name, user_id, description, is_public, tags,
+                    source, bytes_read=f.tell
+                )
+            except CsvEngineError:
+                # Arrow解析失败时已写入的数据已被清理，改用pandas重新导入
+                f.seek(0)
+                chunks = iter_csv_chunks(f, self.block_rows, encoding, engine="pandas")
+                return self._create_table_from_chunks(
+                    chunks, dataset_id, table_name, user_id, description, is_public, tags,
+                    source, bytes_read=f.tell
+                )
+    
+    def import_from_excel(self, file_path: str, dataset_id: int,
+                         table_name: str, user_id: int,
+                         sheet_name: Optional[str] = None,
+                         description: Optional[str] = None,
+                         is_public: bool = False,
+                         tags: List[str] = None,
+                         content_hash: Optional[str] = None) -> DataTable:
+        """从Excel文件导入数据表
+        
+        Args:
+            file_path: Excel文件路径
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            sheet_name: 工作表名称
+            description: 表描述
+            is_public: 是否公开
+            tags: 标签列表
+            content_hash: 文件内容的SHA-256哈希，为空时读取文件计算
+        
+        Returns:
+            创建的数据表
+        """
+        # 检查用户是否有权限在该数据集下创建表
+        if not self.permission_service.has_permission(dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限在该数据集下创建表")
+        
+        source = {
+            "content_hash": content_hash or self._calculate_content_hash(file_path),
+            "source_format": "excel",
+            "sheet_name": sheet_name
+        }
+        
+        # 相同内容已导入过时直接复用已有数据块
+        existing = self._find_reusable_table(source, user_id)
+        if existing:
+            return self._create_table_from_existing(
+                existing, dataset_id, table_name, user_id, description, is_public, tags, source
+            )
+        
+        # 读取Excel文件
+        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        
+        # 整个文件已读入内存，按文件大小上报已处理字节数
+        file_size = os.path.getsize(file_path)
+        
+        return self._create_table_from_chunks(
+            self._split_frame(df), dataset_id, table_name, user_id,
+            description, is_public, tags, source,
+            bytes_read=lambda: file_size
+        )
+    
+    def import_from_json(self, file_path: str, dataset_id: int,
+                        table_name: str, user_id: int,
+                        description: Optional[str] = None,
+                        is_public: bool = False,
+                        tags: List[str] = None,
+                        content_hash: Optional[str] = None) -> DataTable:
+        """从JSON文件导入数据表
+        
+        Args:
+            file_path: JSON文件路径
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            description: 表描述
+            is_public: 是否公开
+            tags: 标签列表
+            content_hash: 文件内容的SHA-256哈希，为空时读取文件计算
+        
+        Returns:
+            创建的数据表
+        """
+        # 检查用户是否有权限在该数据集下创建表
+        if not self.permission_service.has_permission(dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限在该数据集下创建表")
+        
+        source = {
+            "content_hash": content_hash or self._calculate_content_hash(file_path),
+            "source_format": "json"
+        }
+        
+        # 相同内容已导入过时直接复用已有数据块
+        existing = self._find_reusable_table(source, user_id)
+        if existing:
+            return self._create_table_from_existing(
+                existing, dataset_id, table_name, user_id, description, is_public, tags, source
+            )
+        
+        # 读取JSON文件
+        df = pd.read_json(file_path)
+        
+        # 整个文件已读入内存，按文件大小上报已处理字节数
+        file_size = os.path.getsize(file_path)
+        
+        return self._create_table_from_chunks(
+            self._split_frame(df), dataset_id, table_name, user_id,
+            description, is_public, tags, source,
+            bytes_read=lambda: file_size
+        )
+    
+    def import_from_chunks(self, chunks: Iterable[pd.DataFrame], dataset_id: int,
+                           table_name: str, user_id: int,
+                           description: Optional[str] = None,
+                           is_public: bool = False,
+                           tags: List[str] = None,
+                           source: Optional[Dict[str, Any]] = None) -> DataTable:
+        """从数据块迭代器创建数据表，如管道执行结果，数据块逐个写入
+        
+        Args:
+            chunks: 数据块迭代器，每个数据块写为一个存储块，空数据块被跳过
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            description: 表描述
+            is_public: 是否公开
+            tags: 标签列表
+            source: 数据来源信息，记录在表元数据中
+        
+        Returns:
+            创建的数据表
+        """
+        if not self.permission_service.has_permission(dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限在该数据集下创建表")
+        
+        chunks = (chunk for chunk in chunks if len(chunk))
+        return self._create_table_from_chunks(
+            chunks, dataset_id, table_name, user_id, description, is_public, tags, source or {}
+        )
+    
+    def copy_table(self, existing: DataTable, dataset_id: int, table_name: str, user_id: int,
+                   description: Optional[str] = None,
+                   source: Optional[Dict[str, Any]] = None) -> DataTable:
+        """基于已有数据表创建新表，新表引用已有的数据块而不复制数据
+        
+        Args:
+            existing: 已有数据表
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            description: 表描述
+            source: 数据来源信息，记录在表元数据中
+        
+        Returns:
+            创建的数据表
+        """
+        if not self.permission_service.has_permission(dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限在该数据集下创建表")
+        
+        return self._create_table_from_existing(
+            existing, dataset_id, table_name, user_id, description, False, None, source or {}
+        )
+    
+    def _calculate_content_hash(self, file_path: str) -> str:
+        """流式计算文件内容的SHA-256哈希
+        
+        Args:
+            file_path: 文件路径
+        
+        Returns:
+            文件内容哈希
+        """
+        sha256_hash = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for byte_block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                sha256_hash.update(byte_block)
+        return sha256_hash.hexdigest()
+    
+    def _find_reusable_table(self, source: Dict[str, Any], user_id: int) -> Optional[DataTable]:
+        """查找内容相同且用户可见的已导入数据表
+        
+        Args:
+            source: 导入来源信息(内容哈希、格式及读取选项)
+            user_id: 用户ID
+        
+        Returns:
+            可复用的数据表，不存在时返回None
+        """
+        candidates = self.db.query(DataTable).filter(
+            DataTable.metadata["content_hash"].astext == source["content_hash"]
+        ).order_by(DataTable.created_at).all()
+        
+        for candidate in candidates:
+            # 格式或读取选项不同时解析结果可能不同，不能复用
+            if any(candidate.metadata.get(key) != value for key, value in source.items()):
+                continue
+            if candidate.is_public or self.permission_service.has_permission(
+                candidate.dataset_id, user_id, "VIEWER"
+            ):
+                return candidate
+        
+        return None
+    
+    def _create_table_from_existing(self, existing: DataTable, dataset_id: int,
+                                    table_name: str, user_id: int,
+                                    description: Optional[str],
+                                    is_public: bool,
+                                    tags: Optional[List[str]],
+                                    source: Dict[str, Any]) -> DataTable:
+        """基于已导入的数据表创建新表，新表引用已有的数据块而不重新解析
+        
+        Args:
+            existing: 内容相同的已有数据表
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            description: 表描述
+            is_public: 是否公开
+            tags: 标签列表
+            source: 导入来源信息
+        
+        Returns:
+            创建的数据表
+        """
+        table = DataTable(
+            dataset_id=dataset_id,
+            name=table_name,
+            description=description,
+            columns=[ColumnMetadata(**col.dict()) for col in existing.columns],
+            created_by=user_id,
+            is_public=is_public,
+            tags=tags or [],
+            row_count=existing.row_count,
+            metadata={**source, "deduplicated_from": existing.id}
+        )
+        self.db.add(table)
+        self.db.commit()
+        self.db.refresh(table)
+        
+        blocks = self.db.query(DataBlock).filter(
+            DataBlock.table_id == existing.id
+        ).order_by(DataBlock.block_index).all()
+        
+        # 新数据块与原数据块指向同一份存储文件
+        for block in blocks:
+            self.db.add(DataBlock(
+                table_id=table.id,
+                block_index=block.block_index,
+                start_row=block.start_row,
+                end_row=block.end_row,
+                row_count=block.row_count,
+                file_path=block.file_path,
+                checksum=block.checksum,
+                statistics=block.statistics
+            ))
+        self.db.commit()
+        
+        return table
+    
+    def _create_table_from_chunks(self, chunks: Iterable[pd.DataFrame], dataset_id: int,
+                                  table_name: str, user_id: int,
+                                  description: Optional[str],
+                                  is_public: bool,
+                                  tags: Optional[List[str]],
+                                  source: Dict[str, Any],
+                                  bytes_read: Optional[Callable[[], int]] = None) -> DataTable:
+        """创建数据表并将数据逐块写入存储引擎
+        
+        Args:
+            chunks: 数据块迭代器
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            description: 表描述
+            is_public: 是否公开
+            tags: 标签列表
+            source: 导入来源信息
+            bytes_read: 返回已读取源文件字节数的函数，用于进度上报
+        
+        Returns:
+            创建的数据表
+        """
+        table = DataTable(
+            dataset_id=dataset_id,
+            name=table_name,
+            description=description,
+            columns=[],
+            created_by=user_id,
+            is_public=is_public,
+            tags=tags or [],
+            metadata=dict(source)
+        )
+        self.db.add(table)
+        self.db.commit()
+        self.db.refresh(table)
+        
+        row_count = 0
+        columns: Dict[str, DataType] = {}
+        blocks: List[DataBlock] = []
+        profiler = TableProfiler()
+        try:
+            for block_index, chunk in enumerate(chunks):
+                # 推断列类型，后续数据块类型不一致时放宽类型
+                for col_name, col_type in chunk.dtypes.items():
+                    data_type = infer_data_type(col_type)
+                    if col_name in columns:
+                        data_type = merge_data_type(columns[col_name], data_type)
+                    columns[col_name] = data_type
+                
+                # 数据块经过时顺带计算列统计，块统计保存在块上，并合并为整表统计
+                block_profile = TableProfiler.profile(chunk)
+                profiler.merge(block_profile)
+                
+                block = DataBlock(
+                    table_id=table.id,
+                    block_index=block_index,
+                    start_row=row_count,
+                    end_row=row_count + len(chunk) - 1,
+                    row_count=len(chunk),
+                    checksum="",
+                    statistics=block_profile.to_statistics()
+                )
+                self.db.add(block)
+                self.db.flush()
+                self.storage_engine.save_block(block, chunk)
+                blocks.append(block)
+                row_count += len(chunk)
+                
+                if self.progress_callback:
+                    self.progress_callback(row_count, bytes_read() if bytes_read else 0)
+        except Exception:
+            # 导入失败或被取消时清理已写入的数据块和表记录
+            self.db.rollback()
+            for block in blocks:
+                self.storage_engine.delete_block(block)
+            self.db.query(DataBlock).filter(DataBlock.table_id == table.id).delete()
+            self.db.delete(table)
+            self.db.commit()
+            raise
+        
+        statistics = profiler.to_statistics()
+        table.columns = [
+            ColumnMetadata(
+                name=col_name,
+                type=data_type,
+                is_nullable=True,
+                statistics=statistics.get(str(col_name), {})
+            )
+            for col_name, data_type in columns.items()
+        ]
+        table.row_count = row_count
+        table.updated_at = datetime.utcnow()
+        self.db.commit()
+        self.db.refresh(table)
+        
+        return table
+    
+    def _split_frame(self, df: pd.DataFrame) -> Iterable[pd.DataFrame]:
+        """将已读入内存的数据按块大小切分
+        
+        Args:
+            df: 数据
+        
+        Returns:
+            数据块迭代器
+        """
+        for start in range(0, max(len(df), 1), self.block_rows):
+            yield df.iloc[start:start + self.block_rows]
@@ -0,0 +1,332 @@
+"""
+二级索引模块
+
+为数据表的指定列建立二级索引，记录每个非空值所在的 (数据块索引, 块内行偏移)。
+哈希索引用于等值查找，有序索引同时支持等值和范围查找。索引以Parquet文件保存在
+数据块存储目录旁，文件信息记录在 DataTable.metadata["indexes"] 中；每次更新写入
+新版本的文件，已加载的索引按文件路径缓存在进程内。
+
+查找时只读取命中的数据块中命中行所在的行组。
+"""
+
+import os
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .models import DataTable, DataType
+from .storage import DataBlock
+from .storage_engine import StorageEngine
+from .config import INDEX_CONFIG
+
+logger = logging.getLogger(__name__)
+
+INDEX_KINDS = ("hash", "sorted")
+
+# 已加载的索引，键为索引文件路径（每个版本的路径不同，文件内容不会改变）
+_index_cache: "OrderedDict[str, LoadedIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+class LoadedIndex:
+    """加载到内存中的索引"""
+
+    def __init__(self, kind: str, entries: pd.DataFrame) -> None:
+        self.kind = kind
+        values = entries["value"].to_numpy()
+        if kind == "sorted":
+            order = np.argsort(values, kind="stable")
+            self.values = values[order]
+            self.block_index = entries["block_index"].to_numpy()[order]
+            self.row_offset = entries["row_offset"].to_numpy()[order]
+            self.positions: Dict[Any, np.ndarray] = {}
+        else:
+            self.values = values
+            self.block_index = entries["block_index"].to_numpy()
+            self.row_offset = entries["row_offset"].to_numpy()
+            self.positions = pd.Series(values).groupby(values, sort=False).indices
+
+    def find_equal(self, values: Sequence[Any]) -> np.ndarray:
+        """查找等于任一给定值的条目位置"""
+        if self.kind == "hash":
+            found = [self.positions[value] for value in values if value in self.positions]
+            return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+        ranges = [self._range_positions(value, value, True, True) for value in values]
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def find_range(self, low: Any = None, high: Any = None,
+                   include_low: bool = True, include_high: bool = True) -> np.ndarray:
+        """查找落在区间内的条目位置，只有有序索引支持"""
+        if self.kind != "sorted":
+            raise ValueError("哈希索引不支持范围查找，请使用有序索引")
+        return self._range_positions(low, high, include_low, include_high)
+
+    def _range_positions(self, low: Any, high: Any,
+                         include_low: bool, include_high: bool) -> np.ndarray:
+        start = 0 if low is None else np.searchsorted(
+            self.values, low, side="left" if include_low else "right"
+        )
+        end = len(self.values) if high is None else np.searchsorted(
+            self.values, high, side="right" if include_high else "left"
+        )
+        return np.arange(start, max(start, end), dtype=np.int64)
+
+    def locate(self, positions: np.ndarray) -> Dict[int, np.ndarray]:
+        """
+        将条目位置按数据块分组
+
+        Returns:
+            Dict[int, np.ndarray]: 数据块索引到块内行偏移（升序）的映射
+        """
+        blocks = self.block_index[positions]
+        offsets = self.row_offset[positions]
+        order = np.lexsort((offsets, blocks))
+        blocks, offsets = blocks[order], offsets[order]
+        result = {}
+        for block_index in np.unique(blocks):
+            result[int(block_index)] = offsets[blocks == block_index]
+        return result
+
+
+class TableIndexer:
+    """数据表二级索引的建立、维护与查找"""
+
+    def __init__(self, storage_engine: StorageEngine, index_dir: Optional[str] = None) -> None:
+        self.storage_engine = storage_engine
+        self.index_dir = index_dir or INDEX_CONFIG["dir"]
+
+    def create(self, table: DataTable, blocks: List[DataBlock], column: str,
+               kind: str = "hash") -> List[str]:
+        """
+        扫描数据块的指定列建立索引，并记录到数据表元数据中
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 数据表的所有数据块
+            column (str): 索引列
+            kind (str): hash或sorted
+
+        Returns:
+            List[str]: 被替换的旧索引文件，应在元数据提交后删除
+        """
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"不支持的索引类型: {kind}，可选 {', '.join(INDEX_KINDS)}")
+        if column not in [col.name for col in table.columns]:
+            raise ValueError(f"数据表不存在列: {column}")
+
+        entries = pd.concat(
+            [self._block_entries(table, block, column) for block in blocks] or [_empty_entries()],
+            ignore_index=True
+        )
+        indexes = dict(self.indexes(table))
+        obsolete = [indexes[column]["path"]] if column in indexes else []
+        indexes[column] = self._write(table, column, kind, entries)
+        self._set_indexes(table, indexes)
+        return obsolete
+
+    def drop(self, table: DataTable, column: str) -> List[str]:
+        """
+        删除索引
+
+        Returns:
+            List[str]: 应在元数据提交后删除的索引文件
+        """
+        indexes = dict(self.indexes(table))
+        if column not in indexes:
+            raise ValueError(f"列 {column} 没有索引")
+        info = indexes.pop(column)
+        self._set_indexes(table, indexes)
+        return [info["path"]]
+
+    def update(self, table: DataTable, blocks: Iterable[DataBlock],
+               removed: Iterable[int] = ()) -> List[str]:
+        """
+        数据块被追加或重写后更新所有索引：移除这些块索引位置上的旧条目并加入新条目
+
+        Args:
+            table (DataTable): 数据表
+            blocks (Iterable[DataBlock]): 新写入的数据块（重写的块沿用原块索引）
+            removed (Iterable[int]): 已不存在的块索引，这些位置上的旧条目一并移除
+
+        Returns:
+            List[str]: 被替换的旧索引文件，应在元数据提交后删除
+        """
+        indexes = dict(self.indexes(table))
+        blocks = list(blocks)
+        removed = set(removed)
+        if not indexes or not (blocks or removed):
+            return []
+
+        changed = {block.block_index for block in blocks} | removed
+        obsolete = []
+        for column, info in indexes.items():
+            entries = pd.read_parquet(info["path"])
+            entries = entries[~entries["block_index"].isin(changed)]
+            entries = pd.concat(
+                [entries] + [self._block_entries(table, block, column) for block in blocks],
+                ignore_index=True
+            )
+            indexes[column] = self._write(table, column, info["kind"], entries)
+            obsolete.append(info["path"])
+        self._set_indexes(table, indexes)
+        return obsolete
+
+    def lookup(self, table: DataTable, blocks: List[DataBlock], column: str,
+               values: Optional[Sequence[Any]] = None, low: Any = None, high: Any = None,
+               columns: Optional[List[str]] = None,
+               limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        通过索引查找行，只读取命中行所在的数据块和行组
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 数据表的所有数据块
+            column (str): 索引列
+            values (Optional[Sequence[Any]]): 等值查找的值，指定时忽略low和high
+            low (Any): 范围下界（含），为空表示不限
+            high (Any): 范围上界（含），为空表示不限
+            columns (Optional[List[str]]): 返回的列，为空时返回全部列
+            limit (Optional[int]): 最多返回的行数
+
+        Returns:
+            pd.DataFrame: 命中的行，按在表中的顺序排列
+        """
+        info = self.indexes(table).get(column)
+        if info is None:
+            raise ValueError(f"列 {column} 没有索引")
+
+        column_type = _column_type(table, column)
+        index = self._load(info)
+        if values is not None:
+            positions = index.find_equal([coerce_value(value, column_type) for value in values])
+        else:
+            positions = index.find_range(coerce_value(low, column_type),
+                                         coerce_value(high, column_type))
+
+        blocks_by_index = {block.block_index: block for block in blocks}
+        frames = []
+        remaining = limit
+        for block_index, offsets in sorted(index.locate(positions).items()):
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                offsets = offsets[:remaining]
+                remaining -= len(offsets)
+            frames.append(
+                self.storage_engine.take_rows(blocks_by_index[block_index], offsets, columns)
+            )
+        if not frames:
+            names = columns or [col.name for col in table.columns]
+            return pd.DataFrame(columns=names)
+        return pd.concat(frames, ignore_index=True)
+
+    def indexes(self, table: DataTable) -> Dict[str, Dict[str, Any]]:
+        """数据表已建立的索引，列名到索引信息的映射"""
+        return (table.metadata or {}).get("indexes", {})
+
+    def _block_entries(self, table: DataTable, block: DataBlock, column: str) -> pd.DataFrame:
+        values = self.storage_engine.load_block(block, [column])[column]
+        present = values.notna().to_numpy()
+        if _column_type(table, column) == DataType.STRING:
+            # 各数据块推断的类型可能不同，字符串列统一按字符串索引
+            values = values.astype(str)
+        return pd.DataFrame({
+            "value": values[present].reset_index(drop=True),
+            "block_index": np.full(int(present.sum()), block.block_index, dtype=np.int64),
+            "row_offset": np.flatnonzero(present).astype(np.int64),
+        })
+
+    def _write(self, table: DataTable, column: str, kind: str,
+               entries: pd.DataFrame) -> Dict[str, Any]:
+        """写入新版本的索引文件"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        if kind == "sorted":
+            entries = entries.sort_values("value", kind="stable")
+        path = os.path.join(
+            self.index_dir, f"table_{table.id}_{uuid.uuid4().hex}.parquet"
+        )
+        entries.to_parquet(path, index=False)
+        return {
+            "column": column,
+            "kind": kind,
+            "path": path,
+            "entries": len(entries),
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+
+    def _set_indexes(self, table: DataTable, indexes: Dict[str, Dict[str, Any]]) -> None:
+        # 重新赋值整个字典，使ORM检测到JSON字段的变化
+        table.metadata = {**(table.metadata or {}), "indexes": indexes}
+
+    def _load(self, info: Dict[str, Any]) -> LoadedIndex:
+        path = info["path"]
+        with _index_cache_lock:
+            if path in _index_cache:
+                _index_cache.move_to_end(path)
+                return _index_cache[path]
+
+        index = LoadedIndex(info["kind"], pd.read_parquet(path))
+        with _index_cache_lock:
+            _index_cache[path] = index
+            while len(_index_cache) > INDEX_CONFIG["cache_size"]:
+                _index_cache.popitem(last=False)
+        return index
+
+
+def remove_index_files(paths: Iterable[str]) -> None:
+    """删除不再使用的索引文件"""
+    for path in paths:
+        with _index_cache_lock:
+            _index_cache.pop(path, None)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except OSError as e:
+            logger.warning(f"删除索引文件失败: {path}: {e}")
+
+
+def coerce_value(value: Any, data_type: DataType) -> Any:
+    """
+    将查找值（如查询参数中的字符串）转换为与列类型一致的值
+
+    Args:
+        value (Any): 查找值
+        data_type (DataType): 列类型
+
+    Returns:
+        Any: 转换后的值，为空时返回None
+    """
+    if value is None:
+        return None
+    try:
+        if data_type == DataType.STRING:
+            return str(value)
+        if data_type == DataType.INTEGER:
+            return int(value)
+        if data_type == DataType.FLOAT:
+            return float(value)
+        if data_type == DataType.BOOLEAN and isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "yes")
+        if data_type in (DataType.DATE, DataType.DATETIME):
+            return np.datetime64(pd.Timestamp(value))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"查找值 {value!r} 与列类型 {data_type.value} 不匹配") from e
+    return value
+
+
+def _empty_entries() -> pd.DataFrame:
+    return pd.DataFrame({
+        "value": pd.Series(dtype="object"),
+        "block_index": pd.Series(dtype="int64"),
+        "row_offset": pd.Series(dtype="int64"),
+    })
+
+
+def _column_type(table: DataTable, column: str) -> DataType:
+    return {col.name: col.type for col in table.columns}[column]
@@ -0,0 +1,111 @@
+from typing import Dict, Any, Optional
+from sqlalchemy.orm import Session
+from celery.result import AsyncResult
+
+from .permission import DatasetPermissionService
+from .tasks import celery_app, import_table_task, job_key
+from .config import IMPORT_JOB_CONFIG
+from ...common.cache.redis_client import get_redis_connection
+
+SUPPORTED_IMPORT_FORMATS = ("csv", "excel", "json")
+
+class ImportJobService:
+    """后台导入任务服务类"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.permission_service = DatasetPermissionService(db)
+        self.redis = get_redis_connection()
+
+    def submit_import(self, file_format: str, file_path: str, dataset_id: int,
+                      table_name: str, user_id: int,
+                      options: Optional[Dict[str, Any]] = None) -> str:
+        """提交后台导入任务
+
+        Args:
+            file_format: 文件格式(csv/excel/json)
+            file_path: 已上传文件的路径
+            dataset_id: 数据集ID
+            table_name: 表名
+            user_id: 用户ID
+            options: 传给导入方法的其他参数
+
+        Returns:
+            任务ID
+        """
+        if file_format not in SUPPORTED_IMPORT_FORMATS:
+            raise ValueError(f"不支持的导入格式: {file_format}")
+
+        # 提交前检查权限，避免无权限的任务占用工作进程
+        if not self.permission_service.has_permission(dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限在该数据集下创建表")
+
+        result = import_table_task.delay(
+            file_format, file_path, dataset_id, table_name, user_id, options or {}
+        )
+        self.redis.set(job_key(result.id, "owner"), user_id, ex=IMPORT_JOB_CONFIG["ttl"])
+
+        return result.id
+
+    def get_status(self, job_id: str, user_id: int) -> Dict[str, Any]:
+        """获取导入任务状态和进度
+
+        Args:
+            job_id: 任务ID
+            user_id: 用户ID
+
+        Returns:
+            任务状态信息
+        """
+        self._check_owner(job_id, user_id)
+
+        result = AsyncResult(job_id, app=celery_app)
+        status = {
+            "job_id": job_id,
+            "status": result.state.lower(),
+            "rows": 0,
+            "bytes": 0,
+            "total_bytes": None,
+            "table_id": None,
+            "error": None
+        }
+
+        if result.failed():
+            status["error"] = str(result.result)
+        elif isinstance(result.info, dict):
+            for field in ("rows", "bytes", "total_bytes", "table_id", "error"):
+                if field in result.info:
+                    status[field] = result.info[field]
+
+        # 已请求取消但工作进程尚未响应时也视为取消中
+        if not result.ready() and self.redis.exists(job_key(job_id, "cancel")):
+            status["status"] = "cancelling"
+
+        return status
+
+    def cancel(self, job_id: str, user_id: int) -> None:
+        """取消导入任务
+
+        Args:
+            job_id: 任务ID
+            user_id: 用户ID
+        """
+        self._check_owner(job_id, user_id)
+
+        # 运行中的任务在写完当前数据块后检查取消标记并清理已写入的数据
+        self.redis.set(job_key(job_id, "cancel"), 1, ex=IMPORT_JOB_CONFIG["ttl"])
+        # 尚未开始的任务直接从队列中撤销
+        celery_app.control.revoke(job_id)
+
+    def _check_owner(self, job_id: str, user_id: int) -> None:
+        """检查任务是否属于该用户
+
+        Args:
+            job_id: 任务ID
+            user_id: 用户ID
+        """
+        owner = self.redis.get(job_key(job_id, "owner"))
+        if owner is None:
+            raise ValueError("导入任务不存在")
+        if str(owner) != str(user_id):
+            raise PermissionError("用户没有权限访问该导入任务")
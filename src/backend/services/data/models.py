@@ -131,11 +131,24 @@ class TablePreview(BaseModel):
 
 class TableExport(BaseModel):
     """数据表导出配置"""
-    format: str = Field(..., description="导出格式(csv/excel/json)")
+    format: str = Field(..., description="导出格式(csv/json/parquet)")
     include_header: bool = Field(True, description="是否包含表头")
     encoding: str = Field("utf-8", description="文件编码")
     delimiter: str = Field(",", description="分隔符(CSV格式)")
     compression: bool = Field(False, description="是否压缩")
     selected_columns: Optional[List[str]] = Field(None, description="选中的列")
-    filters: Optional[Dict[str, Any]] = Field(None, description="过滤条件")
-    sort_by: Optional[List[Dict[str, str]]] = Field(None, description="排序条件") 
\ No newline at end of file
+    filters: Optional[Union[str, Dict[str, Any]]] = Field(
+        None, description="过滤条件，表达式字符串或{列: 值}字典"
+    )
+    sort_by: Optional[List[Dict[str, str]]] = Field(None, description="排序条件")
+
+class TableQuery(BaseModel):
+    """数据表查询"""
+    sql: Optional[str] = Field(None, description="受限SQL查询，指定时忽略其余字段")
+    select: List[Union[str, Dict[str, Any]]] = Field(
+        default_factory=list, description="查询列或聚合，如 region、sum(gdp) AS total，为空时查询全部列"
+    )
+    where: Optional[Union[str, Dict[str, Any]]] = Field(None, description="过滤条件")
+    group_by: List[str] = Field(default_factory=list, description="分组列")
+    order_by: Optional[List[Dict[str, str]]] = Field(None, description="排序条件")
+    limit: Optional[int] = Field(None, ge=0, description="返回行数")
@@ -0,0 +1,370 @@
+"""
+数据表增量写入模块
+
+向已有数据表追加行或按主键更新插入行。追加只写入新的数据块；更新插入只重写
+包含变更主键的数据块，未变更的数据块保持不动。行数和列统计由各数据块已保存的
+块统计合并得出，不需要重新扫描数据。
+
+重组按给定顺序保留部分原有数据块并写入新的数据块，如管道结果表的增量更新。
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from .models import DataTable, ColumnMetadata, DataType
+from .storage import DataBlock
+from .storage_engine import StorageEngine
+from .profiling import TableProfiler
+from .index import TableIndexer, remove_index_files
+from .import_service import infer_data_type, merge_data_type
+from .config import DEFAULT_BLOCK_ROWS
+
+logger = logging.getLogger(__name__)
+
+
+class TableMutator:
+    """数据表增量写入器"""
+
+    def __init__(self, db: Session, storage_engine: StorageEngine,
+                 block_rows: int = DEFAULT_BLOCK_ROWS) -> None:
+        self.db = db
+        self.storage_engine = storage_engine
+        self.block_rows = block_rows
+
+    def append(self, table: DataTable, blocks: List[DataBlock],
+               chunks: Iterable[pd.DataFrame]) -> DataTable:
+        """
+        向数据表追加行
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 数据表现有的数据块，按块索引排序
+            chunks (Iterable[pd.DataFrame]): 追加的数据
+
+        Returns:
+            DataTable: 更新后的数据表
+        """
+        written: List[DataBlock] = []
+        types = {col.name: col.type for col in table.columns}
+        try:
+            appended = self._write_blocks(table, blocks, chunks, written, types)
+            # 追加不改变已有数据块，表统计在原有基础上合并新块的统计即可
+            profiler = TableProfiler.from_statistics(
+                {col.name: col.statistics for col in table.columns}
+            )
+            for block in written:
+                profiler.merge(TableProfiler.from_statistics(block.statistics))
+            self._update_table(table, profiler, table.row_count + appended, types)
+            obsolete = TableIndexer(self.storage_engine).update(table, written)
+            self.db.commit()
+        except Exception:
+            self._discard(written)
+            raise
+
+        remove_index_files(obsolete)
+        self.db.refresh(table)
+        return table
+
+    def upsert(self, table: DataTable, blocks: List[DataBlock],
+               data: pd.DataFrame) -> Dict[str, Any]:
+        """
+        按主键更新插入行：主键已存在的行更新数据中给出的列，其余行追加到表尾
+
+        Args:
+            table (DataTable): 数据表，须在列定义中声明主键
+            blocks (List[DataBlock]): 数据表现有的数据块，按块索引排序
+            data (pd.DataFrame): 更新插入的数据，须包含全部主键列
+
+        Returns:
+            Dict[str, Any]: 更新行数、插入行数和重写的数据块数
+        """
+        keys = [col.name for col in table.columns if col.is_primary_key]
+        if not keys:
+            raise ValueError("数据表未声明主键，无法更新插入")
+        missing = [key for key in keys if key not in data.columns]
+        if missing:
+            raise ValueError(f"更新插入的数据缺少主键列: {', '.join(missing)}")
+        self._check_columns(table, data)
+
+        # 同一主键出现多次时以最后一次为准
+        data = data.drop_duplicates(subset=keys, keep="last")
+        updates = data.set_index(keys)
+        remaining = pd.Series(True, index=updates.index)
+
+        replaced: List[DataBlock] = []
+        written: List[DataBlock] = []
+        types = {col.name: col.type for col in table.columns}
+        updated = 0
+        try:
+            for block in self._candidate_blocks(blocks, keys, data):
+                # 先只读主键列确认命中，命中的数据块才整块读取并重写
+                block_keys = _key_index(self.storage_engine.load_block(block, keys), keys)
+                matched = block_keys.isin(updates.index)
+                if not matched.any():
+                    continue
+
+                rewritten = self._apply_updates(
+                    self.storage_engine.load_block(block), keys, updates
+                )
+                written.append(
+                    self._save_block(table, rewritten, block.block_index, block.start_row, types)
+                )
+                replaced.append(block)
+                matched_keys = block_keys[matched].unique()
+                updated += len(matched_keys)
+                remaining.loc[matched_keys] = False
+
+            for block in replaced:
+                self.db.delete(block)
+            self.db.flush()
+
+            replaced_ids = {block.id for block in replaced}
+            current = [block for block in blocks if block.id not in replaced_ids] + written
+            current.sort(key=lambda block: block.block_index)
+            rewritten_count = len(written)
+            inserted = self._write_blocks(
+                table, current, [data[remaining.to_numpy()]], written, types
+            )
+            current += written[rewritten_count:]
+
+            # 重写的数据块无法从表统计中扣除旧值，改为合并所有数据块的块统计
+            profiler = TableProfiler()
+            for block in current:
+                profiler.merge(TableProfiler.from_statistics(block.statistics))
+            self._update_table(table, profiler, table.row_count + inserted, types)
+            obsolete = TableIndexer(self.storage_engine).update(table, written)
+            self.db.commit()
+        except Exception:
+            self._discard(written)
+            raise
+
+        remove_index_files(obsolete)
+        # 提交后再删除被替换的数据块文件，被其他表共享的文件保留
+        for block in replaced:
+            self._delete_block_file(block)
+
+        self.db.refresh(table)
+        return {
+            "table_id": table.id,
+            "updated": updated,
+            "inserted": inserted,
+            "blocks_rewritten": len(replaced),
+            "row_count": table.row_count,
+        }
+
+    def rebuild(self, table: DataTable, blocks: List[DataBlock],
+                layout: Iterable[Union[DataBlock, pd.DataFrame]],
+                reset_columns: bool = False) -> List[Optional[DataBlock]]:
+        """
+        按给定顺序重组数据表：保留的数据块只更新块索引和行号，新数据写为新的数据块，
+        未出现在layout中的原有数据块被删除
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 数据表现有的数据块，按块索引排序
+            layout (Iterable[Union[DataBlock, pd.DataFrame]]): 重组后的内容，依次为保留的
+                原有数据块或新数据，空数据不写入
+            reset_columns (bool): 按新数据重新推断列定义，此时layout中不能有保留的数据块
+
+        Returns:
+            List[Optional[DataBlock]]: 与layout一一对应的数据块，空数据对应None
+        """
+        existing = {block.id: block for block in blocks}
+        types = {} if reset_columns else {col.name: col.type for col in table.columns}
+        result: List[Optional[DataBlock]] = []
+        written: List[DataBlock] = []
+        moved: List[DataBlock] = []
+        block_index = row_count = 0
+        try:
+            for item in layout:
+                if isinstance(item, DataBlock):
+                    if reset_columns or item.id not in existing:
+                        raise ValueError("重组的数据块不属于该数据表")
+                    if (item.block_index, item.start_row) != (block_index, row_count):
+                        item.block_index = block_index
+                        item.start_row = row_count
+                        item.end_row = row_count + item.row_count - 1
+                        moved.append(item)
+                    result.append(item)
+                    block_index += 1
+                    row_count += item.row_count
+                    continue
+
+                if not len(item):
+                    result.append(None)
+                    continue
+                if reset_columns:
+                    for name, dtype in item.dtypes.items():
+                        types.setdefault(name, infer_data_type(dtype))
+                else:
+                    self._check_columns(table, item)
+                    item = item.reindex(columns=list(types))
+                block = self._save_block(
+                    table, item.reset_index(drop=True), block_index, row_count, types
+                )
+                written.append(block)
+                result.append(block)
+                block_index += 1
+                row_count += block.row_count
+
+            kept = {block.id for block in result if block is not None}
+            removed = [block for block in blocks if block.id not in kept]
+            for block in removed:
+                self.db.delete(block)
+            self.db.flush()
+
+            indexer = TableIndexer(self.storage_engine)
+            obsolete: List[str] = []
+            if reset_columns:
+                table.columns = [
+                    ColumnMetadata(name=name, type=data_type, is_nullable=True)
+                    for name, data_type in types.items()
+                ]
+                # 列已不存在的索引无法更新，直接删除
+                for column in list(indexer.indexes(table)):
+                    if column not in types:
+                        obsolete += indexer.drop(table, column)
+
+            profiler = TableProfiler()
+            for block in result:
+                if block is not None:
+                    profiler.merge(TableProfiler.from_statistics(block.statistics))
+            self._update_table(table, profiler, row_count, types)
+            # 块索引超出重组后块数的位置已没有数据块
+            last_index = blocks[-1].block_index if blocks else -1
+            obsolete += indexer.update(table, moved + written, range(block_index, last_index + 1))
+            self.db.commit()
+        except Exception:
+            self._discard(written)
+            raise
+
+        remove_index_files(obsolete)
+        for block in removed:
+            self._delete_block_file(block)
+
+        self.db.refresh(table)
+        return result
+
+    def _check_columns(self, table: DataTable, data: pd.DataFrame) -> None:
+        table_columns = {col.name for col in table.columns}
+        unknown = [str(col) for col in data.columns if col not in table_columns]
+        if unknown:
+            raise ValueError(f"数据表不存在列: {', '.join(unknown)}")
+
+    def _candidate_blocks(self, blocks: List[DataBlock], keys: List[str],
+                          data: pd.DataFrame) -> List[DataBlock]:
+        """根据首个主键列的块统计跳过不可能包含这些主键的数据块"""
+        values = data[keys[0]].dropna()
+        if values.empty:
+            return list(blocks)
+        low, high = values.min(), values.max()
+
+        candidates = []
+        for block in blocks:
+            stats = (block.statistics or {}).get(keys[0]) or {}
+            block_min, block_max = stats.get("min"), stats.get("max")
+            try:
+                if block_min is not None and (high < block_min or low > block_max):
+                    continue
+            except TypeError:
+                pass
+            candidates.append(block)
+        return candidates
+
+    def _apply_updates(self, data: pd.DataFrame, keys: List[str],
+                       updates: pd.DataFrame) -> pd.DataFrame:
+        """用更新数据覆盖数据块中主键匹配的行，只覆盖更新数据中给出的列"""
+        columns = list(data.columns)
+        indexed = data.set_index(keys)
+        matched = indexed.index.isin(updates.index)
+        patch = updates.reindex(indexed.index[matched])
+        for column in updates.columns:
+            values = indexed[column].astype(object)
+            values[matched] = patch[column].to_numpy()
+            indexed[column] = values.infer_objects()
+        return indexed.reset_index()[columns]
+
+    def _write_blocks(self, table: DataTable, blocks: List[DataBlock],
+                      chunks: Iterable[pd.DataFrame], written: List[DataBlock],
+                      types: Dict[str, DataType]) -> int:
+        """将数据切分为数据块写在表尾，写入的数据块加入written，返回写入的行数"""
+        next_index = blocks[-1].block_index + 1 if blocks else 0
+        next_row = table.row_count
+        table_columns = [col.name for col in table.columns]
+        appended = 0
+        for chunk in chunks:
+            self._check_columns(table, chunk)
+            # 缺少的列补为空值，列顺序与数据表一致
+            chunk = chunk.reindex(columns=table_columns)
+            for start in range(0, len(chunk), self.block_rows):
+                part = chunk.iloc[start:start + self.block_rows].reset_index(drop=True)
+                written.append(self._save_block(table, part, next_index, next_row, types))
+                next_index += 1
+                next_row += len(part)
+                appended += len(part)
+        return appended
+
+    def _save_block(self, table: DataTable, data: pd.DataFrame, block_index: int,
+                    start_row: int, types: Dict[str, DataType]) -> DataBlock:
+        """写入一个数据块，并按块中数据放宽列类型"""
+        for name, dtype in data.dtypes.items():
+            # 全为空值的列（如追加数据中缺少的列）不参与类型推断
+            if name in types and data[name].notna().any():
+                types[name] = merge_data_type(types[name], infer_data_type(dtype))
+
+        block = DataBlock(
+            table_id=table.id,
+            block_index=block_index,
+            start_row=start_row,
+            end_row=start_row + len(data) - 1,
+            row_count=len(data),
+            checksum="",
+            statistics=TableProfiler.profile(data).to_statistics()
+        )
+        self.db.add(block)
+        self.db.flush()
+        self.storage_engine.save_block(block, data)
+        return block
+
+    def _update_table(self, table: DataTable, profiler: TableProfiler, row_count: int,
+                      types: Dict[str, DataType]) -> None:
+        """更新行数、列类型和列统计"""
+        statistics = profiler.to_statistics()
+        table.columns = [
+            ColumnMetadata(**{**col.dict(), "type": types[col.name],
+                              "statistics": statistics.get(col.name, col.statistics)})
+            for col in table.columns
+        ]
+        table.row_count = row_count
+        # 内容已不同于导入时的源文件，不能再作为重复导入的复用对象
+        table.metadata = {key: value for key, value in (table.metadata or {}).items()
+                          if key != "content_hash"}
+        table.updated_at = datetime.utcnow()
+
+    def _discard(self, written: List[DataBlock]) -> None:
+        """写入失败时回滚并删除已写入的数据块文件"""
+        self.db.rollback()
+        for block in written:
+            self.storage_engine.delete_block(block)
+
+    def _delete_block_file(self, block: DataBlock) -> None:
+        """删除数据块文件，文件仍被其他数据块（重复导入复用）引用时保留"""
+        if block.file_path and self.db.query(DataBlock).filter(
+            DataBlock.file_path == block.file_path
+        ).count():
+            return
+        try:
+            self.storage_engine.delete_block(block)
+        except Exception as e:
+            logger.warning(f"删除被替换的数据块失败: {e}")
+
+
+def _key_index(data: pd.DataFrame, keys: List[str]) -> pd.Index:
+    """以主键列构建索引，与 set_index(keys) 得到的索引可直接比较"""
+    if len(keys) > 1:
+        return pd.MultiIndex.from_frame(data[keys])
+    return pd.Index(data[keys[0]], name=keys[0])
@@ -0,0 +1,139 @@
+"""
+游标分页模块
+
+按 (updated_at, id) 降序做键集分页：下一页的查询条件是“排在上一页最后一条之后”，
+可以直接利用 (updated_at, id) 索引定位，每页的代价与翻到第几页无关。
+数据表的行分页使用 (数据块索引, 块内行偏移) 作为游标，直接定位到数据块内的位置。
+游标对客户端是不透明的字符串。
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+class InvalidCursorError(ValueError):
+    """分页游标无法解析"""
+    pass
+
+
+def encode_cursor(updated_at: datetime, item_id: int) -> str:
+    """
+    将一条记录的排序键编码为游标
+
+    Args:
+        updated_at (datetime): 更新时间
+        item_id (int): 记录ID
+
+    Returns:
+        str: URL安全的游标字符串
+    """
+    return _encode_payload({"u": updated_at.isoformat(), "i": item_id})
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解析游标
+
+    Args:
+        cursor (str): 游标字符串
+
+    Returns:
+        Tuple[datetime, int]: (更新时间, 记录ID)
+    """
+    payload = _decode_payload(cursor)
+    try:
+        return datetime.fromisoformat(payload["u"]), int(payload["i"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("无效的分页游标") from e
+
+
+def encode_row_cursor(block_index: int, row_offset: int) -> str:
+    """
+    将数据表中的行位置编码为游标
+
+    Args:
+        block_index (int): 数据块索引
+        row_offset (int): 块内行偏移
+
+    Returns:
+        str: URL安全的游标字符串
+    """
+    return _encode_payload({"b": block_index, "o": row_offset})
+
+
+def decode_row_cursor(cursor: str) -> Tuple[int, int]:
+    """
+    解析行分页游标
+
+    Args:
+        cursor (str): 游标字符串
+
+    Returns:
+        Tuple[int, int]: (数据块索引, 块内行偏移)
+    """
+    payload = _decode_payload(cursor)
+    try:
+        block_index, row_offset = int(payload["b"]), int(payload["o"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError("无效的分页游标") from e
+    if block_index < 0 or row_offset < 0:
+        raise InvalidCursorError("无效的分页游标")
+    return block_index, row_offset
+
+
+def order_by_recent(query: Query, model: Any) -> Query:
+    """按 (updated_at, id) 降序排序，偏移分页与游标分页使用相同的顺序"""
+    return query.order_by(model.updated_at.desc(), model.id.desc())
+
+
+def paginate_by_cursor(
+    query: Query,
+    model: Any,
+    limit: int,
+    cursor: Optional[str] = None
+) -> Tuple[List[Any], Optional[str]]:
+    """
+    键集分页查询
+
+    Args:
+        query (Query): 已添加过滤条件的查询
+        model (Any): 查询的模型，需要有updated_at和id字段
+        limit (int): 每页记录数
+        cursor (Optional[str]): 上一页返回的游标，为空时查询第一页
+
+    Returns:
+        Tuple[List[Any], Optional[str]]: (本页记录, 下一页游标)，没有下一页时游标为None
+    """
+    if cursor:
+        updated_at, item_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.updated_at, model.id) < tuple_(updated_at, item_id))
+
+    # 多取一条用于判断是否还有下一页
+    items = order_by_recent(query, model).limit(limit + 1).all()
+    if len(items) <= limit:
+        return items, None
+
+    items = items[:limit]
+    last = items[-1]
+    return items, encode_cursor(last.updated_at, last.id)
+
+
+def _encode_payload(payload: Dict[str, Any]) -> str:
+    data = json.dumps(payload, separators=(",", ":"))
+    return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_payload(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError("无效的分页游标") from e
+    if not isinstance(payload, dict):
+        raise InvalidCursorError("无效的分页游标")
+    return payload
@@ -1,12 +1,22 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterable, Callable, Union
+import json
 import pandas as pd
 from datetime import datetime
 from sqlalchemy.orm import Session
 import numpy as np
 from scipy import stats
 
-from .storage import DataValidationRule, DataTransform, DataPipeline
+from .models import DataTable
+from .storage import DataPipeline, DataBlock
 from .permission import DatasetPermissionService
+from .table import DataTableService
+from .import_service import DataTableImportService
+from .mutation import TableMutator
+from .pipeline_plan import compile_pipeline, CompiledPipeline, ColumnTransform, ValidationReport
+from .pipeline_stream import PipelineStreamer, ChunkSource
+from .pipeline_cache import PipelineResultCache, pipeline_hash
+from .udf import registry, compile_pattern, VALIDATOR, TRANSFORM
+from .schedule import PipelineSchedule
 
 class DataValidator:
     """数据验证器"""
@@ -33,13 +43,13 @@ class DataValidator:
         
     @staticmethod
     def validate_pattern(data: pd.Series, pattern: str) -> pd.Series:
-        """验证正则表达式模式"""
-        return data.str.match(pattern)
+        """验证正则表达式模式，编译结果跨调用缓存"""
+        return data.str.match(compile_pattern(pattern))
         
     @staticmethod
-    def validate_custom(data: pd.Series, func: callable) -> pd.Series:
-        """自定义验证"""
-        return data.apply(func)
+    def validate_custom(data: pd.Series, func: Union[str, Callable], **params: Any) -> pd.Series:
+        """自定义验证：func为注册的验证函数名，直接传入的函数逐值调用"""
+        return registry.resolve(VALIDATOR, func)(data, **params)
 
 class DataTransformer:
     """数据转换器"""
@@ -84,6 +94,11 @@ class DataTransformer:
             return data.count()
         else:
             raise ValueError(f"不支持的聚合方法: {method}")
+            
+    @staticmethod
+    def transform_custom(data: pd.Series, func: Union[str, Callable], **params: Any) -> pd.Series:
+        """自定义转换：func为注册的转换函数名，直接传入的函数逐值调用"""
+        return registry.resolve(TRANSFORM, func)(data, **params)
 
 class PipelineService:
     """数据处理管道服务"""
@@ -93,6 +108,7 @@ class PipelineService:
         self.permission_service = DatasetPermissionService(db)
         self.validator = DataValidator()
         self.transformer = DataTransformer()
+        self.result_cache = PipelineResultCache()
         
     def create_pipeline(self, pipeline: DataPipeline, user_id: int) -> DataPipeline:
         """创建数据处理管道"""
@@ -100,6 +116,7 @@ class PipelineService:
         if not self.permission_service.has_permission(pipeline.table_id, user_id, "EDITOR"):
             raise PermissionError("用户没有权限创建数据处理管道")
             
+        pipeline.schedule = _check_schedule(pipeline.schedule, user_id)
         self.db.add(pipeline)
         self.db.commit()
         self.db.refresh(pipeline)
@@ -126,12 +143,16 @@ class PipelineService:
             raise PermissionError("用户没有权限更新该数据处理管道")
             
         # 更新管道信息
-        for field, value in pipeline.dict(exclude_unset=True).items():
+        updates = pipeline.dict(exclude_unset=True)
+        if "schedule" in updates:
+            updates["schedule"] = _check_schedule(updates["schedule"], user_id)
+        for field, value in updates.items():
             setattr(db_pipeline, field, value)
             
         db_pipeline.updated_at = datetime.utcnow()
         self.db.commit()
         self.db.refresh(db_pipeline)
+        self.result_cache.invalidate(pipeline_id)
         return db_pipeline
         
     def delete_pipeline(self, pipeline_id: int, user_id: int) -> None:
@@ -144,35 +165,360 @@ class PipelineService:
             
         self.db.delete(pipeline)
         self.db.commit()
+        self.result_cache.invalidate(pipeline_id)
         
     def execute_pipeline(self, pipeline_id: int, data: pd.DataFrame, user_id: int) -> pd.DataFrame:
         """执行数据处理管道"""
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        
+        # 执行计划按管道版本缓存，步骤只在管道更新后重新编译
+        plan = compile_pipeline(pipeline, self.validator, self.transformer)
+        return plan.execute(data)
+        
+    def execute_upload(self, pipeline_id: int, user_id: int, load: Callable[[], pd.DataFrame],
+                       checksum: str) -> List[Dict[str, Any]]:
+        """对上传的数据执行管道，结果按管道定义和上传内容的校验和缓存
+        
+        Args:
+            pipeline_id: 管道ID
+            user_id: 用户ID
+            load: 读取上传数据的函数，缓存命中时不会调用
+            checksum: 上传内容（含格式）的校验和
+            
+        Returns:
+            结果记录列表
+        """
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        
+        key = self.result_cache.key(pipeline, "records", [checksum])
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        plan = compile_pipeline(pipeline, self.validator, self.transformer)
+        records = plan.execute(load()).to_json(orient="records", date_format="iso")
+        self.result_cache.set(key, records)
+        return json.loads(records)
+        
+    def execute_pipeline_on_table(self, pipeline_id: int, user_id: int, table_name: str,
+                                  source_table_id: Optional[int] = None,
+                                  description: Optional[str] = None) -> DataTable:
+        """按数据块流式执行管道，结果逐块写入同一数据集下的新数据表
+        
+        Args:
+            pipeline_id: 管道ID
+            user_id: 用户ID
+            table_name: 结果表名
+            source_table_id: 输入数据表ID，为空时使用管道所属的数据表
+            description: 结果表描述
+            
+        Returns:
+            结果数据表
+        """
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        table_service = DataTableService(self.db)
+        source_table = table_service.get_table(source_table_id or pipeline.table_id, user_id)
+        blocks = table_service.get_blocks(source_table.id)
+        origin = {"source_table_id": source_table.id}
+        
+        # 相同管道定义在相同数据块上的结果已存在时，新结果表直接引用其数据块
+        key = self.result_cache.key(pipeline, "table", [block.checksum for block in blocks])
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            existing = self.db.query(DataTable).filter(DataTable.id == cached["table_id"]).first()
+            # 结果表被删除或修改过时不能复用
+            if existing is not None and existing.updated_at.isoformat() == cached["updated_at"]:
+                table = DataTableImportService(self.db).copy_table(
+                    existing, source_table.dataset_id, table_name, user_id, description,
+                    {"source_format": "pipeline", "pipeline_id": pipeline.id, **origin}
+                )
+                # 新表的数据块与原结果表一一对应，沿用其输入数据块的处理记录
+                run = (existing.metadata or {}).get("pipeline_run")
+                if run is not None:
+                    index_of = {block.id: block.block_index
+                                for block in table_service.get_blocks(existing.id)}
+                    copied = {block.block_index: block.id
+                              for block in table_service.get_blocks(table.id)}
+                    result_ids = [
+                        copied.get(index_of.get(result_id)) if result_id is not None else None
+                        for _, _, result_id in run["blocks"]
+                    ]
+                    self._record_run(table, pipeline, blocks, result_ids, run["full_scan_steps"], 0)
+                return table
+        
+        def source() -> Iterable[pd.DataFrame]:
+            return (table_service.storage_engine.load_block(block) for block in blocks)
+        
+        plan = compile_pipeline(pipeline, self.validator, self.transformer)
+        sizes: List[int] = []
+        table = self._stream_to_table(
+            pipeline, source, source_table.dataset_id, user_id, table_name, description, origin,
+            sizes
+        )
+        
+        # 空结果不写数据块，其余结果与结果表的数据块按顺序对应
+        result_blocks = iter(table_service.get_blocks(table.id))
+        result_ids = [next(result_blocks).id if size else None for size in sizes]
+        self._record_run(table, pipeline, blocks, result_ids, _full_scan_steps(plan), len(blocks))
+        self.result_cache.set(
+            key, {"table_id": table.id, "updated_at": table.updated_at.isoformat()}
+        )
+        return table
+        
+    def refresh_pipeline_result(self, pipeline_id: int, user_id: int,
+                                result_table_id: int) -> DataTable:
+        """增量更新管道在数据表上的结果表
+        
+        结果表记录了已处理的输入数据块（ID和校验和）及其对应的结果数据块。再次执行时只处理
+        新增或内容变化的输入数据块，结果与未变化的结果数据块按输入顺序合并，已删除的输入
+        数据块对应的结果一并删除。管道定义已改变，或含有依赖全部数据的步骤（全局转换、
+        唯一性验证）时，有任何输入变化都完整执行。
+        
+        Args:
+            pipeline_id: 管道ID
+            user_id: 用户ID
+            result_table_id: 该管道在数据表上执行得到的结果表ID
+            
+        Returns:
+            更新后的结果表，metadata["pipeline_run"] 记录本次处理的数据块数和不能增量执行的步骤
+        """
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        table_service = DataTableService(self.db)
+        result_table = table_service.get_table(result_table_id, user_id)
+        if not self.permission_service.has_permission(result_table.dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限更新该结果表")
+        metadata = result_table.metadata or {}
+        if metadata.get("pipeline_id") != pipeline.id or "source_table_id" not in metadata:
+            raise ValueError("该数据表不是此管道在数据表上的执行结果")
+        
+        source_table = table_service.get_table(metadata["source_table_id"], user_id)
+        blocks = table_service.get_blocks(source_table.id)
+        result_blocks = {block.id: block for block in table_service.get_blocks(result_table.id)}
+        plan = compile_pipeline(pipeline, self.validator, self.transformer)
+        full_scan = _full_scan_steps(plan)
+        
+        # 已处理的输入数据块：ID -> (校验和, 结果数据块ID)，结果数据块已不存在的需要重新处理
+        run = metadata.get("pipeline_run") or {}
+        processed = {}
+        if run.get("pipeline_hash") == pipeline_hash(pipeline):
+            processed = {
+                source_id: (checksum, result_id)
+                for source_id, checksum, result_id in run["blocks"]
+                if result_id is None or result_id in result_blocks
+            }
+        unchanged = [processed.get(block.id, (None,))[0] == block.checksum for block in blocks]
+        if all(unchanged):
+            kept = {processed[block.id][1] for block in blocks} - {None}
+            if kept == set(result_blocks) and len(run.get("blocks", [])) == len(blocks):
+                return result_table
+        if full_scan:
+            unchanged = [False] * len(blocks)
+        
+        changed = [block for block, same in zip(blocks, unchanged) if not same]
+        
+        def source() -> Iterable[pd.DataFrame]:
+            return (table_service.storage_engine.load_block(block) for block in changed)
+        
+        def layout() -> Iterable[Union[DataBlock, pd.DataFrame]]:
+            # 未变化的输入数据块保留原结果（空结果对应空数据），其余依次取流式执行的结果
+            outputs = iter(PipelineStreamer(plan).run(source))
+            for block, same in zip(blocks, unchanged):
+                if not same:
+                    yield next(outputs)
+                else:
+                    result_id = processed[block.id][1]
+                    yield result_blocks[result_id] if result_id is not None else pd.DataFrame()
+        
+        mutator = TableMutator(self.db, table_service.storage_engine)
+        written = mutator.rebuild(
+            result_table, list(result_blocks.values()), layout(), reset_columns=not any(unchanged)
+        )
+        result_ids = [block.id if block is not None else None for block in written]
+        self._record_run(result_table, pipeline, blocks, result_ids, full_scan, len(changed))
+        
+        key = self.result_cache.key(pipeline, "table", [block.checksum for block in blocks])
+        self.result_cache.set(
+            key, {"table_id": result_table.id, "updated_at": result_table.updated_at.isoformat()}
+        )
+        return result_table
+        
+    def execute_pipeline_on_chunks(self, pipeline_id: int, source: ChunkSource, user_id: int,
+                                   table_name: str,
+                                   description: Optional[str] = None) -> DataTable:
+        """对分块读取的上传文件流式执行管道，结果写入管道所属数据集下的新数据表
+        
+        Args:
+            pipeline_id: 管道ID
+            source: 返回数据块迭代器的函数，有全局转换时会被调用多次
+            user_id: 用户ID
+            table_name: 结果表名
+            description: 结果表描述
+            
+        Returns:
+            结果数据表
+        """
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        table = DataTableService(self.db).get_table(pipeline.table_id, user_id)
+        return self._stream_to_table(
+            pipeline, source, table.dataset_id, user_id, table_name, description, {}
+        )
+        
+    def validate_table(self, pipeline_id: int, user_id: int,
+                       source_table_id: Optional[int] = None,
+                       quarantine_table: Optional[str] = None) -> Dict[str, Any]:
+        """以验证报告模式对数据表执行管道，一次得到所有启用的验证规则的结果
+        
+        Args:
+            pipeline_id: 管道ID
+            user_id: 用户ID
+            source_table_id: 输入数据表ID，为空时使用管道所属的数据表
+            quarantine_table: 隔离表名，指定时将验证失败的行写入同一数据集下的新数据表
+            
+        Returns:
+            验证报告
+        """
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        table_service = DataTableService(self.db)
+        source_table = table_service.get_table(source_table_id or pipeline.table_id, user_id)
+        blocks = table_service.get_blocks(source_table.id)
+        
+        # 不写隔离表时验证报告可以缓存
+        key = self.result_cache.key(pipeline, "validation", [block.checksum for block in blocks])
+        if quarantine_table is None:
+            cached = self.result_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        def source() -> Iterable[pd.DataFrame]:
+            return (table_service.storage_engine.load_block(block) for block in blocks)
+        
+        report = self._validate(
+            pipeline, source, source_table.dataset_id, user_id, quarantine_table,
+            {"source_table_id": source_table.id}
+        )
+        if quarantine_table is None:
+            self.result_cache.set(key, report)
+        return report
+        
+    def validate_chunks(self, pipeline_id: int, source: ChunkSource, user_id: int,
+                        quarantine_table: Optional[str] = None) -> Dict[str, Any]:
+        """以验证报告模式对分块读取的上传文件执行管道
+        
+        Args:
+            pipeline_id: 管道ID
+            source: 返回数据块迭代器的函数
+            user_id: 用户ID
+            quarantine_table: 隔离表名，指定时将验证失败的行写入管道所属数据集下的新数据表
+            
+        Returns:
+            验证报告
+        """
+        pipeline = self._get_executable_pipeline(pipeline_id, user_id)
+        table = DataTableService(self.db).get_table(pipeline.table_id, user_id)
+        return self._validate(pipeline, source, table.dataset_id, user_id, quarantine_table, {})
+        
+    def get_step_profile(self, pipeline_id: int, user_id: int) -> Dict[str, Any]:
+        """管道各步骤的执行方式和性能警告
+        
+        Args:
+            pipeline_id: 管道ID
+            user_id: 用户ID
+            
+        Returns:
+            步骤概况及警告列表
+        """
+        pipeline = self.get_pipeline(pipeline_id, user_id)
+        steps = compile_pipeline(pipeline, self.validator, self.transformer).step_profile()
+        return {
+            "pipeline_id": pipeline.id,
+            "steps": steps,
+            "warnings": [step["warning"] for step in steps if step["warning"]]
+        }
+        
+    def list_functions(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """可在自定义步骤中按名称引用的注册函数"""
+        return registry.list(kind)
+        
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """管道结果缓存的条目数和命中率"""
+        return self.result_cache.stats()
+        
+    def _get_executable_pipeline(self, pipeline_id: int, user_id: int) -> DataPipeline:
         pipeline = self.get_pipeline(pipeline_id, user_id)
         
         # 检查用户权限
         if not self.permission_service.has_permission(pipeline.table_id, user_id, "EDITOR"):
             raise PermissionError("用户没有权限执行该数据处理管道")
-            
-        result = data.copy()
-        
-        # 执行每个处理步骤
-        for step in pipeline.steps:
-            step_type = step.get("type")
-            step_params = step.get("params", {})
-            
-            if step_type == "validate":
-                # 执行数据验证
-                rule = DataValidationRule(**step_params)
-                validation_func = getattr(self.validator, f"validate_{rule.rule_type}")
-                validation_result = validation_func(result[rule.column_name], **rule.rule_params)
-                if not validation_result.all():
-                    raise ValueError(f"数据验证失败: {rule.error_message}")
-                    
-            elif step_type == "transform":
-                # 执行数据转换
-                transform = DataTransform(**step_params)
-                transform_func = getattr(self.transformer, f"transform_{transform.transform_type}")
-                for source_col, target_col in zip(transform.source_columns, transform.target_columns):
-                    result[target_col] = transform_func(result[source_col], **transform.transform_params)
-                    
-        return result 
\ No newline at end of file
+        
+        return pipeline
+        
+    def _validate(self, pipeline: DataPipeline, source: ChunkSource, dataset_id: int,
+                  user_id: int, quarantine_table: Optional[str],
+                  origin: Dict[str, Any]) -> Dict[str, Any]:
+        """执行验证，需要时将失败的行边验证边写入隔离表"""
+        plan = compile_pipeline(pipeline, self.validator, self.transformer)
+        report = ValidationReport()
+        rows = PipelineStreamer(plan).validate(source, report, quarantine_table is not None)
+        
+        quarantine_table_id = None
+        if quarantine_table is not None:
+            table = DataTableImportService(self.db).import_from_chunks(
+                rows, dataset_id, quarantine_table, user_id,
+                description=f"管道 {pipeline.name} 验证失败的行",
+                source={"source_format": "quarantine", "pipeline_id": pipeline.id, **origin}
+            )
+            quarantine_table_id = table.id
+        else:
+            for _ in rows:
+                pass
+        
+        return {**report.to_dict(), "quarantine_table_id": quarantine_table_id}
+        
+    def _stream_to_table(self, pipeline: DataPipeline, source: ChunkSource, dataset_id: int,
+                         user_id: int, table_name: str, description: Optional[str],
+                         origin: Dict[str, Any], sizes: Optional[List[int]] = None) -> DataTable:
+        """流式执行管道，每个输入数据块的非空结果写为结果表的一个数据块，sizes记录各结果的行数"""
+        plan = compile_pipeline(pipeline, self.validator, self.transformer)
+        
+        def chunks() -> Iterable[pd.DataFrame]:
+            for data in PipelineStreamer(plan).run(source):
+                if sizes is not None:
+                    sizes.append(len(data))
+                yield data.reset_index(drop=True)
+        
+        return DataTableImportService(self.db).import_from_chunks(
+            chunks(), dataset_id, table_name, user_id, description,
+            source={"source_format": "pipeline", "pipeline_id": pipeline.id, **origin}
+        )
+        
+    def _record_run(self, table: DataTable, pipeline: DataPipeline, blocks: List[DataBlock],
+                    result_ids: List[Optional[int]], full_scan: List[str], processed: int) -> None:
+        """在结果表元数据中记录各输入数据块（ID、校验和）对应的结果数据块，供增量执行使用"""
+        table.metadata = {**(table.metadata or {}), "pipeline_run": {
+            "pipeline_hash": pipeline_hash(pipeline),
+            "blocks": [[block.id, block.checksum, result_id]
+                       for block, result_id in zip(blocks, result_ids)],
+            "processed_blocks": processed,
+            "full_scan_steps": full_scan,
+            "run_at": datetime.utcnow().isoformat()
+        }}
+        self.db.commit()
+        self.db.refresh(table)
+
+
+def _check_schedule(schedule: Optional[Dict[str, Any]], user_id: int) -> Optional[Dict[str, Any]]:
+    """验证调度配置，定时执行以最后设置调度的用户身份进行"""
+    if not schedule:
+        return schedule
+    # 计算一次下次执行时间，拒绝永远不会执行的cron表达式（如2月30日）
+    PipelineSchedule(schedule).next_run(datetime.utcnow())
+    return {**schedule, "user_id": user_id}
+
+
+def _full_scan_steps(plan: CompiledPipeline) -> List[str]:
+    """不能增量执行的步骤说明"""
+    return [
+        operation.name if isinstance(operation, ColumnTransform)
+        else f"{operation.column}: {operation.rule_type}"
+        for _, operation in plan.full_scan_steps()
+    ]
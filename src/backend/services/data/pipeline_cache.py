@@ -0,0 +1,131 @@
+"""
+数据处理管道结果缓存模块
+
+以管道定义的哈希和输入数据的校验和作为键缓存执行结果：上传数据的执行结果和
+验证报告直接缓存在Redis中，数据表的执行结果只缓存结果表ID，命中时新结果表直接
+引用已有结果表的数据块。管道定义改变后哈希随之改变，旧结果不会再被命中；更新或
+删除管道时同时清除其所有缓存项。
+
+缓存条目按过期时间登记在有序集合中，统计和淘汰前先移除已过期的条目，超过条目
+上限时淘汰最早过期（即最早写入）的条目；命中和未命中次数记录在计数器中。
+"""
+
+import hashlib
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+from .storage import DataPipeline
+from .config import PIPELINE_CONFIG
+from ...common.cache.cache_manager import CacheManager
+from ...common.cache.redis_client import get_redis_connection
+from ...common.cache.config import TTL_CONFIG
+
+NAMESPACE = "pipeline_result"
+
+
+def pipeline_hash(pipeline: DataPipeline) -> str:
+    """
+    管道定义的哈希，只取决于处理步骤
+
+    Args:
+        pipeline (DataPipeline): 数据处理管道
+
+    Returns:
+        str: SHA-256哈希
+    """
+    definition = json.dumps(pipeline.steps, sort_keys=True, default=str)
+    return hashlib.sha256(definition.encode("utf-8")).hexdigest()
+
+
+class PipelineResultCache:
+    """数据处理管道结果缓存"""
+
+    def __init__(self, cache: Optional[CacheManager] = None,
+                 max_entries: int = PIPELINE_CONFIG["result_cache_entries"],
+                 max_bytes: int = PIPELINE_CONFIG["result_cache_max_bytes"]) -> None:
+        self.cache = cache or CacheManager()
+        self.redis = get_redis_connection()
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_key = self.cache.build_key(NAMESPACE, "index")
+
+    def key(self, pipeline: DataPipeline, kind: str, checksums: List[str]) -> str:
+        """
+        构建缓存键
+
+        Args:
+            pipeline (DataPipeline): 数据处理管道
+            kind (str): 结果类型，如 records/table/validation
+            checksums (List[str]): 输入数据的校验和，按输入顺序排列
+
+        Returns:
+            str: 缓存键，以管道ID开头以便按管道清除
+        """
+        return self.cache.build_key(
+            NAMESPACE, pipeline.id, kind, pipeline_hash(pipeline), checksums
+        )
+
+    def get(self, key: str) -> Any:
+        """读取缓存结果，同时记录命中或未命中"""
+        value = self.cache.get(key)
+        self.cache.increment(self.cache.build_key(NAMESPACE, "misses" if value is None else "hits"))
+        return value
+
+    def set(self, key: str, value: Any) -> bool:
+        """
+        写入缓存结果，超过大小上限的结果不缓存
+
+        Args:
+            key (str): 缓存键
+            value (Any): 可JSON序列化的结果
+
+        Returns:
+            bool: 是否已缓存
+        """
+        payload = value if isinstance(value, str) else json.dumps(value)
+        if len(payload) > self.max_bytes:
+            return False
+        if not self.cache.set(key, payload, TTL_CONFIG["pipeline_result"]):
+            return False
+
+        now = time.time()
+        self.redis.zadd(self.index_key, {key: now + TTL_CONFIG["pipeline_result"]})
+        self._remove_expired(now)
+        excess = self.redis.zcard(self.index_key) - self.max_entries
+        if excess > 0:
+            evicted = [member for member, _ in self.redis.zpopmin(self.index_key, excess)]
+            self.cache.delete(*evicted)
+        return True
+
+    def invalidate(self, pipeline_id: int) -> int:
+        """
+        清除一个管道的所有缓存结果
+
+        Returns:
+            int: 清除的条目数
+        """
+        pattern = self.cache.build_key(NAMESPACE, pipeline_id, "*")
+        keys = list(self.redis.scan_iter(pattern))
+        if not keys:
+            return 0
+        self.redis.zrem(self.index_key, *keys)
+        return self.cache.delete(*keys)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存条目数、命中次数、未命中次数和命中率"""
+        hits = int(self.cache.get(self.cache.build_key(NAMESPACE, "hits")) or 0)
+        misses = int(self.cache.get(self.cache.build_key(NAMESPACE, "misses")) or 0)
+        total = hits + misses
+        self._remove_expired(time.time())
+        return {
+            "entries": self.redis.zcard(self.index_key),
+            "max_entries": self.max_entries,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / total if total else None,
+        }
+
+    def _remove_expired(self, now: float) -> None:
+        """从索引中移除已随TTL过期的条目"""
+        self.redis.zremrangebyscore(self.index_key, "-inf", now)
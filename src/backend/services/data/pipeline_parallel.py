@@ -0,0 +1,223 @@
+"""
+数据处理管道并行执行模块
+
+按数据块将管道分发到进程池执行。数据块中定长类型的列（数值、布尔、时间）的
+缓冲区放在共享内存中，任务只传递共享内存的名称和类型；其他列随任务序列化。
+结果按数据块的提交顺序返回，同时在途的数据块数有上限，内存占用与工作进程数成正比。
+
+进程池在进程内共享，不随每次执行重建。调用方（网关、Celery工作进程）中已有其他
+线程在运行，fork这样的进程可能使子进程死锁，因此工作进程由forkserver（不支持时
+用spawn）启动，外部排序也使用这里按用途共享的进程池。执行计划序列化一次后随任务传递，工作进程按标识缓存反序列化结果。
+"""
+
+import multiprocessing
+import os
+import pickle
+import threading
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .pipeline_plan import CompiledPipeline
+
+# 可以放入共享内存的numpy类型
+SHARED_KINDS = "biufcmM"
+
+# 工作进程中缓存的执行计划个数
+WORKER_PLAN_CACHE_SIZE = 8
+
+# 进程内共享的进程池，按用途区分：用途 -> (创建它的进程ID, 工作进程数, 进程池)
+_pools: Dict[str, Tuple[int, int, ProcessPoolExecutor]] = {}
+_pool_lock = threading.Lock()
+
+# 工作进程中已反序列化的执行计划，键为计划标识
+_worker_plans: "OrderedDict[str, CompiledPipeline]" = OrderedDict()
+
+# 在工作进程中执行的数据块任务：(执行计划, 数据块序号, 数据块, *参数) -> (结果数据, 附加结果)
+BlockTask = Callable[..., Tuple[Optional[pd.DataFrame], Any]]
+
+
+class SharedFrame:
+    """通过共享内存传递的DataFrame"""
+
+    def __init__(self, data: pd.DataFrame) -> None:
+        self.index = data.index
+        self.columns: List[Hashable] = list(data.columns)
+        # 列序号到 (共享内存名称, 类型, 长度)
+        self.buffers: Dict[int, Tuple[str, str, int]] = {}
+        # 无法放入共享内存的列
+        self.arrays: Dict[int, Any] = {}
+
+        for i in range(len(self.columns)):
+            series = data.iloc[:, i]
+            dtype = series.dtype
+            if not (isinstance(dtype, np.dtype) and dtype.kind in SHARED_KINDS and len(series)):
+                self.arrays[i] = series.array
+                continue
+            values = np.ascontiguousarray(series.to_numpy())
+            shm = SharedMemory(create=True, size=values.nbytes)
+            try:
+                np.ndarray(values.shape, values.dtype, buffer=shm.buf)[:] = values
+            finally:
+                shm.close()
+            self.buffers[i] = (shm.name, values.dtype.str, len(values))
+
+    def load(self, unlink: bool = False) -> pd.DataFrame:
+        """
+        从共享内存复制出DataFrame
+
+        Args:
+            unlink (bool): 读取后是否删除共享内存
+        """
+        arrays = dict(self.arrays)
+        for i, (name, dtype, length) in self.buffers.items():
+            shm = SharedMemory(name=name)
+            try:
+                arrays[i] = np.ndarray((length,), np.dtype(dtype), buffer=shm.buf).copy()
+            finally:
+                shm.close()
+                if unlink:
+                    shm.unlink()
+        data = pd.DataFrame({i: arrays[i] for i in range(len(self.columns))}, index=self.index)
+        data.columns = self.columns
+        return data
+
+    def unlink(self) -> None:
+        """删除共享内存"""
+        for name, _, _ in self.buffers.values():
+            try:
+                shm = SharedMemory(name=name)
+            except FileNotFoundError:
+                continue
+            shm.close()
+            shm.unlink()
+
+
+class BlockProcessPool:
+    """按数据块执行管道任务，使用进程内共享的进程池"""
+
+    def __init__(self, plan: CompiledPipeline, max_workers: int) -> None:
+        self.plan = plan
+        self.max_workers = max_workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.plan_ref: Optional[Tuple[str, bytes]] = None
+
+    def __enter__(self) -> "BlockProcessPool":
+        self.executor = shared_executor("pipeline", self.max_workers)
+        self.plan_ref = (uuid.uuid4().hex, pickle.dumps(self.plan, pickle.HIGHEST_PROTOCOL))
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        # 工作进程异常退出后进程池不可再用，下次使用时重新创建
+        if exc_type is not None and issubclass(exc_type, BrokenProcessPool):
+            discard_executor(self.executor)
+        self.executor = None
+        self.plan_ref = None
+
+    def map(self, task: BlockTask, chunks: Iterable[pd.DataFrame],
+            *args: Any) -> Iterator[Tuple[Optional[pd.DataFrame], Any]]:
+        """
+        并行执行数据块任务，按数据块顺序返回结果
+
+        Args:
+            task (BlockTask): 模块级的任务函数
+            chunks (Iterable[pd.DataFrame]): 数据块
+            *args (Any): 传给任务的其他参数
+
+        Returns:
+            Iterator[Tuple[Optional[pd.DataFrame], Any]]: 各数据块的 (结果数据, 附加结果)
+        """
+        pending: Deque[Tuple[SharedFrame, Future]] = deque()
+        try:
+            for number, chunk in enumerate(chunks):
+                shared = SharedFrame(chunk)
+                pending.append((shared, self.executor.submit(
+                    _run_task, self.plan_ref, task, number, shared, args
+                )))
+                # 每个工作进程最多预先提交一个数据块
+                if len(pending) >= self.max_workers * 2:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+        finally:
+            # 出错或提前结束时清理尚未取回的数据块
+            for shared, future in pending:
+                if not future.cancel():
+                    try:
+                        result, _ = future.result()
+                        if result is not None:
+                            result.unlink()
+                    except Exception:
+                        pass
+                shared.unlink()
+
+    def _collect(self, shared: SharedFrame,
+                 future: Future) -> Tuple[Optional[pd.DataFrame], Any]:
+        try:
+            result, extra = future.result()
+        finally:
+            shared.unlink()
+        return (result.load(unlink=True) if result is not None else None), extra
+
+
+def shared_executor(purpose: str, max_workers: int) -> ProcessPoolExecutor:
+    """
+    进程内共享的进程池，工作进程数改变或在fork出的子进程中时重新创建
+
+    Args:
+        purpose (str): 用途，不同用途（如管道执行和外部排序）使用各自的进程池
+        max_workers (int): 工作进程数
+
+    Returns:
+        ProcessPoolExecutor: 由forkserver（不支持时用spawn）启动工作进程的进程池
+    """
+    with _pool_lock:
+        pool = _pools.get(purpose)
+        if pool is not None and pool[0] == os.getpid() and pool[1] == max_workers:
+            return pool[2]
+        if pool is not None and pool[0] == os.getpid():
+            pool[2].shutdown(wait=False)
+        # 在创建工作进程前启动资源跟踪进程，使所有进程共享同一个跟踪进程，
+        # 由任一进程创建、由另一进程删除的共享内存都能正确登记
+        resource_tracker.ensure_running()
+        methods = multiprocessing.get_all_start_methods()
+        method = "forkserver" if "forkserver" in methods else "spawn"
+        executor = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context(method))
+        _pools[purpose] = (os.getpid(), max_workers, executor)
+        return executor
+
+
+def discard_executor(executor: Optional[ProcessPoolExecutor]) -> None:
+    """丢弃工作进程异常退出后不可再用的进程池，下次使用时重新创建"""
+    with _pool_lock:
+        for purpose, pool in list(_pools.items()):
+            if pool[2] is executor:
+                del _pools[purpose]
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _worker_plan(plan_ref: Tuple[str, bytes]) -> CompiledPipeline:
+    key, payload = plan_ref
+    plan = _worker_plans.get(key)
+    if plan is None:
+        plan = _worker_plans[key] = pickle.loads(payload)
+        if len(_worker_plans) > WORKER_PLAN_CACHE_SIZE:
+            _worker_plans.popitem(last=False)
+    else:
+        _worker_plans.move_to_end(key)
+    return plan
+
+
+def _run_task(plan_ref: Tuple[str, bytes], task: BlockTask, number: int, shared: SharedFrame,
+              args: Tuple[Any, ...]) -> Tuple[Optional[SharedFrame], Any]:
+    """在工作进程中执行任务，结果数据同样通过共享内存返回"""
+    result, extra = task(_worker_plan(plan_ref), number, shared.load(), *args)
+    return (SharedFrame(result) if result is not None else None), extra
@@ -0,0 +1,633 @@
+"""
+数据处理管道执行计划模块
+
+将管道的步骤列表编译为执行计划：步骤参数只解析一次，验证和转换函数在编译时
+解析，相邻的验证和转换步骤融合为一个阶段。阶段内新产生的列先保存在列字典中，
+后续步骤直接读取，阶段结束时一次性写回，整个阶段只生成一个新的DataFrame，
+不需要预先复制输入。过滤步骤改变行集合，单独作为一个阶段。
+
+阶段内的步骤按读写的列和步骤的 depends_on（引用之前步骤的 id，默认为步骤序号）
+构成有向无环图，相互独立的分支在线程池中并发执行。标记为 temporary 的转换产生的
+中间列不出现在结果中，最后一个读取它的步骤完成后即释放。
+
+编译结果按 (管道ID, 更新时间) 缓存在进程内，管道更新后自动重新编译。
+自定义步骤引用的注册函数也在编译时解析，逐值执行的函数在步骤概况中带有性能警告。
+
+分块执行时，依赖整列统计的转换（缩放、分箱、聚合）使用预先扫描得到的统计，
+唯一性验证在数据块之间共享已出现值的哈希，由 PipelineState 保存这些跨块状态。
+这两类步骤的结果依赖全部数据，增量执行时由 full_scan_steps 标出并改为完整执行。
+
+验证报告模式下验证失败不抛出异常，而是在 ValidationReport 中记录每条规则的失败
+行数和失败行样本，一次执行即可得到所有规则的验证结果。
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .storage import DataValidationRule, DataTransform, DataPipeline
+from .filters import FilterExpression, compile_filter
+from .profiling import to_json_value
+from .udf import registry, UserFunction, VALIDATOR, TRANSFORM
+from .config import PIPELINE_CONFIG
+
+# 已编译的执行计划，键为 (管道ID, 更新时间)
+_plan_cache: "OrderedDict[Tuple[int, datetime], CompiledPipeline]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+# 执行独立步骤的线程池及创建它的进程ID
+_branch_pool: Optional[Tuple[int, ThreadPoolExecutor]] = None
+_branch_pool_lock = threading.Lock()
+
+# 依赖整列统计的转换类型，分块执行前需要先扫描数据收集统计
+GLOBAL_TRANSFORMS = ("scale", "bin", "aggregate")
+
+# 执行计划中一个步骤的位置：(阶段序号, 阶段内步骤序号)
+Position = Tuple[int, int]
+
+
+class ValidationReport:
+    """验证报告：每条规则的失败行数和失败行样本"""
+
+    def __init__(self, sample_size: int = PIPELINE_CONFIG["validation_sample_size"]) -> None:
+        self.sample_size = sample_size
+        self.rows = 0
+        self.rules: Dict[Position, Dict[str, Any]] = {}
+        # 本次执行中失败的规则位置、行标签和规则信息，用于选出隔离的行
+        self.failures: List[Tuple[Position, np.ndarray, str]] = []
+
+    def record(self, position: Position, check: "ColumnCheck", failed: pd.Series,
+               values: pd.Series) -> None:
+        """
+        记录一条规则在一批数据上的验证结果
+
+        Args:
+            position (Position): 规则在执行计划中的位置
+            check (ColumnCheck): 验证规则
+            failed (pd.Series): 每行是否失败
+            values (pd.Series): 被验证的列
+        """
+        rule = self._rule(position, check)
+        count = int(failed.sum())
+        if not count:
+            return
+        rule["failed"] += count
+        labels = failed.index[failed.to_numpy()]
+        self.failures.append((position, labels.to_numpy(), check.message))
+
+        room = self.sample_size - len(rule["samples"])
+        if room > 0:
+            rule["samples"].extend(
+                {"row": to_json_value(label), "value": to_json_value(value)}
+                for label, value in values[failed].head(room).items()
+            )
+
+    def add_failures(self, position: Position, check: "ColumnCheck", count: int) -> None:
+        """增加没有样本的失败行数，如跨数据块的重复值"""
+        self._rule(position, check)["failed"] += count
+
+    def merge(self, other: "ValidationReport") -> None:
+        """合并另一批数据的验证报告"""
+        self.rows += other.rows
+        for position, other_rule in other.rules.items():
+            rule = self.rules.setdefault(position, {**other_rule, "failed": 0, "samples": []})
+            rule["failed"] += other_rule["failed"]
+            room = self.sample_size - len(rule["samples"])
+            rule["samples"].extend(other_rule["samples"][:max(room, 0)])
+
+    def failed_rows(self) -> pd.Series:
+        """失败的行标签到失败规则信息（按规则顺序以分号分隔）的映射"""
+        if not self.failures:
+            return pd.Series(dtype=object)
+        # 并发执行的规则记录顺序不固定，按规则位置排序
+        failures = sorted(self.failures, key=lambda failure: failure[0])
+        labels = np.concatenate([labels for _, labels, _ in failures])
+        messages = np.concatenate([np.full(len(labels), message, dtype=object)
+                                   for _, labels, message in failures])
+        return pd.Series(messages, index=labels).groupby(level=0, sort=False).agg("; ".join)
+
+    def to_dict(self) -> Dict[str, Any]:
+        rules = [self.rules[position] for position in sorted(self.rules)]
+        return {
+            "valid": not any(rule["failed"] for rule in rules),
+            "rows_checked": self.rows,
+            "rules": rules,
+        }
+
+    def _rule(self, position: Position, check: "ColumnCheck") -> Dict[str, Any]:
+        if position not in self.rules:
+            self.rules[position] = {
+                "column": check.column,
+                "rule_type": check.rule_type,
+                "error_message": check.message,
+                "failed": 0,
+                "samples": [],
+            }
+        return self.rules[position]
+
+
+class PipelineState:
+    """分块执行或验证报告模式下跨数据块共享的状态"""
+
+    def __init__(self, report: Optional[ValidationReport] = None) -> None:
+        # 全局转换的统计，键为 (步骤位置, 源列)
+        self.fitted: Dict[Tuple[Position, Hashable], Dict[str, Any]] = {}
+        # 唯一性验证已出现值的哈希（有序），键为步骤位置
+        self.seen: Dict[Position, np.ndarray] = {}
+        # 验证报告模式下，各唯一性验证中每个值首次出现的行标签及其哈希，用于找出与
+        # 之前数据块重复的行
+        self.first_rows: Dict[Position, Tuple[np.ndarray, np.ndarray]] = {}
+        # 验证报告，为空时验证失败抛出异常
+        self.report = report
+
+
+class ColumnCheck:
+    """对一列执行的验证规则"""
+
+    def __init__(self, rule: DataValidationRule, func: Callable[..., pd.Series]) -> None:
+        self.column = rule.column_name
+        self.rule_type = rule.rule_type
+        self.func = func
+        self.params = rule.rule_params
+        self.message = rule.error_message
+        self.inputs: List[Hashable] = [rule.column_name]
+        self.outputs: List[Hashable] = []
+        # 执行方式的性能警告，如逐值调用的自定义函数
+        self.warning: Optional[str] = None
+
+
+class ColumnTransform:
+    """将源列逐一转换为目标列"""
+
+    def __init__(self, transform: DataTransform, func: Callable[..., Any]) -> None:
+        if len(transform.source_columns) != len(transform.target_columns):
+            raise ValueError(f"转换 {transform.name} 的源列和目标列数量不一致")
+        self.name = transform.name
+        self.transform_type = transform.transform_type
+        self.func = func
+        self.params = transform.transform_params
+        self.columns = list(zip(transform.source_columns, transform.target_columns))
+        self.inputs: List[Hashable] = list(transform.source_columns)
+        self.outputs: List[Hashable] = list(transform.target_columns)
+        self.warning: Optional[str] = None
+
+    @property
+    def is_global(self) -> bool:
+        """是否依赖整列统计"""
+        return self.transform_type in GLOBAL_TRANSFORMS
+
+
+class ColumnStage:
+    """
+    融合的验证和转换步骤，结束时批量写回新列
+
+    步骤之间按读写的列建立依赖：读取前面步骤写入的列、写入前面步骤读取或写入的列，
+    以及显式声明的 depends_on。没有依赖关系的步骤在线程池中并发执行，结果与按原有
+    顺序执行一致；验证失败时抛出的是顺序执行时最先失败的步骤的异常。
+    """
+
+    def __init__(self) -> None:
+        self.operations: List[Union[ColumnCheck, ColumnTransform]] = []
+        # 每个步骤需要等待的本阶段步骤序号
+        self.dependencies: List[List[int]] = []
+        # 不写回结果的中间列，在本阶段最后一个读取它的步骤完成后释放
+        self.local: Set[Hashable] = set()
+        # 此前阶段写回的中间列，最后的读取者在本阶段，阶段结束时删除
+        self.drop: List[Hashable] = []
+
+    def add(self, operation: Union[ColumnCheck, ColumnTransform],
+            after: Iterable[int] = ()) -> int:
+        """
+        加入一个步骤，根据读写的列推导它依赖的本阶段步骤
+
+        Args:
+            operation (Union[ColumnCheck, ColumnTransform]): 验证或转换步骤
+            after (Iterable[int]): 显式声明需要等待的本阶段步骤序号
+
+        Returns:
+            int: 步骤在本阶段的序号
+        """
+        reads, writes = set(operation.inputs), set(operation.outputs)
+        dependencies = set(after)
+        for i, other in enumerate(self.operations):
+            if set(other.outputs) & (reads | writes) or set(other.inputs) & writes:
+                dependencies.add(i)
+        self.operations.append(operation)
+        self.dependencies.append(sorted(dependencies))
+        return len(self.operations) - 1
+
+    @property
+    def concurrent(self) -> bool:
+        """是否存在可以并发执行的步骤：相邻步骤之间没有直接依赖时二者互不依赖"""
+        return any(i - 1 not in dependencies for i, dependencies in enumerate(self.dependencies)
+                   if i > 0)
+
+    def run(self, data: pd.DataFrame, index: int = 0, state: Optional[PipelineState] = None,
+            stop: Optional[int] = None) -> pd.DataFrame:
+        """
+        执行本阶段
+
+        Args:
+            data (pd.DataFrame): 输入数据
+            index (int): 本阶段在执行计划中的序号
+            state (Optional[PipelineState]): 分块执行或验证报告模式的状态
+            stop (Optional[int]): 只执行该序号之前的步骤，本阶段的中间列全部保留
+        """
+        count = len(self.operations) if stop is None else stop
+        # 本阶段产生的列，后续步骤优先读取
+        produced: Dict[Hashable, Any] = {}
+        # 中间列在本阶段尚未完成的读取次数
+        readers: Dict[Hashable, int] = {}
+        for operation in self.operations[:count]:
+            for name in operation.inputs:
+                if name in self.local:
+                    readers[name] = readers.get(name, 0) + 1
+
+        def column(name: Hashable) -> pd.Series:
+            return produced[name] if name in produced else data[name]
+
+        def execute(i: int) -> Any:
+            """计算一个步骤，只读取已完成步骤的结果，可在工作线程中执行"""
+            operation = self.operations[i]
+            position = (index, i)
+            if isinstance(operation, ColumnCheck):
+                values = column(operation.column)
+                if operation.rule_type == "unique" and state is not None:
+                    return values, _check_unique(values, state, position)
+                return values, operation.func(values, **operation.params)
+
+            results = {}
+            for source, target in operation.columns:
+                fitted = state.fitted.get((position, source)) if state is not None else None
+                if operation.is_global and fitted is not None:
+                    value = apply_fitted(operation, fitted, column(source))
+                else:
+                    value = operation.func(column(source), **operation.params)
+                if not isinstance(value, pd.Series):
+                    # 聚合结果为标量，展开为整列，与直接赋值的效果一致
+                    value = pd.Series(value, index=data.index)
+                results[target] = value
+            return results
+
+        def finish(i: int, result: Any) -> None:
+            """在调用线程中登记步骤结果：记录或抛出验证失败，写入新列并释放中间列"""
+            operation = self.operations[i]
+            if isinstance(operation, ColumnCheck):
+                values, passed = result
+                if state is not None and state.report is not None:
+                    # 无法判断的值（如空值的正则匹配结果）与抛出异常的模式一致，视为通过
+                    failed = ~passed.fillna(True).astype(bool)
+                    state.report.record((index, i), operation, failed, values)
+                elif not passed.all():
+                    raise ValueError(f"数据验证失败: {operation.message}")
+            else:
+                produced.update(result)
+            for name in operation.inputs:
+                if name in readers:
+                    readers[name] -= 1
+                    if not readers[name]:
+                        produced.pop(name, None)
+
+        workers = PIPELINE_CONFIG["branch_workers"]
+        if workers > 1 and count > 1 and self.concurrent:
+            self._run_concurrently(count, execute, finish)
+        else:
+            for i in range(count):
+                finish(i, execute(i))
+
+        # 并发执行时完成顺序不固定，按步骤顺序写回，列顺序与顺序执行一致
+        names = dict.fromkeys(name for operation in self.operations[:count]
+                              for name in operation.outputs)
+        if stop is not None:
+            produced = {name: produced[name] for name in names if name in produced}
+            return data.assign(**produced) if produced else data
+        produced = {name: produced[name] for name in names
+                    if name in produced and name not in self.local}
+        if self.drop:
+            data = data.drop(columns=[name for name in self.drop if name in data.columns])
+        return data.assign(**produced) if produced else data
+
+    def _run_concurrently(self, count: int, execute: Callable[[int], Any],
+                          finish: Callable[[int, Any], None]) -> None:
+        """按依赖关系并发执行前count个步骤，依赖满足的步骤立即提交"""
+        executor = _branch_executor()
+        waiting = {i: set(self.dependencies[i]) for i in range(count)}
+        dependents: Dict[int, List[int]] = {i: [] for i in range(count)}
+        for i in range(count):
+            for j in self.dependencies[i]:
+                dependents[j].append(i)
+
+        ready = [i for i in range(count) if not waiting[i]]
+        running: Dict[Future, int] = {}
+        # 已失败的最小步骤序号及其异常，之后只执行序号更小的步骤
+        failure: Optional[Tuple[int, BaseException]] = None
+        try:
+            while ready or running:
+                for i in sorted(ready):
+                    if failure is None or i < failure[0]:
+                        running[executor.submit(execute, i)] = i
+                ready = []
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    try:
+                        finish(i, future.result())
+                    except Exception as e:
+                        if failure is None or i < failure[0]:
+                            failure = (i, e)
+                        continue
+                    for j in dependents[i]:
+                        waiting[j].discard(i)
+                        if not waiting[j]:
+                            ready.append(j)
+        finally:
+            for future in running:
+                future.cancel()
+        if failure is not None:
+            raise failure[1]
+
+
+class FilterStage:
+    """按过滤表达式保留满足条件的行"""
+
+    def __init__(self, expression: FilterExpression) -> None:
+        self.expression = expression
+        # 最后由本过滤条件读取的中间列，过滤后删除
+        self.drop: List[Hashable] = []
+
+    def run(self, data: pd.DataFrame, index: int = 0, state: Optional[PipelineState] = None,
+            stop: Optional[int] = None) -> pd.DataFrame:
+        self.expression.validate(data.columns)
+        data = self.expression.apply(data)
+        if self.drop:
+            data = data.drop(columns=[name for name in self.drop if name in data.columns])
+        return data
+
+
+class CompiledPipeline:
+    """编译后的管道执行计划"""
+
+    def __init__(self, stages: List[Union[ColumnStage, FilterStage]]) -> None:
+        self.stages = stages
+
+    def execute(self, data: pd.DataFrame, state: Optional[PipelineState] = None,
+                stop: Optional[Position] = None) -> pd.DataFrame:
+        """
+        对数据执行管道，不修改输入的DataFrame
+
+        Args:
+            data (pd.DataFrame): 输入数据，分块执行时为一个数据块
+            state (Optional[PipelineState]): 分块执行或验证报告模式的状态，为空时按整体数据执行
+            stop (Optional[Position]): 在该位置的步骤之前停止，用于收集全局转换的输入
+
+        Returns:
+            pd.DataFrame: 处理结果
+        """
+        for index, stage in enumerate(self.stages):
+            if stop is not None and index == stop[0]:
+                return stage.run(data, index, state, stop[1])
+            data = stage.run(data, index, state)
+        return data
+
+    def operation(self, position: Position) -> Union[ColumnCheck, ColumnTransform]:
+        """指定位置的验证或转换步骤"""
+        return self.stages[position[0]].operations[position[1]]
+
+    def global_transforms(self) -> List[Tuple[Position, ColumnTransform]]:
+        """依赖整列统计的转换步骤及其位置，按执行顺序排列"""
+        return [
+            ((index, i), operation)
+            for index, stage in enumerate(self.stages)
+            if isinstance(stage, ColumnStage)
+            for i, operation in enumerate(stage.operations)
+            if isinstance(operation, ColumnTransform) and operation.is_global
+        ]
+
+    def step_profile(self) -> List[Dict[str, Any]]:
+        """
+        各步骤的执行方式：所在阶段、是否依赖全部数据，以及性能警告
+
+        Returns:
+            List[Dict[str, Any]]: 按执行顺序排列的步骤说明
+        """
+        full_scan = {position for position, _ in self.full_scan_steps()}
+        profile = []
+        for index, stage in enumerate(self.stages):
+            if isinstance(stage, FilterStage):
+                profile.append({"stage": index, "step": 0, "type": "filter",
+                                "full_scan": False, "warning": None})
+                continue
+            for i, operation in enumerate(stage.operations):
+                if isinstance(operation, ColumnCheck):
+                    step = {"type": "validate", "rule_type": operation.rule_type,
+                            "columns": [operation.column]}
+                else:
+                    step = {"type": "transform", "transform_type": operation.transform_type,
+                            "name": operation.name,
+                            "columns": [target for _, target in operation.columns]}
+                if isinstance(operation.func, UserFunction):
+                    step["function"] = operation.func.name
+                step["depends_on"] = stage.dependencies[i]
+                profile.append({"stage": index, "step": i, **step,
+                                "full_scan": (index, i) in full_scan,
+                                "warning": operation.warning})
+        return profile
+
+    def full_scan_steps(self) -> List[Tuple[Position, Union[ColumnCheck, ColumnTransform]]]:
+        """
+        结果依赖全部数据的步骤：全局转换和唯一性验证。含有这些步骤的管道不能只处理
+        新增的数据块，新数据会改变已有结果或需要与已有数据比较
+        """
+        return [
+            ((index, i), operation)
+            for index, stage in enumerate(self.stages)
+            if isinstance(stage, ColumnStage)
+            for i, operation in enumerate(stage.operations)
+            if (operation.is_global if isinstance(operation, ColumnTransform)
+                else operation.rule_type == "unique")
+        ]
+
+
+def _branch_executor() -> ThreadPoolExecutor:
+    """并发执行独立步骤的线程池，进程内共享；fork出的工作进程中重新创建"""
+    global _branch_pool
+    with _branch_pool_lock:
+        if _branch_pool is None or _branch_pool[0] != os.getpid():
+            _branch_pool = (os.getpid(), ThreadPoolExecutor(
+                PIPELINE_CONFIG["branch_workers"], thread_name_prefix="pipeline-branch"
+            ))
+        return _branch_pool[1]
+
+
+def compile_pipeline(pipeline: DataPipeline, validator: Any, transformer: Any) -> CompiledPipeline:
+    """
+    编译管道，已保存的管道按 (ID, 更新时间) 复用编译结果
+
+    Args:
+        pipeline (DataPipeline): 数据处理管道
+        validator (Any): 提供 validate_<规则类型> 方法的验证器
+        transformer (Any): 提供 transform_<转换类型> 方法的转换器
+
+    Returns:
+        CompiledPipeline: 执行计划
+    """
+    if pipeline.id is None:
+        return _compile(pipeline, validator, transformer)
+
+    key = (pipeline.id, pipeline.updated_at)
+    with _plan_cache_lock:
+        if key in _plan_cache:
+            _plan_cache.move_to_end(key)
+            return _plan_cache[key]
+
+    plan = _compile(pipeline, validator, transformer)
+    with _plan_cache_lock:
+        _plan_cache[key] = plan
+        while len(_plan_cache) > PIPELINE_CONFIG["plan_cache_size"]:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def _compile(pipeline: DataPipeline, validator: Any, transformer: Any) -> CompiledPipeline:
+    stages: List[Union[ColumnStage, FilterStage]] = []
+    current: Optional[ColumnStage] = None
+    # 步骤ID到位置，过滤步骤和未启用的步骤没有阶段内序号
+    positions: Dict[Any, Optional[Position]] = {}
+    # 中间列到产生它的阶段序号
+    temporary: Dict[Hashable, int] = {}
+
+    for number, step in enumerate(pipeline.steps):
+        step_type = step.get("type")
+        step_params = step.get("params", {})
+        step_id = step.get("id", number)
+        after = []
+        for dependency in step.get("depends_on", []):
+            if dependency not in positions:
+                raise ValueError(f"步骤 {step_id} 依赖的步骤 {dependency} 不存在或不在其之前")
+            # 之前阶段的步骤在本阶段开始前已完成
+            position = positions[dependency]
+            if position is not None and current is not None and position[0] == len(stages) - 1:
+                after.append(position[1])
+        positions[step_id] = None
+
+        if step_type == "validate":
+            rule = DataValidationRule(**step_params)
+            if not rule.is_active:
+                continue
+            operation = ColumnCheck(rule, _resolve(validator, "validate", rule.rule_type))
+            if rule.rule_type == "custom":
+                _bind_udf(operation, VALIDATOR)
+        elif step_type == "transform":
+            transform = DataTransform(**step_params)
+            if not transform.is_active:
+                continue
+            operation = ColumnTransform(
+                transform, _resolve(transformer, "transform", transform.transform_type)
+            )
+            if transform.transform_type == "custom":
+                _bind_udf(operation, TRANSFORM)
+        elif step_type == "filter":
+            expression = compile_filter(step_params.get("where"))
+            if expression is not None:
+                stages.append(FilterStage(expression))
+                current = None
+            continue
+        else:
+            continue
+
+        if current is None:
+            current = ColumnStage()
+            stages.append(current)
+        positions[step_id] = (len(stages) - 1, current.add(operation, after))
+        for name in operation.outputs:
+            if step.get("temporary"):
+                temporary[name] = len(stages) - 1
+            else:
+                temporary.pop(name, None)
+
+    _plan_release(stages, temporary)
+    return CompiledPipeline(stages)
+
+
+def _plan_release(stages: List[Union[ColumnStage, FilterStage]],
+                  temporary: Dict[Hashable, int]) -> None:
+    """确定中间列的释放位置：只在产生它的阶段内读取的列不写回，否则在最后读取它的阶段结束时删除"""
+    for name, produced_at in temporary.items():
+        last = produced_at
+        for index, stage in enumerate(stages):
+            reads = (stage.expression.columns if isinstance(stage, FilterStage)
+                     else [column for operation in stage.operations for column in operation.inputs])
+            if index > produced_at and name in reads:
+                last = index
+        if last == produced_at:
+            stages[produced_at].local.add(name)
+        else:
+            stages[last].drop.append(name)
+
+
+def apply_fitted(transform: ColumnTransform, stats: Dict[str, Any],
+                 data: pd.Series) -> Any:
+    """
+    使用预先收集的整列统计计算全局转换，结果与对整列直接转换一致
+
+    Args:
+        transform (ColumnTransform): 全局转换步骤
+        stats (Dict[str, Any]): 该源列的统计
+        data (pd.Series): 数据块中的源列
+
+    Returns:
+        Any: 转换结果，聚合转换为标量
+    """
+    params = transform.params
+    if transform.transform_type == "scale":
+        method = params.get("method", "standard")
+        if method == "standard":
+            return (data - stats["mean"]) / stats["std"]
+        if method == "minmax":
+            return (data - stats["min"]) / (stats["max"] - stats["min"])
+        raise ValueError(f"不支持的缩放方法: {method}")
+    if transform.transform_type == "bin":
+        edges = stats["edges"]
+        if len(edges) < 2:
+            return pd.Series(np.nan, index=data.index)
+        return pd.cut(data, edges, labels=False, include_lowest=True).astype("float64")
+    return stats["value"]
+
+
+def _check_unique(values: pd.Series, state: PipelineState, position: Position) -> pd.Series:
+    """唯一性验证：块内不重复，且不与之前数据块中出现过的值重复"""
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    seen = state.seen.get(position, np.empty(0, dtype=np.uint64))
+    if len(seen):
+        found = np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)
+        duplicated = seen[found] == hashes
+    else:
+        duplicated = np.zeros(len(hashes), dtype=bool)
+    state.seen[position] = np.union1d(seen, hashes)
+    first = ~values.duplicated().to_numpy()
+    if state.report is not None:
+        state.first_rows[position] = (values.index.to_numpy()[first], hashes[first])
+    return pd.Series(~duplicated & first, index=values.index)
+
+
+def _bind_udf(operation: Union[ColumnCheck, ColumnTransform], kind: str) -> None:
+    """编译时解析自定义步骤引用的函数，执行时直接调用，不再逐块查找"""
+    params = dict(operation.params)
+    function = registry.resolve(kind, params.pop("func", None))
+    operation.func = function
+    operation.params = params
+    operation.warning = function.warning
+
+
+def _resolve(target: Any, prefix: str, name: str) -> Callable[..., Any]:
+    func = getattr(target, f"{prefix}_{name}", None)
+    if func is None:
+        kind = "验证规则" if prefix == "validate" else "转换"
+        raise ValueError(f"不支持的{kind}类型: {name}")
+    return func
@@ -0,0 +1,303 @@
+"""
+数据处理管道流式执行模块
+
+按数据块执行编译后的管道，任一时刻只有一个数据块在内存中。依赖整列统计的
+转换（缩放、分箱、聚合）先对数据做预扫描：每个全局转换扫描一遍，执行它之前的
+步骤得到输入列，并用可合并的累加器收集统计；正式执行时各数据块使用这些统计。
+缩放和聚合的统计（Welford均值方差、最值、计数与求和）是精确的，结果与对整体数据
+执行一致（浮点舍入除外）。分箱的分位点由KLL分位数草图估计，内存占用与数据量无关，
+各分位点的秩误差不超过草图的误差界（k=200时约1.65%），两端分位点取精确的最值。
+
+配置多个工作进程时，预扫描和正式执行都按数据块分发到进程池并行执行，
+各数据块的统计在主进程中合并，唯一性验证的跨块检查也在主进程中按顺序完成。
+数据块的行标签统一编号为在整个输入中的行号，验证报告中的行号即以此为准。
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .pipeline_plan import (
+    CompiledPipeline, ColumnTransform, PipelineState, Position, ValidationReport
+)
+from .pipeline_parallel import BlockProcessPool, BlockTask
+from .profiling import MomentsAccumulator, QuantileSketch
+from .config import PIPELINE_CONFIG
+
+# 返回数据块迭代器的函数，每次扫描调用一次
+ChunkSource = Callable[[], Iterable[pd.DataFrame]]
+
+# 隔离表中记录输入行号和失败规则信息的列
+SOURCE_ROW_COLUMN = "_source_row"
+QUARANTINE_COLUMN = "_validation_errors"
+
+
+class TransformFitter:
+    """收集一个全局转换在一个源列上所需的统计"""
+
+    def __init__(self, transform: ColumnTransform,
+                 sketch_k: int = PIPELINE_CONFIG["quantile_sketch_k"], seed: int = 0) -> None:
+        self.transform = transform
+        self.moments = MomentsAccumulator()
+        self.count = 0
+        self.total: Any = 0
+        self.sketch = QuantileSketch(sketch_k, seed)
+
+    def update(self, data: pd.Series) -> None:
+        """累加一个数据块中的源列"""
+        transform_type = self.transform.transform_type
+        if transform_type == "aggregate":
+            self.count += int(data.count())
+            if self.transform.params.get("method") != "count":
+                self.total += data.sum()
+            return
+
+        values = data.dropna().to_numpy(dtype=np.float64)
+        self.moments.update(values)
+        if transform_type == "bin":
+            self.sketch.update(values)
+
+    def merge(self, other: "TransformFitter") -> None:
+        """合并另一个数据分区上收集的统计（草图的随机种子须不同）"""
+        self.moments.merge(other.moments)
+        self.count += other.count
+        self.total += other.total
+        self.sketch.merge(other.sketch)
+
+    def result(self) -> Dict[str, Any]:
+        """转换所需的统计"""
+        params = self.transform.params
+        transform_type = self.transform.transform_type
+        if transform_type == "aggregate":
+            method = params.get("method")
+            if method == "count":
+                return {"value": self.count}
+            if method == "sum":
+                return {"value": self.total}
+            if method == "mean":
+                return {"value": self.total / self.count if self.count else np.nan}
+            raise ValueError(f"不支持的聚合方法: {method}")
+
+        moments = self.moments
+        if transform_type == "scale":
+            return {
+                "mean": moments.mean if moments.count else np.nan,
+                "std": moments.std if moments.std is not None else np.nan,
+                "min": moments.min if moments.min is not None else np.nan,
+                "max": moments.max if moments.max is not None else np.nan,
+            }
+
+        if not moments.count:
+            return {"edges": []}
+        edges = self.sketch.quantiles(np.linspace(0, 1, params["bins"] + 1))
+        # 两端使用精确的最值，保证所有值都落在分箱内
+        edges[0], edges[-1] = moments.min, moments.max
+        return {"edges": np.unique(edges).tolist()}
+
+
+class PipelineStreamer:
+    """按数据块流式执行编译后的管道"""
+
+    def __init__(self, plan: CompiledPipeline,
+                 max_workers: int = PIPELINE_CONFIG["workers"]) -> None:
+        self.plan = plan
+        self.max_workers = max_workers
+
+    def fit(self, source: ChunkSource, pool: Optional[BlockProcessPool] = None) -> PipelineState:
+        """
+        预扫描数据，收集所有全局转换的统计
+
+        Args:
+            source (ChunkSource): 数据块来源
+            pool (Optional[BlockProcessPool]): 进程池，为空时在当前进程中执行
+
+        Returns:
+            PipelineState: 包含全局转换统计的执行状态
+        """
+        state = PipelineState()
+        for position, transform in self.plan.global_transforms():
+            fitters = {source_column: TransformFitter(transform)
+                       for source_column, _ in transform.columns}
+            for _, block_fitters in self._map(pool, source, fit_block, state.fitted, position):
+                for source_column, fitter in block_fitters.items():
+                    fitters[source_column].merge(fitter)
+            for source_column, fitter in fitters.items():
+                state.fitted[(position, source_column)] = fitter.result()
+        return state
+
+    def run(self, source: ChunkSource) -> Iterator[pd.DataFrame]:
+        """
+        流式执行管道
+
+        Args:
+            source (ChunkSource): 数据块来源，有全局转换时会被多次扫描
+
+        Returns:
+            Iterator[pd.DataFrame]: 与输入数据块一一对应的结果（过滤后可能为空）
+        """
+        if self.max_workers <= 1:
+            yield from self._run(source, None)
+            return
+        with BlockProcessPool(self.plan, self.max_workers) as pool:
+            yield from self._run(source, pool)
+
+    def _run(self, source: ChunkSource,
+             pool: Optional[BlockProcessPool]) -> Iterator[pd.DataFrame]:
+        state = self.fit(source, pool)
+        seen: Dict[Position, np.ndarray] = {}
+        for data, block_seen in self._map(pool, source, execute_block, state.fitted):
+            # 数据块内的重复已在执行时检查，这里检查与之前数据块的重复
+            for position, hashes in block_seen.items():
+                previous = seen.get(position)
+                if previous is not None and np.isin(hashes, previous, assume_unique=True).any():
+                    raise ValueError(f"数据验证失败: {self.plan.operation(position).message}")
+                seen[position] = hashes if previous is None else np.union1d(previous, hashes)
+            yield data
+
+    def validate(self, source: ChunkSource, report: ValidationReport,
+                 quarantine: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        以验证报告模式执行管道，验证失败不中止执行
+
+        Args:
+            source (ChunkSource): 数据块来源
+            report (ValidationReport): 接收验证结果的报告，迭代结束后完整
+            quarantine (bool): 是否返回验证失败的输入行
+
+        Returns:
+            Iterator[pd.DataFrame]: 验证失败的输入行，附带失败规则列；不隔离时不返回数据。
+                只因与之前数据块重复而失败的行在最后再读一遍数据取出
+        """
+        if self.max_workers <= 1:
+            yield from self._validate(source, None, report, quarantine)
+            return
+        with BlockProcessPool(self.plan, self.max_workers) as pool:
+            yield from self._validate(source, pool, report, quarantine)
+
+    def _validate(self, source: ChunkSource, pool: Optional[BlockProcessPool],
+                  report: ValidationReport, quarantine: bool) -> Iterator[pd.DataFrame]:
+        state = self.fit(source, pool)
+        seen: Dict[Position, np.ndarray] = {}
+        # 与之前数据块重复、且没有因其他规则被隔离的行：行标签 -> 规则信息
+        pending: Dict[Hashable, List[str]] = {}
+        for rows, (first_rows, block_report) in self._map(
+            pool, source, validate_block, state.fitted, report.sample_size, quarantine
+        ):
+            report.merge(block_report)
+            # 与之前数据块重复的值只计数，不提供样本
+            duplicates: Dict[Hashable, List[str]] = {}
+            for position, (labels, hashes) in sorted(first_rows.items()):
+                previous = seen.get(position)
+                if previous is not None:
+                    duplicated = np.isin(hashes, previous, assume_unique=True)
+                    if duplicated.any():
+                        check = self.plan.operation(position)
+                        report.add_failures(position, check, int(duplicated.sum()))
+                        for label in labels[duplicated]:
+                            duplicates.setdefault(label, []).append(check.message)
+                seen[position] = hashes if previous is None else np.union1d(previous, hashes)
+
+            if quarantine and duplicates:
+                rows = _add_duplicates(rows, duplicates, pending)
+            if rows is not None and len(rows):
+                yield rows
+
+        # 只因跨块重复而失败的行需要再读一遍数据取出
+        if pending:
+            yield from _select_rows(source, pending)
+
+    def _map(self, pool: Optional[BlockProcessPool], source: ChunkSource, task: BlockTask,
+             *args: Any) -> Iterator[Tuple[Optional[pd.DataFrame], Any]]:
+        chunks = _number_rows(source())
+        if pool is not None:
+            return pool.map(task, chunks, *args)
+        return (task(self.plan, number, chunk, *args) for number, chunk in enumerate(chunks))
+
+
+def _number_rows(chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """将各数据块的行标签设为在整个输入中的行号"""
+    start = 0
+    for chunk in chunks:
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        start += len(chunk)
+        yield chunk
+
+
+def _add_duplicates(rows: Optional[pd.DataFrame], duplicates: Dict[Hashable, List[str]],
+                    pending: Dict[Hashable, List[str]]) -> Optional[pd.DataFrame]:
+    """将跨块重复的规则信息追加到已隔离的行，其余的行记入pending"""
+    quarantined = set(rows[SOURCE_ROW_COLUMN]) if rows is not None else set()
+    for label, messages in duplicates.items():
+        if label not in quarantined:
+            pending[label] = messages
+    if not quarantined:
+        return rows
+    extra = rows[SOURCE_ROW_COLUMN].map(lambda label: "; ".join(duplicates.get(label, ())))
+    rows[QUARANTINE_COLUMN] = rows[QUARANTINE_COLUMN].where(
+        extra == "", rows[QUARANTINE_COLUMN] + "; " + extra
+    )
+    return rows
+
+
+def _select_rows(source: ChunkSource,
+                 messages: Dict[Hashable, List[str]]) -> Iterator[pd.DataFrame]:
+    """按行号从数据来源中取出指定的输入行，附带失败规则列"""
+    for chunk in _number_rows(source()):
+        labels = chunk.index[chunk.index.isin(list(messages))]
+        if not len(labels):
+            continue
+        errors = ["; ".join(messages[label]) for label in labels]
+        rows = chunk.loc[labels].assign(**{QUARANTINE_COLUMN: errors})
+        yield rows.rename_axis(SOURCE_ROW_COLUMN).reset_index()
+
+
+def fit_block(plan: CompiledPipeline, number: int, chunk: pd.DataFrame,
+              fitted: Dict[Tuple[Position, Hashable], Dict[str, Any]],
+              position: Position) -> Tuple[None, Dict[Hashable, TransformFitter]]:
+    """收集一个数据块上某个全局转换的统计，随机种子取数据块序号"""
+    scan = PipelineState()
+    scan.fitted = fitted
+    data = plan.execute(chunk, scan, stop=position)
+    transform = plan.operation(position)
+    fitters = {}
+    for source_column, _ in transform.columns:
+        fitter = TransformFitter(transform, seed=number)
+        fitter.update(data[source_column])
+        fitters[source_column] = fitter
+    return None, fitters
+
+
+def execute_block(plan: CompiledPipeline, number: int, chunk: pd.DataFrame,
+                  fitted: Dict[Tuple[Position, Hashable], Dict[str, Any]]
+                  ) -> Tuple[pd.DataFrame, Dict[Position, np.ndarray]]:
+    """执行一个数据块，同时返回唯一性验证列的值哈希，用于跨块检查"""
+    state = PipelineState()
+    state.fitted = fitted
+    return plan.execute(chunk, state), state.seen
+
+
+def validate_block(plan: CompiledPipeline, number: int, chunk: pd.DataFrame,
+                   fitted: Dict[Tuple[Position, Hashable], Dict[str, Any]],
+                   sample_size: int, quarantine: bool
+                   ) -> Tuple[Optional[pd.DataFrame],
+                              Tuple[Dict[Position, Tuple[np.ndarray, np.ndarray]],
+                                    ValidationReport]]:
+    """以验证报告模式执行一个数据块，需要隔离时返回验证失败的输入行
+
+    同时返回各唯一性验证中每个值首次出现的行标签及其哈希，用于跨块检查
+    """
+    state = PipelineState(ValidationReport(sample_size))
+    state.fitted = fitted
+    plan.execute(chunk, state)
+
+    report = state.report
+    report.rows = len(chunk)
+    rows = None
+    if quarantine:
+        failed = report.failed_rows().sort_index()
+        rows = chunk.loc[failed.index].assign(**{QUARANTINE_COLUMN: failed.to_numpy()})
+        rows = rows.rename_axis(SOURCE_ROW_COLUMN).reset_index()
+    # 失败行标签只用于选出隔离的行，不需要传回主进程
+    report.failures = []
+    return rows, (state.first_rows, report)
@@ -0,0 +1,603 @@
+"""
+数据剖析模块
+
+提供可合并的列统计累加器。导入时对每个数据块计算一次统计，再在块之间合并，
+无需额外扫描数据即可得到整张表的列统计信息。分位数草图用于分块执行管道时估计
+分箱的分位点。
+"""
+
+import base64
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# 近似去重计数的寄存器位数，2^11个寄存器，标准误差约2.3%
+HLL_PRECISION = 11
+
+# 保留的高频值个数
+TOP_K = 10
+
+# 直方图的最大分箱数
+HISTOGRAM_BINS = 32
+
+# 分位数草图的精度参数，k=200时秩误差约1.65%
+QUANTILE_SKETCH_K = 200
+
+
+def to_json_value(value: Any) -> Any:
+    """
+    将numpy/pandas标量转换为可JSON序列化的Python值
+
+    Args:
+        value (Any): 原始值
+
+    Returns:
+        Any: 可序列化的值
+    """
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _finite(values: np.ndarray) -> np.ndarray:
+    """转为浮点数组并去掉正负无穷（CSV中的inf会被解析为浮点无穷）"""
+    values = values.astype(np.float64, copy=False)
+    finite = np.isfinite(values)
+    return values if finite.all() else values[finite]
+
+
+class MomentsAccumulator:
+    """数值列的计数、最值、均值和方差累加器（Welford算法，按Chan公式合并）"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        累加一批非空数值，正负无穷被忽略
+
+        Args:
+            values (np.ndarray): 数值数组
+        """
+        values = _finite(values)
+        if len(values) == 0:
+            return
+        other = MomentsAccumulator()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.m2 = float(((values - other.mean) ** 2).sum())
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other: "MomentsAccumulator") -> None:
+        """
+        合并另一个累加器
+
+        Args:
+            other (MomentsAccumulator): 另一个累加器
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def variance(self) -> Optional[float]:
+        """样本方差"""
+        if self.count < 2:
+            return None
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self) -> Optional[float]:
+        """样本标准差"""
+        variance = self.variance
+        return None if variance is None else variance ** 0.5
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MomentsAccumulator":
+        accumulator = cls()
+        accumulator.count = data["count"]
+        accumulator.mean = data["mean"]
+        accumulator.m2 = data["m2"]
+        accumulator.min = data["min"]
+        accumulator.max = data["max"]
+        return accumulator
+
+
+class HyperLogLog:
+    """近似去重计数（HyperLogLog），寄存器取最大值即可合并"""
+
+    def __init__(self, precision: int = HLL_PRECISION) -> None:
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8)
+
+    def update(self, values: pd.Series) -> None:
+        """
+        累加一批非空值
+
+        Args:
+            values (pd.Series): 值序列
+        """
+        if len(values) == 0:
+            return
+        hashes = pd.util.hash_pandas_object(values, index=False).values
+        index = (hashes >> np.uint64(64 - self.precision)).astype(np.int64)
+        # 剩余位数不超过53位，转换为浮点数求最高位时没有精度损失
+        rest_bits = 64 - self.precision
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        _, exponent = np.frexp(rest.astype(np.float64))
+        rank = (rest_bits - exponent + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        """估计不同值的个数"""
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # 基数较小时使用线性计数修正
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"precision": self.precision,
+                "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        hll = cls(data["precision"])
+        hll.registers = np.frombuffer(
+            base64.b64decode(data["registers"]), dtype=np.uint8
+        ).copy()
+        return hll
+
+
+class TopKCounter:
+    """高频值计数（Misra-Gries摘要），计数误差不超过 总数/(容量+1)"""
+
+    def __init__(self, k: int = TOP_K, capacity: Optional[int] = None) -> None:
+        self.k = k
+        self.capacity = capacity or k * 10
+        self.counts: Dict[Any, int] = {}
+
+    def update(self, values: pd.Series) -> None:
+        """
+        累加一批非空值
+
+        Args:
+            values (pd.Series): 值序列
+        """
+        counts = values.value_counts(sort=True)
+        other = TopKCounter(self.k, self.capacity)
+        other.counts = {
+            to_json_value(value): int(count)
+            for value, count in counts.iloc[:self.capacity + 1].items()
+        }
+        # 截断的部分按最大被截断计数扣减，保持摘要的误差界
+        if len(counts) > self.capacity + 1:
+            other._reduce(int(counts.iloc[self.capacity + 1]))
+        self.merge(other)
+
+    def merge(self, other: "TopKCounter") -> None:
+        for value, count in other.counts.items():
+            self.counts[value] = self.counts.get(value, 0) + count
+        if len(self.counts) > self.capacity:
+            ordered = sorted(self.counts.values(), reverse=True)
+            self._reduce(ordered[self.capacity])
+
+    def _reduce(self, amount: int) -> None:
+        self.counts = {
+            value: count - amount for value, count in self.counts.items() if count > amount
+        }
+
+    def top(self) -> List[List[Any]]:
+        """返回计数最高的k个值及其（下界）计数"""
+        ordered = sorted(self.counts.items(), key=lambda item: item[1], reverse=True)
+        return [[value, count] for value, count in ordered[:self.k]]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "capacity": self.capacity,
+                "counts": [[value, count] for value, count in self.counts.items()]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TopKCounter":
+        counter = cls(data["k"], data["capacity"])
+        counter.counts = {value: count for value, count in data["counts"]}
+        return counter
+
+
+class StreamingHistogram:
+    """可合并的流式直方图（Ben-Haim & Tom-Tov），以(中心, 计数)表示每个分箱"""
+
+    def __init__(self, max_bins: int = HISTOGRAM_BINS) -> None:
+        self.max_bins = max_bins
+        self.centers = np.empty(0, dtype=np.float64)
+        self.counts = np.empty(0, dtype=np.float64)
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        累加一批非空数值，正负无穷被忽略
+
+        Args:
+            values (np.ndarray): 数值数组
+        """
+        values = _finite(values)
+        if len(values) == 0:
+            return
+        counts, edges = np.histogram(values, bins=self.max_bins)
+        # 使用分箱内的均值作为中心，比分箱中点更精确
+        sums, _ = np.histogram(values, bins=edges, weights=values)
+        mask = counts > 0
+        other = StreamingHistogram(self.max_bins)
+        other.centers = sums[mask] / counts[mask]
+        other.counts = counts[mask].astype(np.float64)
+        self.merge(other)
+
+    def merge(self, other: "StreamingHistogram") -> None:
+        centers = np.concatenate([self.centers, other.centers])
+        counts = np.concatenate([self.counts, other.counts])
+        order = np.argsort(centers, kind="mergesort")
+        centers, counts = list(centers[order]), list(counts[order])
+        # 反复合并距离最近的两个分箱，直到分箱数不超过上限
+        while len(centers) > self.max_bins:
+            gaps = np.diff(centers)
+            i = int(np.argmin(gaps))
+            total = counts[i] + counts[i + 1]
+            centers[i] = (centers[i] * counts[i] + centers[i + 1] * counts[i + 1]) / total
+            counts[i] = total
+            del centers[i + 1]
+            del counts[i + 1]
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+
+    def bins(self) -> List[List[float]]:
+        return [[float(c), int(n)] for c, n in zip(self.centers, self.counts)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"max_bins": self.max_bins, "bins": self.bins()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StreamingHistogram":
+        histogram = cls(data["max_bins"])
+        if data["bins"]:
+            centers, counts = zip(*data["bins"])
+            histogram.centers = np.asarray(centers, dtype=np.float64)
+            histogram.counts = np.asarray(counts, dtype=np.float64)
+        return histogram
+
+
+class QuantileSketch:
+    """
+    可合并的分位数草图（KLL）
+
+    各层压缩器保存权重为 2^层号 的样本，层满时排序后随机保留奇数位或偶数位的一半
+    升入上一层。高层容量为k，向下每层按2/3递减，占用空间约为3k个值，与数据量基本
+    无关。k=200时任一分位点的秩误差在99%置信度下约为1.65%（误差随k近似反比减小），
+    即估计的q分位点在真实数据中的秩位于 q±0.0165 之间。
+    """
+
+    def __init__(self, k: int = QUANTILE_SKETCH_K, seed: Optional[int] = None) -> None:
+        self.k = k
+        self.levels: List[np.ndarray] = [np.empty(0, dtype=np.float64)]
+        self.rng = np.random.default_rng(seed)
+
+    @property
+    def count(self) -> int:
+        """草图代表的值个数"""
+        return int(sum(len(level) << h for h, level in enumerate(self.levels)))
+
+    def update(self, values: np.ndarray) -> None:
+        """
+        累加一批非空数值
+
+        Args:
+            values (np.ndarray): 数值数组
+        """
+        if len(values) == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64, copy=False)])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for h, level in enumerate(other.levels):
+            if h == len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self._compress()
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self.levels) - 1 - h
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self) -> None:
+        # 自底向上压缩超出容量的层，一次升入一整层，批量写入时也只需排序对数次
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                level = np.sort(level)
+                # 奇数个值时保留一个在本层，其余成对压缩
+                kept, level = level[:len(level) % 2], level[len(level) % 2:]
+                promoted = level[int(self.rng.integers(2))::2]
+                self.levels[h] = kept
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+            h += 1
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """
+        估计分位点
+
+        Args:
+            qs (Sequence[float]): 0到1之间的分位数
+
+        Returns:
+            np.ndarray: 各分位数对应的值，草图为空时全为NaN
+        """
+        values = np.concatenate(self.levels)
+        if len(values) == 0:
+            return np.full(len(qs), np.nan)
+        weights = np.concatenate([
+            np.full(len(level), 1 << h, dtype=np.int64) for h, level in enumerate(self.levels)
+        ])
+        order = np.argsort(values, kind="mergesort")
+        values, ranks = values[order], np.cumsum(weights[order])
+        targets = np.asarray(qs, dtype=np.float64) * ranks[-1]
+        positions = np.searchsorted(ranks, targets, side="left")
+        return values[np.minimum(positions, len(values) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"k": self.k, "levels": [level.tolist() for level in self.levels]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(data["k"])
+        sketch.levels = [np.asarray(level, dtype=np.float64) for level in data["levels"]]
+        return sketch
+
+
+class ColumnProfile:
+    """单列的可合并统计信息"""
+
+    def __init__(self, kind: Optional[str] = None) -> None:
+        self.kind = kind
+        self.count = 0
+        self.null_count = 0
+        self.min: Any = None
+        self.max: Any = None
+        self.infinite_count = 0
+        self.moments = MomentsAccumulator()
+        self.distinct = HyperLogLog()
+        self.top_values = TopKCounter()
+        self.histogram = StreamingHistogram()
+
+    @staticmethod
+    def infer_kind(series: pd.Series) -> str:
+        """
+        推断列的统计类别
+
+        Args:
+            series (pd.Series): 列数据
+
+        Returns:
+            str: numeric/boolean/datetime/string
+        """
+        if pd.api.types.is_bool_dtype(series):
+            return "boolean"
+        if pd.api.types.is_numeric_dtype(series):
+            return "numeric"
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return "datetime"
+        return "string"
+
+    def update(self, series: pd.Series) -> None:
+        """
+        累加一个数据块中的列数据
+
+        Args:
+            series (pd.Series): 列数据
+        """
+        kind = self.infer_kind(series)
+        if self.kind is None:
+            self.kind = kind
+        elif self.kind != kind:
+            # 不同数据块类型不一致时退化为字符串统计
+            self._degrade(kind)
+
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        self.count += len(values)
+        if len(values) == 0:
+            return
+
+        if self.kind == "string":
+            values = values.astype(str)
+        if self.kind == "numeric":
+            array = values.to_numpy(dtype=np.float64)
+            # 正负无穷计入取值范围（按块统计跳过数据块时依赖），不参与均值、方差和直方图
+            self.infinite_count += int(np.isinf(array).sum())
+            self.moments.update(array)
+            self.histogram.update(array)
+            self._update_range(float(array.min()), float(array.max()))
+        else:
+            self._update_range(values.min(), values.max())
+        self.distinct.update(values)
+        self.top_values.update(values)
+
+    def merge(self, other: "ColumnProfile") -> None:
+        """
+        合并另一个数据块的列统计
+
+        Args:
+            other (ColumnProfile): 另一个列统计
+        """
+        if other.kind is None:
+            return
+        if self.kind is None:
+            self.kind = other.kind
+        elif self.kind != other.kind:
+            self._degrade(other.kind)
+        self.count += other.count
+        self.null_count += other.null_count
+        self.infinite_count += other.infinite_count
+        if self.kind == "string" and other.kind != "string":
+            self._update_range(
+                None if other.min is None else str(other.min),
+                None if other.max is None else str(other.max),
+            )
+        else:
+            self._update_range(other.min, other.max)
+        self.moments.merge(other.moments)
+        self.histogram.merge(other.histogram)
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+
+    def _update_range(self, min_value: Any, max_value: Any) -> None:
+        if min_value is None:
+            return
+        self.min = min_value if self.min is None else min(self.min, min_value)
+        self.max = max_value if self.max is None else max(self.max, max_value)
+
+    def _degrade(self, kind: str) -> None:
+        """类型冲突时将数值统计退化为字符串统计，整数和浮点之间保持数值统计"""
+        if self.kind == "string" or {self.kind, kind} == {"numeric"}:
+            return
+        self.kind = "string"
+        self.infinite_count = 0
+        self.moments = MomentsAccumulator()
+        self.histogram = StreamingHistogram()
+        self.min = None if self.min is None else str(self.min)
+        self.max = None if self.max is None else str(self.max)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        转换为可存入ColumnMetadata.statistics的字典，sketch字段保存合并所需的状态
+
+        Returns:
+            Dict[str, Any]: 列统计信息
+        """
+        statistics = {
+            "kind": self.kind,
+            "count": self.count,
+            "null_count": self.null_count,
+            "min": to_json_value(self.min),
+            "max": to_json_value(self.max),
+            "distinct_count": self.distinct.estimate() if self.count else 0,
+            "top_values": self.top_values.top(),
+            "sketch": {
+                "distinct": self.distinct.to_dict(),
+                "top_values": self.top_values.to_dict(),
+            },
+        }
+        if self.kind == "numeric":
+            statistics["mean"] = self.moments.mean if self.moments.count else None
+            statistics["variance"] = self.moments.variance
+            statistics["infinite_count"] = self.infinite_count
+            statistics["histogram"] = self.histogram.bins()
+            statistics["sketch"]["moments"] = self.moments.to_dict()
+            statistics["sketch"]["histogram"] = self.histogram.to_dict()
+        return statistics
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnProfile":
+        profile = cls(data["kind"])
+        profile.count = data["count"]
+        profile.null_count = data["null_count"]
+        profile.infinite_count = data.get("infinite_count", 0)
+        profile.min = data["min"]
+        profile.max = data["max"]
+        if profile.kind == "datetime" and profile.min is not None:
+            profile.min = pd.Timestamp(profile.min)
+            profile.max = pd.Timestamp(profile.max)
+        sketch = data.get("sketch", {})
+        if "distinct" in sketch:
+            profile.distinct = HyperLogLog.from_dict(sketch["distinct"])
+        if "top_values" in sketch:
+            profile.top_values = TopKCounter.from_dict(sketch["top_values"])
+        if "moments" in sketch:
+            profile.moments = MomentsAccumulator.from_dict(sketch["moments"])
+        if "histogram" in sketch:
+            profile.histogram = StreamingHistogram.from_dict(sketch["histogram"])
+        return profile
+
+
+class TableProfiler:
+    """整张表（或单个数据块）的列统计"""
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, ColumnProfile] = {}
+
+    def update(self, df: pd.DataFrame) -> None:
+        """
+        累加一个数据块
+
+        Args:
+            df (pd.DataFrame): 数据块
+        """
+        for name in df.columns:
+            self.columns.setdefault(str(name), ColumnProfile()).update(df[name])
+
+    def merge(self, other: "TableProfiler") -> None:
+        """
+        合并另一份表统计
+
+        Args:
+            other (TableProfiler): 另一份表统计
+        """
+        for name, profile in other.columns.items():
+            self.columns.setdefault(name, ColumnProfile()).merge(profile)
+
+    def to_statistics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        转换为按列名索引的统计信息字典
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 列名到统计信息的映射
+        """
+        return {name: profile.to_dict() for name, profile in self.columns.items()}
+
+    @classmethod
+    def from_statistics(cls, statistics: Dict[str, Dict[str, Any]]) -> "TableProfiler":
+        profiler = cls()
+        for name, data in statistics.items():
+            if data:
+                profiler.columns[name] = ColumnProfile.from_dict(data)
+        return profiler
+
+    @classmethod
+    def profile(cls, df: pd.DataFrame) -> "TableProfiler":
+        """计算单个数据块的统计"""
+        profiler = cls()
+        profiler.update(df)
+        return profiler
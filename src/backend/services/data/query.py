@@ -0,0 +1,463 @@
+"""
+数据表查询模块
+
+对数据表执行即席查询（投影、过滤、分组聚合、排序和限制行数），查询可以是受限的SQL
+或JSON查询描述。执行时先根据数据块统计跳过不可能匹配的数据块；仅含计数和最值的
+查询直接由块统计得出结果；其余聚合在各数据块上并行计算可合并的部分聚合，再合并为
+最终结果；投影查询按块流式输出。
+"""
+
+import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from .models import DataTable, DataType, TableQuery
+from .storage import DataBlock
+from .storage_engine import StorageEngine
+from .filters import FilterExpression, FilterSyntaxError, compile_filter
+from .external_sort import ExternalSorter, parse_sort_by
+from .profiling import to_json_value
+from .config import QUERY_CONFIG
+
+# 支持的聚合函数
+AGGREGATES = ("count", "sum", "avg", "min", "max")
+
+# 可由数据块统计得出最值的列类型及转换函数，块统计中的数值统一为浮点数
+STATISTIC_MINMAX_TYPES = {DataType.INTEGER: int, DataType.FLOAT: float}
+
+# 各部分聚合结果在合并时使用的函数
+PARTIAL_MERGE = {"count": "sum", "sum": "sum", "min": "min", "max": "max"}
+
+IDENTIFIER = r'[^\W\d]\w*|"(?:[^"]|"")*"'
+
+SELECT_ITEM_PATTERN = re.compile(
+    rf"^\s*(?:(?P<agg>\w+)\s*\(\s*(?P<arg>\*|{IDENTIFIER})\s*\)|(?P<column>\*|{IDENTIFIER}))"
+    rf"(?:\s+AS\s+(?P<alias>{IDENTIFIER}))?\s*$",
+    re.IGNORECASE
+)
+
+ORDER_ITEM_PATTERN = re.compile(
+    rf"^\s*(?P<column>{IDENTIFIER})(?:\s+(?P<order>ASC|DESC))?\s*$", re.IGNORECASE
+)
+
+# SQL子句关键字，按出现顺序
+SQL_CLAUSES = ("SELECT", "FROM", "WHERE", "GROUP BY", "ORDER BY", "LIMIT")
+
+
+class SelectItem:
+    """查询的输出列：表中的列或对某列的聚合"""
+
+    def __init__(self, column: Optional[str], agg: Optional[str] = None,
+                 alias: Optional[str] = None) -> None:
+        if agg is not None:
+            agg = agg.lower()
+            if agg not in AGGREGATES:
+                raise FilterSyntaxError(f"不支持的聚合函数: {agg}")
+            if column is None and agg != "count":
+                raise FilterSyntaxError(f"{agg} 需要指定列")
+        elif column is None:
+            raise FilterSyntaxError("查询列不能为空")
+        self.column = column
+        self.agg = agg
+        self.name = alias or (f"{agg}({column or '*'})" if agg else column)
+
+    @classmethod
+    def parse(cls, item: Any) -> "SelectItem":
+        """
+        解析查询列
+
+        Args:
+            item (Any): 字符串如 "sum(gdp) AS total"，或字典
+                {"column": "gdp", "agg": "sum", "alias": "total"}
+
+        Returns:
+            SelectItem: 查询列
+        """
+        if isinstance(item, dict):
+            column = item.get("column")
+            return cls(None if column == "*" else column, item.get("agg"), item.get("alias"))
+        match = SELECT_ITEM_PATTERN.match(str(item))
+        if not match:
+            raise FilterSyntaxError(f"无法解析查询列: {item}")
+        alias = _unquote(match.group("alias")) if match.group("alias") else None
+        if match.group("agg"):
+            arg = match.group("arg")
+            return cls(None if arg == "*" else _unquote(arg), match.group("agg"), alias)
+        return cls(_unquote(match.group("column")), alias=alias)
+
+
+class QueryPlan:
+    """按数据表校验后的查询计划"""
+
+    def __init__(self, table: DataTable, query: TableQuery) -> None:
+        if query.sql:
+            query = parse_sql(query.sql)
+        table_columns = [col.name for col in table.columns]
+        self.column_types = {col.name: col.type for col in table.columns}
+
+        items = [SelectItem.parse(item) for item in query.select] or [SelectItem("*")]
+        if any(item.column == "*" and item.agg is None for item in items):
+            expanded = []
+            for item in items:
+                if item.column == "*" and item.agg is None:
+                    expanded.extend(SelectItem(name) for name in table_columns)
+                else:
+                    expanded.append(item)
+            items = expanded
+
+        self.items = items
+        self.group_by = list(query.group_by)
+        self.aggregates = [item for item in items if item.agg]
+        self.is_aggregate = bool(self.aggregates or self.group_by)
+        self.expression: Optional[FilterExpression] = compile_filter(query.where)
+        self.order_by = query.order_by or []
+        self.limit = query.limit
+
+        referenced = [item.column for item in items if item.column] + self.group_by
+        unknown = [col for col in referenced if col not in table_columns]
+        if unknown:
+            raise ValueError(f"数据表不存在列: {', '.join(dict.fromkeys(unknown))}")
+        if self.expression is not None:
+            self.expression.validate(table_columns, self.column_types)
+
+        names = [item.name for item in items]
+        if len(set(names)) != len(names):
+            raise ValueError("查询结果中存在重名的列，请使用AS指定别名")
+        if self.is_aggregate:
+            ungrouped = [item.column for item in items
+                         if not item.agg and item.column not in self.group_by]
+            if ungrouped:
+                raise ValueError(f"非聚合列必须出现在GROUP BY中: {', '.join(ungrouped)}")
+            sortable = names
+        else:
+            sortable = table_columns
+        order_columns = parse_sort_by(self.order_by)[0]
+        unknown = [col for col in order_columns if col not in sortable]
+        if unknown:
+            raise ValueError(f"排序列不在查询结果中: {', '.join(unknown)}")
+
+    @property
+    def columns(self) -> List[str]:
+        return [item.name for item in self.items]
+
+    @property
+    def read_columns(self) -> List[str]:
+        """扫描数据块时需要读取的列"""
+        columns = self.group_by + [item.column for item in self.items if item.column]
+        if not self.is_aggregate:
+            columns += parse_sort_by(self.order_by)[0]
+        return list(dict.fromkeys(columns))
+
+
+class TableQueryResult:
+    """查询结果，rows在被迭代时才执行扫描"""
+
+    def __init__(self, columns: List[str], rows: Iterator[Dict[str, Any]]) -> None:
+        self.columns = columns
+        self.rows = rows
+
+
+class TableQueryEngine:
+    """数据表查询引擎"""
+
+    def __init__(self, storage_engine: StorageEngine, max_workers: Optional[int] = None) -> None:
+        self.storage_engine = storage_engine
+        self.max_workers = max_workers or QUERY_CONFIG["max_workers"]
+
+    def execute(self, table: DataTable, blocks: List[DataBlock],
+                query: TableQuery) -> TableQueryResult:
+        """
+        执行查询
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 按顺序排列的数据块
+            query (TableQuery): 查询
+
+        Returns:
+            TableQueryResult: 查询结果，行以 {列名: 值} 字典流式输出
+        """
+        plan = QueryPlan(table, query)
+        if plan.expression is not None:
+            blocks = plan.expression.prune(blocks)
+
+        if not plan.is_aggregate:
+            frames = self._project(blocks, plan)
+        elif self._answerable_from_statistics(blocks, plan):
+            frames = iter([self._aggregate_statistics(blocks, plan)])
+        else:
+            frames = self._aggregate(blocks, plan)
+        return TableQueryResult(plan.columns, self._iter_rows(frames, plan.columns))
+
+    def _iter_rows(self, frames: Iterable[pd.DataFrame],
+                   columns: List[str]) -> Iterator[Dict[str, Any]]:
+        for data in frames:
+            for row in data.itertuples(index=False, name=None):
+                yield {name: to_json_value(value) for name, value in zip(columns, row)}
+
+    def _scan(self, block: DataBlock, plan: QueryPlan) -> pd.DataFrame:
+        return self.storage_engine.scan_block(block, plan.read_columns, plan.expression)
+
+    def _project(self, blocks: List[DataBlock], plan: QueryPlan) -> Iterator[pd.DataFrame]:
+        """投影查询：无排序时按块顺序流式输出，读够limit行即停止"""
+        source_columns = [item.column for item in plan.items]
+        if plan.order_by:
+            read_columns = plan.read_columns
+            if plan.expression is not None:
+                read_columns = plan.expression.read_columns(read_columns)
+            predicate = plan.expression.mask if plan.expression is not None else None
+            sorter = ExternalSorter(self.storage_engine.config, plan.order_by)
+            frames = sorter.sort(blocks, read_columns, predicate)
+        else:
+            frames = self._map_blocks(lambda block: self._scan(block, plan), blocks)
+
+        remaining = plan.limit
+        for data in frames:
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                data = data.head(remaining)
+                remaining -= len(data)
+            data = data[source_columns]
+            data.columns = plan.columns
+            yield data
+
+    def _aggregate(self, blocks: List[DataBlock], plan: QueryPlan) -> Iterator[pd.DataFrame]:
+        """在各数据块上并行计算部分聚合，合并后计算最终结果"""
+        partials = list(self._map_blocks(
+            lambda block: self._partial_aggregate(self._scan(block, plan), plan), blocks
+        ))
+        if not partials:
+            partials = [self._partial_aggregate(self._empty_frame(plan), plan)]
+        merged = self._merge_partials(pd.concat(partials, ignore_index=True), plan)
+        if len(merged) > QUERY_CONFIG["max_groups"]:
+            raise ValueError(f"分组数超过上限 {QUERY_CONFIG['max_groups']}")
+
+        result = pd.DataFrame(index=merged.index)
+        for i, item in enumerate(plan.items):
+            if not item.agg:
+                result[item.name] = merged[item.column]
+            elif item.agg == "count":
+                result[item.name] = merged[f"_{i}_count"].astype("int64")
+            elif item.agg in ("sum", "avg"):
+                total = merged[f"_{i}_sum"].where(merged[f"_{i}_count"] > 0)
+                if item.agg == "avg":
+                    total = total / merged[f"_{i}_count"]
+                result[item.name] = total
+            else:
+                result[item.name] = merged[f"_{i}_{item.agg}"]
+
+        if plan.order_by:
+            by, ascending = parse_sort_by(plan.order_by)
+            result = result.sort_values(by, ascending=ascending, na_position="last", kind="stable")
+        if plan.limit is not None:
+            result = result.head(plan.limit)
+        yield result.reset_index(drop=True)
+
+    def _partial_aggregate(self, data: pd.DataFrame, plan: QueryPlan) -> pd.DataFrame:
+        """计算单个数据块的部分聚合，每个分组一行"""
+        parts: Dict[str, pd.Series] = {key: data[key] for key in plan.group_by}
+        merge: Dict[str, str] = {}
+        for i, item in enumerate(plan.items):
+            if not item.agg:
+                continue
+            if item.column is None:
+                parts[f"_{i}_count"] = pd.Series(1, index=data.index, dtype="int64")
+            else:
+                parts[f"_{i}_count"] = data[item.column].notna().astype("int64")
+            merge[f"_{i}_count"] = "sum"
+            if item.agg in ("sum", "avg"):
+                parts[f"_{i}_sum"] = pd.to_numeric(data[item.column], errors="coerce")
+                merge[f"_{i}_sum"] = "sum"
+            elif item.agg in ("min", "max"):
+                values = data[item.column]
+                # 各块保存的原始类型可能不同（如追加的字符串），按声明的字符串类型比较
+                if plan.column_types.get(item.column) == DataType.STRING:
+                    values = values.where(values.isna(), values.astype(str))
+                parts[f"_{i}_{item.agg}"] = values
+                merge[f"_{i}_{item.agg}"] = item.agg
+
+        frame = pd.DataFrame(parts, index=data.index)
+        return self._group(frame, plan.group_by, merge)
+
+    def _merge_partials(self, partials: pd.DataFrame, plan: QueryPlan) -> pd.DataFrame:
+        merge = {column: PARTIAL_MERGE[column.rsplit("_", 1)[1]]
+                 for column in partials.columns if column not in plan.group_by}
+        return self._group(partials, plan.group_by, merge)
+
+    def _group(self, frame: pd.DataFrame, keys: List[str], merge: Dict[str, str]) -> pd.DataFrame:
+        if not keys:
+            return pd.DataFrame({
+                column: [frame[column].agg(func)] for column, func in merge.items()
+            })
+        if not merge:
+            # 只有分组列时等价于去重
+            return frame[keys].drop_duplicates().reset_index(drop=True)
+        grouped = frame.groupby(keys, dropna=False, sort=False).agg(merge)
+        return grouped.reset_index()
+
+    def _answerable_from_statistics(self, blocks: List[DataBlock], plan: QueryPlan) -> bool:
+        """
+        无过滤和分组、只有计数和最值时，可以直接由数据块统计得出结果
+
+        最值只对声明为整数或浮点数、且各块统计都是数值类型的列使用统计，
+        其余情况扫描数据，保证结果与扫描一致。
+        """
+        if plan.expression is not None or plan.group_by:
+            return False
+        for item in plan.aggregates:
+            if item.agg not in ("count", "min", "max"):
+                return False
+            if item.column is None:
+                continue
+            if item.agg != "count" and plan.column_types.get(item.column) \
+                    not in STATISTIC_MINMAX_TYPES:
+                return False
+            for block in blocks:
+                stats = (block.statistics or {}).get(item.column)
+                if not stats or "count" not in stats:
+                    return False
+                if item.agg != "count" and stats.get("kind") != "numeric":
+                    return False
+        return True
+
+    def _aggregate_statistics(self, blocks: List[DataBlock], plan: QueryPlan) -> pd.DataFrame:
+        row = {}
+        for item in plan.items:
+            if item.column is None:
+                row[item.name] = sum(block.row_count for block in blocks)
+                continue
+            stats = [block.statistics[item.column] for block in blocks]
+            if item.agg == "count":
+                row[item.name] = sum(stat["count"] for stat in stats)
+                continue
+            values = [stat[item.agg] for stat in stats if stat.get(item.agg) is not None]
+            if not values:
+                row[item.name] = None
+                continue
+            value = (min if item.agg == "min" else max)(values)
+            # 转换回列的声明类型，与扫描得到的结果一致
+            cast = STATISTIC_MINMAX_TYPES[plan.column_types[item.column]]
+            row[item.name] = cast(value)
+        result = pd.DataFrame([row], columns=plan.columns)
+        if plan.limit is not None:
+            result = result.head(plan.limit)
+        return result
+
+    def _empty_frame(self, plan: QueryPlan) -> pd.DataFrame:
+        return pd.DataFrame({column: pd.Series(dtype="object") for column in plan.read_columns})
+
+    def _map_blocks(self, func: Callable[[DataBlock], Any],
+                    blocks: List[DataBlock]) -> Iterator[Any]:
+        """在线程池中并行处理数据块，按块顺序返回结果，同时进行的块数不超过线程数"""
+        if not blocks:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(blocks))) as executor:
+            pending = deque()
+            for block in blocks:
+                pending.append(executor.submit(func, block))
+                if len(pending) >= self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def parse_sql(sql: str) -> TableQuery:
+    """
+    将受限SQL解析为查询描述
+
+    支持 SELECT ... [FROM 表名] [WHERE ...] [GROUP BY ...] [ORDER BY ...] [LIMIT n]，
+    查询对象由请求路径中的数据表确定，FROM子句中的表名会被忽略。
+
+    Args:
+        sql (str): SQL语句
+
+    Returns:
+        TableQuery: 查询描述
+    """
+    clauses = _split_clauses(sql.strip().rstrip(";"))
+    if "SELECT" not in clauses:
+        raise FilterSyntaxError("查询必须以SELECT开头")
+
+    order_by = []
+    for item in _split_top_level(clauses.get("ORDER BY", "")):
+        match = ORDER_ITEM_PATTERN.match(item)
+        if not match:
+            raise FilterSyntaxError(f"无法解析排序条件: {item}")
+        order_by.append({
+            "column": _unquote(match.group("column")),
+            "order": (match.group("order") or "asc").lower(),
+        })
+
+    limit = None
+    if "LIMIT" in clauses:
+        if not clauses["LIMIT"].strip().isdigit():
+            raise FilterSyntaxError(f"LIMIT必须是非负整数: {clauses['LIMIT']}")
+        limit = int(clauses["LIMIT"])
+
+    return TableQuery(
+        select=[] if clauses["SELECT"].strip() == "*" else _split_top_level(clauses["SELECT"]),
+        where=clauses.get("WHERE") or None,
+        group_by=[_unquote(item.strip()) for item in _split_top_level(clauses.get("GROUP BY", ""))],
+        order_by=order_by or None,
+        limit=limit,
+    )
+
+
+def _split_clauses(sql: str) -> Dict[str, str]:
+    """按顶层（不在引号和括号中）的子句关键字切分SQL"""
+    positions: List[Tuple[int, int, str]] = []
+    pattern = re.compile(
+        r"\b(" + "|".join(clause.replace(" ", r"\s+") for clause in SQL_CLAUSES) + r")\b",
+        re.IGNORECASE
+    )
+    masked = _mask_quoted(sql)
+    for match in pattern.finditer(masked):
+        if _depth_at(masked, match.start()) == 0:
+            keyword = re.sub(r"\s+", " ", match.group(1).upper())
+            positions.append((match.start(), match.end(), keyword))
+
+    if not positions or positions[0][0] != 0 and sql[:positions[0][0]].strip():
+        raise FilterSyntaxError("查询必须以SELECT开头")
+    order = [keyword for _, _, keyword in positions]
+    if len(set(order)) != len(order) or order != sorted(order, key=SQL_CLAUSES.index):
+        raise FilterSyntaxError("SQL子句重复或顺序不正确")
+
+    clauses = {}
+    for i, (_, end, keyword) in enumerate(positions):
+        next_start = positions[i + 1][0] if i + 1 < len(positions) else len(sql)
+        clauses[keyword] = sql[end:next_start].strip()
+    return clauses
+
+
+def _split_top_level(text: str) -> List[str]:
+    """按顶层逗号切分"""
+    if not text.strip():
+        return []
+    masked = _mask_quoted(text)
+    items, start = [], 0
+    for i, char in enumerate(masked):
+        if char == "," and _depth_at(masked, i) == 0:
+            items.append(text[start:i].strip())
+            start = i + 1
+    items.append(text[start:].strip())
+    return items
+
+
+def _mask_quoted(text: str) -> str:
+    """将引号内的字符替换为空格，便于查找关键字和括号"""
+    return re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"",
+                  lambda match: " " * len(match.group(0)), text)
+
+
+def _depth_at(masked: str, position: int) -> int:
+    return masked.count("(", 0, position) - masked.count(")", 0, position)
+
+
+def _unquote(name: str) -> str:
+    if len(name) >= 2 and name[0] == name[-1] == '"':
+        return name[1:-1].replace('""', '"')
+    return name
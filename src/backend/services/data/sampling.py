@@ -0,0 +1,111 @@
+"""
+数据表抽样模块
+
+对数据块做一次顺序扫描抽取随机样本：为每行生成一个随机键，保留键最小的n行
+（等价于蓄水池抽样，可按块向量化合并），分层抽样时在每层内各保留键最小的n行，
+按比例抽样时保留键小于该比例的行。随机键由种子和块索引确定，相同种子在相同数据
+上得到相同的样本。
+"""
+
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .models import DataTable
+from .storage import DataBlock
+from .storage_engine import StorageEngine
+from .config import SAMPLE_CONFIG
+
+# 样本内部使用的辅助列
+KEY_COLUMN = "__sample_key"
+POSITION_COLUMN = "__sample_position"
+
+
+class TableSampler:
+    """数据表随机抽样器"""
+
+    def __init__(self, storage_engine: StorageEngine) -> None:
+        self.storage_engine = storage_engine
+
+    def sample(
+        self,
+        table: DataTable,
+        blocks: List[DataBlock],
+        n: Optional[int] = None,
+        fraction: Optional[float] = None,
+        seed: int = 0,
+        stratify_by: Optional[str] = None,
+        columns: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        抽取样本
+
+        Args:
+            table (DataTable): 数据表
+            blocks (List[DataBlock]): 按顺序排列的数据块
+            n (Optional[int]): 样本行数；分层抽样时为每层的行数
+            fraction (Optional[float]): 抽样比例，与n二选一
+            seed (int): 随机种子
+            stratify_by (Optional[str]): 分层列，需与n一起使用
+            columns (Optional[List[str]]): 返回的列，为空时返回全部列
+
+        Returns:
+            pd.DataFrame: 样本，按在表中的顺序排列
+        """
+        if (n is None) == (fraction is None):
+            raise ValueError("必须且只能指定抽样行数n或抽样比例fraction之一")
+        if n is not None and n <= 0:
+            raise ValueError("抽样行数必须大于0")
+        if fraction is not None and not 0 < fraction <= 1:
+            raise ValueError("抽样比例必须在(0, 1]之间")
+        if stratify_by is not None and n is None:
+            raise ValueError("分层抽样需要指定每层的行数n")
+
+        table_columns = [col.name for col in table.columns]
+        columns = columns or table_columns
+        referenced = columns + ([stratify_by] if stratify_by else [])
+        unknown = [col for col in referenced if col not in table_columns]
+        if unknown:
+            raise ValueError(f"数据表不存在列: {', '.join(dict.fromkeys(unknown))}")
+        read_columns = list(dict.fromkeys(referenced))
+
+        max_rows = SAMPLE_CONFIG["max_rows"]
+        if n is not None and stratify_by is None and n > max_rows:
+            raise ValueError(f"抽样行数不能超过 {max_rows}")
+
+        reservoir: Optional[pd.DataFrame] = None
+        for block in blocks:
+            data = self.storage_engine.load_block(block, read_columns)
+            rng = np.random.default_rng([seed, block.block_index])
+            data[KEY_COLUMN] = rng.random(len(data))
+            data[POSITION_COLUMN] = block.start_row + np.arange(len(data))
+
+            if fraction is not None:
+                # 按比例抽样每行独立判断，无需保留候选
+                kept = data[data[KEY_COLUMN] < fraction]
+                reservoir = kept if reservoir is None else pd.concat([reservoir, kept])
+            else:
+                candidates = data if reservoir is None else pd.concat([reservoir, data])
+                reservoir = self._keep_smallest(candidates, n, stratify_by)
+
+            if len(reservoir) > max_rows:
+                raise ValueError(f"样本行数超过上限 {max_rows}，请减小抽样比例或每层行数")
+
+        if reservoir is None:
+            return pd.DataFrame(columns=columns)
+        reservoir = reservoir.sort_values(POSITION_COLUMN)
+        return reservoir[columns].reset_index(drop=True)
+
+    def _keep_smallest(self, data: pd.DataFrame, n: int,
+                       stratify_by: Optional[str]) -> pd.DataFrame:
+        """保留随机键最小的n行，分层时每层各保留n行"""
+        if stratify_by is None:
+            if len(data) <= n:
+                return data
+            keys = data[KEY_COLUMN].to_numpy()
+            return data.iloc[np.argpartition(keys, n - 1)[:n]]
+
+        data = data.sort_values(KEY_COLUMN)
+        rank = data.groupby(stratify_by, dropna=False, sort=False).cumcount()
+        return data[rank.to_numpy() < n]
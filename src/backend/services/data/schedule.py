@@ -0,0 +1,196 @@
+"""
+数据处理管道调度配置模块
+
+解析 DataPipeline.schedule 中的调度配置，计算下次执行时间：
+
+    {"cron": "0 3 * * *"}                      # 每天3点
+    {"interval": 3600, "quiet_hours": true}    # 每小时到期，只在低峰时段执行
+    {"cron": "*/30 * * * 1-5", "window": "22:00-06:00", "table_name": "orders_clean"}
+
+cron表达式为标准的5个字段（分 时 日 月 星期），支持 *、列表、范围和步长，星期中
+0和7都表示周日；日和星期都有限制时满足其一即可。cron和执行时段按配置的时区解释，
+数据库中的时间统一为UTC。到期的执行在时段外时推迟到时段开始，错过的多次执行只补一次。
+"""
+
+from datetime import datetime, time, timedelta, timezone
+from typing import Any, Dict, Optional, Set, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from .config import SCHEDULER_CONFIG
+
+# cron各字段的取值范围
+CRON_FIELDS = (
+    ("minute", 0, 59),
+    ("hour", 0, 23),
+    ("day", 1, 31),
+    ("month", 1, 12),
+    ("weekday", 0, 7),
+)
+
+# 搜索下次执行时间的最大天数，超过时认为表达式不会匹配（如2月30日）
+MAX_SEARCH_DAYS = 366 * 5
+
+
+def _parse_field(expression: str, name: str, low: int, high: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in expression.split(","):
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text) if step_text.isdigit() else 0
+            if step <= 0:
+                raise ValueError(f"cron字段 {name} 的步长无效: {expression}")
+        else:
+            step = 1
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_text, end_text = part.split("-", 1)
+            if not (start_text.isdigit() and end_text.isdigit()):
+                raise ValueError(f"cron字段 {name} 无效: {expression}")
+            start, end = int(start_text), int(end_text)
+        elif part.isdigit():
+            start = int(part)
+            # 单个值带步长时表示从该值到上限
+            end = high if step > 1 else start
+        else:
+            raise ValueError(f"cron字段 {name} 无效: {expression}")
+        if start < low or end > high or start > end:
+            raise ValueError(f"cron字段 {name} 超出范围 {low}-{high}: {expression}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """5字段cron表达式"""
+
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron表达式须为5个字段（分 时 日 月 星期）: {expression}")
+        self.expression = expression
+        parsed = [_parse_field(field, name, low, high)
+                  for field, (name, low, high) in zip(fields, CRON_FIELDS)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        # 7与0同为周日
+        self.weekdays = {day % 7 for day in weekdays}
+        # 与Vixie cron一致，以*开头的字段（包括*/2）不算作对日期的限制
+        self.any_day = fields[2].startswith("*")
+        self.any_weekday = fields[4].startswith("*")
+
+    def matches_day(self, moment: datetime) -> bool:
+        """日期是否满足日和星期字段"""
+        in_days = moment.day in self.days
+        in_weekdays = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, moment: datetime) -> datetime:
+        """
+        严格晚于给定时间的下一个匹配时间
+
+        Args:
+            moment (datetime): 不带时区的本地时间
+
+        Returns:
+            datetime: 不带时区的本地时间，精确到分钟
+        """
+        candidate = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = candidate + timedelta(days=MAX_SEARCH_DAYS)
+        while candidate < limit:
+            if candidate.month not in self.months:
+                # 跳到下个月1日
+                year, month = divmod(candidate.year * 12 + candidate.month, 12)
+                candidate = datetime(year, month + 1, 1)
+                continue
+            if not self.matches_day(candidate):
+                candidate = (candidate + timedelta(days=1)).replace(hour=0, minute=0)
+                continue
+            if candidate.hour not in self.hours:
+                candidate = (candidate + timedelta(hours=1)).replace(minute=0)
+                continue
+            if candidate.minute not in self.minutes:
+                candidate += timedelta(minutes=1)
+                continue
+            return candidate
+        raise ValueError(f"cron表达式没有可执行的时间: {self.expression}")
+
+
+def parse_window(window: str) -> Tuple[time, time]:
+    """解析 "HH:MM-HH:MM" 形式的执行时段，结束时间早于开始时间表示跨越午夜"""
+    try:
+        start_text, end_text = window.split("-", 1)
+        start = datetime.strptime(start_text.strip(), "%H:%M").time()
+        end = datetime.strptime(end_text.strip(), "%H:%M").time()
+    except ValueError:
+        raise ValueError(f"执行时段格式应为HH:MM-HH:MM: {window}")
+    if start == end:
+        raise ValueError(f"执行时段的开始和结束时间不能相同: {window}")
+    return start, end
+
+
+class PipelineSchedule:
+    """管道的调度配置"""
+
+    def __init__(self, config: Dict[str, Any]) -> None:
+        if not isinstance(config, dict):
+            raise ValueError("调度配置须为对象")
+        cron = config.get("cron")
+        interval = config.get("interval")
+        if (cron is None) == (interval is None):
+            raise ValueError("调度配置须指定cron或interval之一")
+
+        self.cron = CronSchedule(cron) if cron is not None else None
+        self.interval: Optional[timedelta] = None
+        if interval is not None:
+            if not isinstance(interval, (int, float)) or interval < 60:
+                raise ValueError("执行间隔（interval）须为不少于60的秒数")
+            self.interval = timedelta(seconds=interval)
+
+        zone = config.get("timezone", SCHEDULER_CONFIG["timezone"])
+        try:
+            self.timezone = ZoneInfo(zone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"未知的时区: {zone}")
+
+        window = config.get("window")
+        if window is None and config.get("quiet_hours"):
+            window = SCHEDULER_CONFIG["quiet_hours"]
+        self.window = parse_window(window) if window else None
+
+        self.enabled = bool(config.get("enabled", True))
+        self.user_id: Optional[int] = config.get("user_id")
+        self.table_name: Optional[str] = config.get("table_name")
+        self.source_table_id: Optional[int] = config.get("source_table_id")
+
+    def local(self, moment: datetime) -> datetime:
+        """UTC时间转为配置时区的本地时间（均不带时区）"""
+        return moment.replace(tzinfo=timezone.utc).astimezone(self.timezone).replace(tzinfo=None)
+
+    def utc(self, moment: datetime) -> datetime:
+        """配置时区的本地时间转为UTC时间（均不带时区）"""
+        return moment.replace(tzinfo=self.timezone).astimezone(timezone.utc).replace(tzinfo=None)
+
+    def next_run(self, last: datetime) -> datetime:
+        """
+        上次执行（或管道创建）之后的下次到期时间
+
+        Args:
+            last (datetime): 上次执行的UTC时间
+
+        Returns:
+            datetime: 下次到期的UTC时间
+        """
+        if self.interval is not None:
+            return last + self.interval
+        return self.utc(self.cron.next_after(self.local(last)))
+
+    def in_window(self, moment: datetime) -> bool:
+        """给定UTC时间是否在执行时段内，未配置时段时总是返回True"""
+        if self.window is None:
+            return True
+        start, end = self.window
+        current = self.local(moment).time()
+        if start < end:
+            return start <= current < end
+        return current >= start or current < end
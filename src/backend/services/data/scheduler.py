@@ -0,0 +1,472 @@
+"""
+数据处理管道定时调度模块
+
+网关的每个副本都运行一个调度线程，通过Redis中的领导锁选出唯一的领导者，只有
+领导者检查到期的管道；领导者失联后锁在有效期结束时释放，由其他副本接替。
+
+到期的管道不在调度线程或Web请求中执行，而是记录为排队的执行记录并提交到Celery的
+管道队列，由独立的工作进程执行。提交前检查：
+- 执行时段：配置了时段（或低峰时段）的管道在时段外推迟到时段开始；
+- 输入校验和：管道定义和输入数据块的校验和与上次成功执行相同时直接记为跳过；
+- 并发上限：排队和执行中的记录总数及每个用户的记录数超过上限时推迟到下次检查。
+
+工作进程执行时优先增量更新上次成功执行的结果表，结果表不存在时创建新的结果表。
+每次执行的状态、耗时和处理的数据块数记录在 PipelineRun 中。执行中的记录定期更新
+心跳，长时间执行的任务不会被误判为超时；只有取得记录的那次执行能写入最终状态。
+"""
+
+import hashlib
+import logging
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import redis
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import Session
+
+from .models import DataTable
+from .storage import DataPipeline, PipelineRun
+from .table import DataTableService
+from .pipeline import PipelineService
+from .pipeline_cache import pipeline_hash
+from .schedule import PipelineSchedule
+from .tasks import run_pipeline_task
+from .config import SCHEDULER_CONFIG
+from ..database import get_db
+from ...common.cache.redis_client import get_redis_connection
+from ...common.cache.config import CACHE_KEY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# 执行记录状态
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+SKIPPED = "skipped"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+LOCK_KEY = f"{CACHE_KEY_PREFIX}:pipeline_scheduler:leader"
+
+
+class LeaderLock:
+    """Redis中的领导锁，值为持有者的随机令牌，只有持有者可以续期和释放"""
+
+    def __init__(self, client: Optional[redis.Redis] = None, key: str = LOCK_KEY,
+                 ttl: int = SCHEDULER_CONFIG["lock_ttl"]) -> None:
+        self.redis = client or get_redis_connection()
+        self.key = key
+        self.ttl_ms = ttl * 1000
+        self.token = uuid.uuid4().hex
+
+    def acquire(self) -> bool:
+        """获取或续期领导锁，成为（或仍是）领导者时返回True"""
+        if self.redis.set(self.key, self.token, nx=True, px=self.ttl_ms):
+            return True
+        return self._if_owner(lambda pipe: pipe.pexpire(self.key, self.ttl_ms))
+
+    def release(self) -> bool:
+        """释放自己持有的领导锁"""
+        return self._if_owner(lambda pipe: pipe.delete(self.key))
+
+    def _if_owner(self, command) -> bool:
+        # 检查令牌和执行命令之间锁被其他副本取得时事务失败
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self.key)
+                if pipe.get(self.key) != self.token:
+                    pipe.unwatch()
+                    return False
+                pipe.multi()
+                command(pipe)
+                pipe.execute()
+                return True
+            except redis.WatchError:
+                return False
+
+
+class PipelineScheduler:
+    """检查到期的管道并提交执行，以及在工作进程中执行提交的记录"""
+
+    def __init__(self, db: Session) -> None:
+        self.db = db
+        self.table_service = DataTableService(db)
+
+    def tick(self, now: Optional[datetime] = None) -> Dict[str, List[int]]:
+        """
+        检查一次到期的管道
+
+        Args:
+            now (Optional[datetime]): 当前UTC时间，默认为系统时间
+
+        Returns:
+            Dict[str, List[int]]: 本次排队、跳过和推迟的管道ID
+        """
+        now = now or datetime.utcnow()
+        self._expire_stale(now)
+        summary: Dict[str, List[int]] = {"queued": [], "skipped": [], "deferred": []}
+
+        active = self.db.query(PipelineRun).filter(PipelineRun.status.in_(ACTIVE_STATUSES)).all()
+        running_pipelines = {run.pipeline_id for run in active}
+        per_user = Counter(run.user_id for run in active)
+        total = len(active)
+
+        for due, pipeline, schedule in self._due_pipelines(now):
+            # 上一次执行尚未结束的管道不重复排队
+            if pipeline.id in running_pipelines:
+                continue
+            if not schedule.in_window(now):
+                summary["deferred"].append(pipeline.id)
+                continue
+
+            user_id = schedule.user_id
+            try:
+                checksum = self.input_checksum(pipeline, schedule.source_table_id)
+            except ValueError as e:
+                self._record(pipeline.id, user_id, "schedule", FAILED, now=now, error=str(e))
+                continue
+            last = self._last_run(pipeline.id, SUCCEEDED)
+            if last is not None and last.input_checksum == checksum:
+                self._record(pipeline.id, user_id, "schedule", SKIPPED, checksum, now)
+                summary["skipped"].append(pipeline.id)
+                continue
+
+            if (total >= SCHEDULER_CONFIG["max_concurrent_runs"]
+                    or per_user[user_id] >= SCHEDULER_CONFIG["max_runs_per_user"]):
+                summary["deferred"].append(pipeline.id)
+                continue
+
+            self._enqueue(self._record(pipeline.id, user_id, "schedule", QUEUED, checksum, now))
+            running_pipelines.add(pipeline.id)
+            per_user[user_id] += 1
+            total += 1
+            summary["queued"].append(pipeline.id)
+        return summary
+
+    def submit(self, pipeline_id: int, user_id: int) -> PipelineRun:
+        """
+        手动提交一次执行，不受执行时段限制，但同样计入并发上限
+
+        Args:
+            pipeline_id (int): 管道ID
+            user_id (int): 用户ID
+
+        Returns:
+            PipelineRun: 排队的执行记录
+        """
+        pipeline = PipelineService(self.db)._get_executable_pipeline(pipeline_id, user_id)
+        source_table_id = None
+        if pipeline.schedule:
+            source_table_id = PipelineSchedule(pipeline.schedule).source_table_id
+        checksum = self.input_checksum(pipeline, source_table_id)
+
+        active = self.db.query(PipelineRun).filter(PipelineRun.status.in_(ACTIVE_STATUSES)).all()
+        if any(run.pipeline_id == pipeline.id for run in active):
+            raise ValueError("该管道已有排队或执行中的任务")
+        if (len(active) >= SCHEDULER_CONFIG["max_concurrent_runs"]
+                or sum(run.user_id == user_id for run in active)
+                >= SCHEDULER_CONFIG["max_runs_per_user"]):
+            raise ValueError("排队和执行中的管道任务已达到上限，请稍后再试")
+
+        run = self._record(pipeline.id, user_id, "manual", QUEUED, checksum)
+        self._enqueue(run)
+        return run
+
+    def list_runs(self, pipeline_id: int, user_id: int, limit: int = 50) -> List[PipelineRun]:
+        """管道的执行记录，按提交时间倒序"""
+        PipelineService(self.db).get_pipeline(pipeline_id, user_id)
+        return self.db.query(PipelineRun).filter(
+            PipelineRun.pipeline_id == pipeline_id
+        ).order_by(PipelineRun.created_at.desc()).limit(limit).all()
+
+    def execute(self, run_id: int) -> PipelineRun:
+        """
+        在工作进程中执行一条排队的记录
+
+        Args:
+            run_id (int): 执行记录ID
+
+        Returns:
+            PipelineRun: 执行结束后的记录，失败原因记录在error中
+        """
+        run = self.db.query(PipelineRun).filter(PipelineRun.id == run_id).first()
+        if run is None:
+            raise ValueError("执行记录不存在")
+
+        # 以条件更新取得记录，任务重复投递时只执行一次
+        attempt = uuid.uuid4().hex
+        started_at = datetime.utcnow()
+        claimed = self.db.query(PipelineRun).filter(
+            PipelineRun.id == run_id, PipelineRun.status == QUEUED
+        ).update({
+            "status": RUNNING, "attempt": attempt,
+            "started_at": started_at, "heartbeat_at": started_at,
+        }, synchronize_session=False)
+        self.db.commit()
+        self.db.refresh(run)
+        if not claimed:
+            return run
+
+        result: Dict[str, Any] = {}
+        try:
+            with RunHeartbeat(run.id, attempt):
+                table = self._run_pipeline(run)
+            result = {
+                "status": SUCCEEDED,
+                "result_table_id": table.id,
+                "processed_blocks": ((table.metadata or {}).get("pipeline_run") or {}).get(
+                    "processed_blocks"
+                ),
+            }
+        except Exception as e:
+            logger.exception(f"管道定时执行失败: pipeline={run.pipeline_id} run={run.id}")
+            self.db.rollback()
+            result = {"status": FAILED, "error": str(e)}
+        finished_at = datetime.utcnow()
+        result["finished_at"] = finished_at
+        result["duration_seconds"] = (finished_at - started_at).total_seconds()
+
+        # 记录已被判定超时（或由其他执行取得）时不覆盖其状态
+        updated = self.db.query(PipelineRun).filter(
+            PipelineRun.id == run.id,
+            PipelineRun.status == RUNNING,
+            PipelineRun.attempt == attempt
+        ).update(result, synchronize_session=False)
+        self.db.commit()
+        if not updated:
+            logger.warning(f"执行记录已不属于本次执行，未写入结果: run={run.id}")
+        self.db.refresh(run)
+        return run
+
+    def input_checksum(self, pipeline: DataPipeline, source_table_id: Optional[int] = None) -> str:
+        """
+        管道定义和输入数据块的校验和，两者都不变时执行结果也不变
+
+        Args:
+            pipeline (DataPipeline): 数据处理管道
+            source_table_id (Optional[int]): 输入数据表ID，为空时使用管道所属的数据表
+
+        Returns:
+            str: SHA-256校验和
+        """
+        table_id = source_table_id or pipeline.table_id
+        if self.db.query(DataTable).filter(DataTable.id == table_id).first() is None:
+            raise ValueError("输入数据表不存在")
+        digest = hashlib.sha256(pipeline_hash(pipeline).encode("utf-8"))
+        for block in self.table_service.get_blocks(table_id):
+            digest.update(block.checksum.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _due_pipelines(self, now: datetime) -> List[Any]:
+        """已到期的启用管道及其调度配置，按到期时间排序"""
+        due = []
+        for pipeline in self.db.query(DataPipeline).filter(DataPipeline.is_active.is_(True)).all():
+            if not pipeline.schedule:
+                continue
+            try:
+                schedule = PipelineSchedule(pipeline.schedule)
+            except ValueError as e:
+                logger.warning(f"管道 {pipeline.id} 的调度配置无效: {e}")
+                continue
+            if not schedule.enabled or schedule.user_id is None:
+                continue
+            last = self._last_run(pipeline.id, trigger="schedule")
+            try:
+                next_run = schedule.next_run(last.created_at if last else pipeline.created_at)
+            except ValueError as e:
+                # 单个管道的配置错误不能影响其他管道的调度
+                logger.warning(f"管道 {pipeline.id} 的调度配置无效: {e}")
+                continue
+            if next_run <= now:
+                due.append((next_run, pipeline, schedule))
+        due.sort(key=lambda item: item[0])
+        return due
+
+    def _run_pipeline(self, run: PipelineRun) -> DataTable:
+        """增量更新上次成功执行的结果表，不存在时创建新的结果表"""
+        service = PipelineService(self.db)
+        pipeline = service.get_pipeline(run.pipeline_id, run.user_id)
+        schedule = PipelineSchedule(pipeline.schedule) if pipeline.schedule else None
+
+        previous = self.db.query(PipelineRun).filter(
+            PipelineRun.pipeline_id == pipeline.id,
+            PipelineRun.status == SUCCEEDED,
+            PipelineRun.result_table_id.isnot(None)
+        ).order_by(PipelineRun.created_at.desc()).first()
+        if previous is not None:
+            result_table = self.db.query(DataTable).filter(
+                DataTable.id == previous.result_table_id
+            ).first()
+            if result_table is not None:
+                return service.refresh_pipeline_result(pipeline.id, run.user_id, result_table.id)
+
+        table_name = (schedule.table_name if schedule else None) or f"{pipeline.name}_result"
+        return service.execute_pipeline_on_table(
+            pipeline.id, run.user_id, table_name,
+            schedule.source_table_id if schedule else None,
+            f"管道 {pipeline.name} 的定时执行结果"
+        )
+
+    def _expire_stale(self, now: datetime) -> None:
+        """
+        超时未结束的记录记为失败，不再占用并发数
+
+        排队的记录按提交时间计算超时；执行中的记录按最近一次心跳计算，只有工作进程
+        崩溃、不再更新心跳的记录才会超时，长时间正常执行的任务不受影响。
+        """
+        queued_deadline = now - timedelta(seconds=SCHEDULER_CONFIG["run_timeout"])
+        running_deadline = now - timedelta(seconds=SCHEDULER_CONFIG["heartbeat_timeout"])
+        stale = self.db.query(PipelineRun).filter(or_(
+            and_(PipelineRun.status == QUEUED, PipelineRun.created_at < queued_deadline),
+            and_(
+                PipelineRun.status == RUNNING,
+                func.coalesce(PipelineRun.heartbeat_at, PipelineRun.started_at) < running_deadline
+            )
+        )).all()
+        for run in stale:
+            run.status = FAILED
+            run.error = "执行超时"
+            run.finished_at = now
+        if stale:
+            self.db.commit()
+
+    def _last_run(self, pipeline_id: int, status: Optional[str] = None,
+                  trigger: Optional[str] = None) -> Optional[PipelineRun]:
+        query = self.db.query(PipelineRun).filter(PipelineRun.pipeline_id == pipeline_id)
+        if status is not None:
+            query = query.filter(PipelineRun.status == status)
+        if trigger is not None:
+            query = query.filter(PipelineRun.trigger == trigger)
+        return query.order_by(PipelineRun.created_at.desc()).first()
+
+    def _record(self, pipeline_id: int, user_id: int, trigger: str, status: str,
+                checksum: Optional[str] = None, now: Optional[datetime] = None,
+                error: Optional[str] = None) -> PipelineRun:
+        run = PipelineRun(
+            pipeline_id=pipeline_id, user_id=user_id, trigger=trigger, status=status,
+            input_checksum=checksum, error=error, created_at=now or datetime.utcnow()
+        )
+        if status in (SKIPPED, FAILED):
+            run.finished_at = run.created_at
+            run.duration_seconds = 0.0
+        self.db.add(run)
+        self.db.commit()
+        self.db.refresh(run)
+        return run
+
+    def _enqueue(self, run: PipelineRun) -> None:
+        run_pipeline_task.apply_async((run.id,), queue=SCHEDULER_CONFIG["queue"])
+
+
+class RunHeartbeat:
+    """执行期间在后台线程中定期更新执行记录的心跳时间"""
+
+    def __init__(self, run_id: int, attempt: str,
+                 interval: int = SCHEDULER_CONFIG["heartbeat_interval"]) -> None:
+        self.run_id = run_id
+        self.attempt = attempt
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "RunHeartbeat":
+        self._thread = threading.Thread(
+            target=self._loop, name=f"pipeline-run-{self.run_id}-heartbeat", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def beat(self) -> None:
+        # 使用独立的会话，不与执行管道的会话共用连接
+        db_session = get_db()
+        db = next(db_session)
+        try:
+            db.query(PipelineRun).filter(
+                PipelineRun.id == self.run_id,
+                PipelineRun.status == RUNNING,
+                PipelineRun.attempt == self.attempt
+            ).update({"heartbeat_at": datetime.utcnow()}, synchronize_session=False)
+            db.commit()
+        finally:
+            db_session.close()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.beat()
+            except Exception:
+                logger.exception(f"更新执行记录心跳失败: run={self.run_id}")
+
+
+class SchedulerRunner:
+    """后台调度线程：按间隔竞争领导锁，成为领导者后检查到期的管道"""
+
+    def __init__(self, interval: int = SCHEDULER_CONFIG["tick_interval"],
+                 lock: Optional[LeaderLock] = None) -> None:
+        self.interval = interval
+        self.lock = lock or LeaderLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="pipeline-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.lock.release()
+
+    def run_once(self) -> Optional[Dict[str, List[int]]]:
+        """执行一次检查，不是领导者时返回None"""
+        if not self.lock.acquire():
+            return None
+        db_session = get_db()
+        db = next(db_session)
+        try:
+            return PipelineScheduler(db).tick()
+        finally:
+            db_session.close()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("管道调度检查失败")
+            self._stop.wait(self.interval)
+
+
+_runner: Optional[SchedulerRunner] = None
+_runner_lock = threading.Lock()
+
+
+def start_scheduler() -> SchedulerRunner:
+    """启动本进程的调度线程（只启动一次）"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = SchedulerRunner()
+        _runner.start()
+        return _runner
+
+
+def stop_scheduler() -> None:
+    """停止本进程的调度线程并释放领导锁"""
+    global _runner
+    with _runner_lock:
+        if _runner is not None:
+            _runner.stop(timeout=SCHEDULER_CONFIG["tick_interval"])
+            _runner = None
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
@@ -9,6 +9,7 @@ from .models import Dataset, DatasetVersion, PermissionLevel, DatasetMetadata, D
 from .storage import FileStorage
 from .permission import DatasetPermissionService
 from .metadata import DatasetMetadataService
+from .pagination import order_by_recent, paginate_by_cursor
 from ..database import get_db
 from ..auth.models import User
 
@@ -55,7 +56,29 @@ class DatasetService:
         search: Optional[str] = None,
         tags: Optional[List[str]] = None
     ) -> List[Dataset]:
-        """获取数据集列表"""
+        """获取数据集列表（偏移分页，保留以兼容旧客户端）"""
+        query = order_by_recent(self._datasets_query(user_id, search, tags), Dataset)
+        return query.offset(skip).limit(limit).all()
+
+    def list_datasets_page(
+        self,
+        user_id: int,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        search: Optional[str] = None,
+        tags: Optional[List[str]] = None
+    ) -> Tuple[List[Dataset], Optional[str]]:
+        """按游标分页获取数据集列表，按更新时间倒序，返回(数据集列表, 下一页游标)"""
+        query = self._datasets_query(user_id, search, tags)
+        return paginate_by_cursor(query, Dataset, limit, cursor)
+
+    def _datasets_query(
+        self,
+        user_id: int,
+        search: Optional[str],
+        tags: Optional[List[str]]
+    ):
+        """构建用户可见数据集的查询"""
         # 获取用户有权限的数据集ID列表
         permissions = self.permission_service.list_permissions(user_id)
         dataset_ids = [p.dataset_id for p in permissions]
@@ -80,7 +103,7 @@ class DatasetService:
             for tag in tags:
                 query = query.filter(Dataset.tags.contains([tag]))
 
-        return query.offset(skip).limit(limit).all()
+        return query
 
     def update_dataset(self, dataset_id: int, dataset: Dataset, user_id: int) -> Optional[Dataset]:
         """更新数据集"""
@@ -1,11 +1,14 @@
 import os
 import hashlib
+import tempfile
 from typing import Optional, List, Dict, Any, Union
 from fastapi import UploadFile
 from datetime import datetime
 from pydantic import BaseModel, Field
 from enum import Enum
 
+from .config import UPLOAD_CONFIG
+
 class StorageType(str, Enum):
     """存储类型枚举"""
     FILE = "file"           # 文件存储
@@ -30,6 +33,7 @@ class DataBlock(BaseModel):
     row_count: int = Field(..., description="行数")
     file_path: Optional[str] = Field(None, description="文件路径")
     checksum: str = Field(..., description="数据校验和")
+    statistics: Dict[str, Any] = Field(default_factory=dict, description="块内各列统计信息")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -71,6 +75,61 @@ class DataPipeline(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PipelineRun(BaseModel):
+    """管道执行记录模型"""
+    id: Optional[int] = None
+    pipeline_id: int = Field(..., description="管道ID")
+    user_id: int = Field(..., description="执行身份的用户ID")
+    trigger: str = Field("schedule", description="触发方式：schedule或manual")
+    status: str = Field("queued", description="状态：queued/running/succeeded/failed/skipped")
+    input_checksum: Optional[str] = Field(None, description="管道定义和输入数据块的校验和")
+    result_table_id: Optional[int] = Field(None, description="结果表ID")
+    processed_blocks: Optional[int] = Field(None, description="本次处理的输入数据块数")
+    error: Optional[str] = Field(None, description="失败原因")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(None, description="开始执行时间")
+    heartbeat_at: Optional[datetime] = Field(None, description="执行中最近一次心跳时间")
+    attempt: Optional[str] = Field(None, description="取得该记录的执行尝试标识")
+    finished_at: Optional[datetime] = Field(None, description="结束时间")
+    duration_seconds: Optional[float] = Field(None, description="执行耗时（秒）")
+
+class UploadTooLargeError(ValueError):
+    """上传文件超过大小限制"""
+    pass
+
+async def save_upload(file: UploadFile, max_size: Optional[int] = None) -> tuple[str, int, str]:
+    """将上传文件分块流式写入唯一的临时文件，并在写入过程中计算校验和
+    
+    Args:
+        file: 上传的文件
+        max_size: 允许的最大字节数，为空时使用配置值
+        
+    Returns:
+        tuple: (临时文件路径, 文件大小, SHA-256校验和)
+    """
+    max_size = max_size or UPLOAD_CONFIG["max_size"]
+    os.makedirs(UPLOAD_CONFIG["dir"], exist_ok=True)
+    
+    # 保留扩展名，pandas依赖扩展名选择Excel解析引擎
+    suffix = os.path.splitext(file.filename or "")[1]
+    fd, file_path = tempfile.mkstemp(dir=UPLOAD_CONFIG["dir"], suffix=suffix)
+    
+    file_size = 0
+    sha256_hash = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CONFIG["chunk_size"]):
+                file_size += len(chunk)
+                if file_size > max_size:
+                    raise UploadTooLargeError(f"上传文件超过大小限制: {max_size} 字节")
+                sha256_hash.update(chunk)
+                buffer.write(chunk)
+    except BaseException:
+        os.remove(file_path)
+        raise
+    
+    return file_path, file_size, sha256_hash.hexdigest()
+
 class FileStorage:
     def __init__(self, base_path: str = "data/datasets"):
         """初始化文件存储服务
@@ -140,17 +199,16 @@ class FileStorage:
         # 获取文件存储路径
         file_path = self._get_file_path(dataset_id, version, safe_filename)
         
-        # 保存文件
+        # 保存文件，写入的同时计算校验和，避免再次读取文件
         file_size = 0
+        sha256_hash = hashlib.sha256()
         with open(file_path, "wb") as buffer:
-            while chunk := await file.read(8192):
+            while chunk := await file.read(UPLOAD_CONFIG["chunk_size"]):
                 file_size += len(chunk)
+                sha256_hash.update(chunk)
                 buffer.write(chunk)
         
-        # 计算校验和
-        checksum = self._calculate_checksum(file_path)
-        
-        return file_path, file_size, checksum
+        return file_path, file_size, sha256_hash.hexdigest()
 
     def get_file(self, dataset_id: int, version: str, filename: str) -> Optional[str]:
         """获取文件路径
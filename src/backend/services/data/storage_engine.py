@@ -1,5 +1,7 @@
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Optional, Sequence
 import os
+import tempfile
+import numpy as np
 import pandas as pd
 import hashlib
 from datetime import datetime
@@ -10,6 +12,15 @@ from botocore.exceptions import ClientError
 
 from .storage import StorageType, StorageConfig, DataBlock
 from .permission import DatasetPermissionService
+from .config import DATA_STORAGE_PATH, PARQUET_ROW_GROUP_SIZE
+from .filters import FilterExpression
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 class StorageEngine:
     """存储引擎基类"""
@@ -21,10 +32,58 @@ class StorageEngine:
         """保存数据块"""
         raise NotImplementedError
         
-    def load_block(self, block: DataBlock) -> pd.DataFrame:
-        """加载数据块"""
+    def load_block(self, block: DataBlock, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """加载数据块
+        
+        Args:
+            block: 数据块
+            columns: 需要读取的列，为空时读取全部列
+        """
         raise NotImplementedError
         
+    def head_block(self, block: DataBlock, limit: int,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """读取数据块的前limit行，默认加载整个数据块后截取"""
+        return self.load_block(block, columns).head(limit)
+        
+    def take_rows(self, block: DataBlock, offsets: Sequence[int],
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """按块内行偏移读取指定的行，默认加载整个数据块后选取
+        
+        Args:
+            block: 数据块
+            offsets: 块内行偏移，结果按此顺序排列
+            columns: 需要读取的列，为空时读取全部列
+        """
+        return self.load_block(block, columns).iloc[list(offsets)].reset_index(drop=True)
+        
+    def slice_block(self, block: DataBlock, offset: int, limit: int,
+                    columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """读取数据块中从offset开始的至多limit行，默认按行偏移读取
+        
+        Args:
+            block: 数据块
+            offset: 块内起始行偏移
+            limit: 最多读取的行数
+            columns: 需要读取的列，为空时读取全部列
+        """
+        end = min(offset + limit, block.row_count)
+        return self.take_rows(block, range(offset, max(offset, end)), columns)
+        
+    def scan_block(self, block: DataBlock, columns: Optional[List[str]] = None,
+                   expression: Optional[FilterExpression] = None) -> pd.DataFrame:
+        """读取数据块中满足过滤表达式的行，默认加载后在内存中过滤
+        
+        Args:
+            block: 数据块
+            columns: 需要返回的列，为空时返回全部列
+            expression: 过滤表达式，为空时不过滤
+        """
+        if expression is None:
+            return self.load_block(block, columns)
+        data = self.load_block(block, expression.read_columns(columns))
+        return expression.apply(data, columns)
+        
     def delete_block(self, block: DataBlock) -> None:
         """删除数据块"""
         raise NotImplementedError
@@ -44,15 +103,76 @@ class FileStorageEngine(StorageEngine):
     def save_block(self, block: DataBlock, data: pd.DataFrame) -> None:
         """保存数据块到文件"""
         file_path = os.path.join(self.base_path, f"block_{block.id}.parquet")
-        data.to_parquet(file_path)
+        data.to_parquet(file_path, row_group_size=PARQUET_ROW_GROUP_SIZE)
         block.file_path = file_path
         block.checksum = self.calculate_checksum(data)
         
-    def load_block(self, block: DataBlock) -> pd.DataFrame:
+    def load_block(self, block: DataBlock, columns: Optional[List[str]] = None) -> pd.DataFrame:
         """从文件加载数据块"""
         if not block.file_path or not os.path.exists(block.file_path):
             raise FileNotFoundError(f"数据块文件不存在: {block.file_path}")
-        return pd.read_parquet(block.file_path)
+        return pd.read_parquet(block.file_path, columns=columns)
+        
+    def head_block(self, block: DataBlock, limit: int,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """按行组读取数据块的前limit行，读够即停止"""
+        if pq is None:
+            return super().head_block(block, limit, columns)
+        if not block.file_path or not os.path.exists(block.file_path):
+            raise FileNotFoundError(f"数据块文件不存在: {block.file_path}")
+        
+        parquet_file = pq.ParquetFile(block.file_path)
+        for batch in parquet_file.iter_batches(batch_size=limit, columns=columns):
+            return batch.to_pandas()
+        # 空数据块没有任何批次
+        return parquet_file.read(columns=columns).to_pandas()
+        
+    def take_rows(self, block: DataBlock, offsets: Sequence[int],
+                  columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """只读取偏移所在的行组，再从中选取指定的行"""
+        if pq is None:
+            return super().take_rows(block, offsets, columns)
+        if not block.file_path or not os.path.exists(block.file_path):
+            raise FileNotFoundError(f"数据块文件不存在: {block.file_path}")
+        
+        parquet_file = pq.ParquetFile(block.file_path)
+        metadata = parquet_file.metadata
+        # 各行组的起始行偏移
+        starts = np.cumsum(
+            [0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)]
+        )
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if len(offsets) and (offsets.min() < 0 or offsets.max() >= starts[-1]):
+            raise IndexError(f"行偏移超出数据块范围: {block.block_index}")
+        
+        row_groups = np.searchsorted(starts, offsets, side="right") - 1
+        selected = np.unique(row_groups)
+        # 选中的行组拼接后，每个行组在结果中的起始位置
+        sizes = starts[selected + 1] - starts[selected]
+        bases = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+        positions = offsets - starts[row_groups] + bases[np.searchsorted(selected, row_groups)]
+        
+        data = parquet_file.read_row_groups(selected.tolist(), columns=columns)
+        return data.take(pa.array(positions)).to_pandas().reset_index(drop=True)
+        
+    def scan_block(self, block: DataBlock, columns: Optional[List[str]] = None,
+                   expression: Optional[FilterExpression] = None) -> pd.DataFrame:
+        """将过滤表达式下推到Parquet读取，按行组统计跳过不匹配的行组"""
+        arrow_filter = expression.to_arrow() if expression is not None and pq else None
+        if arrow_filter is None:
+            return super().scan_block(block, columns, expression)
+        if not block.file_path or not os.path.exists(block.file_path):
+            raise FileNotFoundError(f"数据块文件不存在: {block.file_path}")
+        
+        try:
+            data = pq.read_table(
+                block.file_path, columns=expression.read_columns(columns), filters=arrow_filter
+            ).to_pandas()
+        except (pa.ArrowException, TypeError):
+            # 常量与列类型不匹配等无法下推的情况，回退到读取后过滤
+            return super().scan_block(block, columns, expression)
+        # 下推的条件可能比完整表达式宽松，仍需按完整表达式过滤
+        return expression.apply(data, columns)
         
     def delete_block(self, block: DataBlock) -> None:
         """删除数据块文件"""
@@ -72,10 +192,35 @@ class DatabaseStorageEngine(StorageEngine):
         data.to_sql(table_name, self.engine, if_exists="replace", index=False)
         block.checksum = self.calculate_checksum(data)
         
-    def load_block(self, block: DataBlock) -> pd.DataFrame:
+    def load_block(self, block: DataBlock, columns: Optional[List[str]] = None) -> pd.DataFrame:
         """从数据库加载数据块"""
         table_name = f"block_{block.id}"
-        return pd.read_sql(f"SELECT * FROM {table_name}", self.engine)
+        return pd.read_sql(f"SELECT {self._select_list(columns)} FROM {table_name}", self.engine)
+        
+    def head_block(self, block: DataBlock, limit: int,
+                   columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """从数据库读取数据块的前limit行"""
+        table_name = f"block_{block.id}"
+        return pd.read_sql(
+            f"SELECT {self._select_list(columns)} FROM {table_name} LIMIT {int(limit)}",
+            self.engine
+        )
+        
+    def slice_block(self, block: DataBlock, offset: int, limit: int,
+                    columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """从数据库读取数据块中从offset开始的至多limit行"""
+        table_name = f"block_{block.id}"
+        return pd.read_sql(
+            f"SELECT {self._select_list(columns)} FROM {table_name} "
+            f"LIMIT {int(limit)} OFFSET {int(offset)}",
+            self.engine
+        )
+        
+    def _select_list(self, columns: Optional[List[str]]) -> str:
+        """构建查询列列表"""
+        if not columns:
+            return "*"
+        return ", ".join('"{}"'.format(col.replace('"', '""')) for col in columns)
         
     def delete_block(self, block: DataBlock) -> None:
         """从数据库删除数据块"""
@@ -99,26 +244,31 @@ class CloudStorageEngine(StorageEngine):
     def save_block(self, block: DataBlock, data: pd.DataFrame) -> None:
         """保存数据块到云存储"""
         key = f"blocks/block_{block.id}.parquet"
-        data.to_parquet("/tmp/temp.parquet")
+        # 每次使用唯一的临时文件，并发读写数据块时互不覆盖
+        fd, temp_path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
         
         try:
-            self.s3_client.upload_file("/tmp/temp.parquet", self.bucket, key)
+            data.to_parquet(temp_path, row_group_size=PARQUET_ROW_GROUP_SIZE)
+            self.s3_client.upload_file(temp_path, self.bucket, key)
             block.file_path = key
             block.checksum = self.calculate_checksum(data)
         finally:
-            os.remove("/tmp/temp.parquet")
+            os.remove(temp_path)
             
-    def load_block(self, block: DataBlock) -> pd.DataFrame:
+    def load_block(self, block: DataBlock, columns: Optional[List[str]] = None) -> pd.DataFrame:
         """从云存储加载数据块"""
         if not block.file_path:
             raise ValueError("数据块文件路径未设置")
             
+        fd, temp_path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
         try:
-            self.s3_client.download_file(self.bucket, block.file_path, "/tmp/temp.parquet")
-            return pd.read_parquet("/tmp/temp.parquet")
+            self.s3_client.download_file(self.bucket, block.file_path, temp_path)
+            return pd.read_parquet(temp_path, columns=columns)
         finally:
-            if os.path.exists("/tmp/temp.parquet"):
-                os.remove("/tmp/temp.parquet")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
                 
     def delete_block(self, block: DataBlock) -> None:
         """从云存储删除数据块"""
@@ -141,4 +291,9 @@ class StorageEngineFactory:
         elif config.type == StorageType.CLOUD:
             return CloudStorageEngine(config)
         else:
-            raise ValueError(f"不支持的存储类型: {config.type}") 
\ No newline at end of file
+            raise ValueError(f"不支持的存储类型: {config.type}")
+
+    @staticmethod
+    def create_default_engine() -> StorageEngine:
+        """创建默认的文件存储引擎实例"""
+        return FileStorageEngine(StorageConfig(type=StorageType.FILE, path=DATA_STORAGE_PATH))
@@ -1,17 +1,34 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple, Iterable
+import pandas as pd
 from datetime import datetime
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 
-from .models import DataTable, ColumnMetadata
+from .models import DataTable, TableExport, TableQuery
 from .permission import DatasetPermissionService
+from .storage import DataBlock
+from .storage_engine import StorageEngine, StorageEngineFactory
+from .profiling import to_json_value
+from .filters import compile_filter
+from .pagination import (
+    order_by_recent, paginate_by_cursor, encode_row_cursor, decode_row_cursor
+)
+from .export import TableExporter, TableExportStream
+from .query import TableQueryEngine, TableQueryResult
+from .mutation import TableMutator
+from .index import TableIndexer, remove_index_files
+from .sampling import TableSampler
+from ...common.cache.cache_manager import CacheManager
+from ...common.cache.config import TTL_CONFIG
 
 class DataTableService:
     """数据表服务类"""
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, storage_engine: Optional[StorageEngine] = None):
         self.db = db
         self.permission_service = DatasetPermissionService(db)
+        self.storage_engine = storage_engine or StorageEngineFactory.create_default_engine()
+        self.cache = CacheManager()
     
     def create_table(self, table: DataTable, user_id: int) -> DataTable:
         """创建数据表
@@ -67,7 +84,7 @@ class DataTableService:
     
     def list_tables(self, dataset_id: int, user_id: int, 
                    skip: int = 0, limit: int = 100) -> List[DataTable]:
-        """列出数据集下的所有数据表
+        """列出数据集下的所有数据表（偏移分页，保留以兼容旧客户端）
         
         Args:
             dataset_id: 数据集ID
@@ -78,15 +95,30 @@ class DataTableService:
         Returns:
             数据表列表
         """
+        tables = order_by_recent(self._tables_query(dataset_id, user_id), DataTable)
+        return tables.offset(skip).limit(limit).all()
+    
+    def list_tables_page(self, dataset_id: int, user_id: int, limit: int = 100,
+                         cursor: Optional[str] = None) -> Tuple[List[DataTable], Optional[str]]:
+        """按游标分页列出数据集下的数据表，按更新时间倒序
+        
+        Args:
+            dataset_id: 数据集ID
+            user_id: 用户ID
+            limit: 返回记录数
+            cursor: 上一页返回的游标，为空时返回第一页
+            
+        Returns:
+            (数据表列表, 下一页游标)，没有下一页时游标为None
+        """
+        return paginate_by_cursor(self._tables_query(dataset_id, user_id), DataTable, limit, cursor)
+    
+    def _tables_query(self, dataset_id: int, user_id: int):
         # 检查用户是否有权限访问该数据集
         if not self.permission_service.has_permission(dataset_id, user_id, "VIEWER"):
             raise PermissionError("用户没有权限访问该数据集")
             
-        tables = self.db.query(DataTable).filter(
-            DataTable.dataset_id == dataset_id
-        ).offset(skip).limit(limit).all()
-        
-        return tables
+        return self.db.query(DataTable).filter(DataTable.dataset_id == dataset_id)
     
     def update_table(self, table_id: int, table: DataTable, user_id: int) -> DataTable:
         """更新数据表信息
@@ -132,33 +164,169 @@ class DataTableService:
         self.db.commit()
     
     def get_table_preview(self, table_id: int, user_id: int, 
-                         limit: int = 10) -> Dict[str, Any]:
+                         limit: int = 10,
+                         columns: Optional[List[str]] = None,
+                         where: Optional[str] = None) -> Dict[str, Any]:
         """获取数据表预览数据
         
+        只读取覆盖前limit行所需的数据块及其行组，结果按数据块校验和缓存，
+        数据块内容变化后缓存自动失效。指定过滤条件时按块统计跳过不匹配的数据块，
+        依次读取直到取满limit行。
+        
         Args:
             table_id: 数据表ID
             user_id: 用户ID
             limit: 预览行数
+            columns: 预览的列，为空时预览全部列
+            where: 过滤表达式
             
         Returns:
             预览数据
         """
         table = self.get_table(table_id, user_id)
         
-        # TODO: 实现实际的数据预览逻辑
-        # 这里需要根据实际的数据存储方式来实现
+        table_columns = [col.name for col in table.columns]
+        if columns:
+            unknown = [col for col in columns if col not in table_columns]
+            if unknown:
+                raise ValueError(f"数据表不存在列: {', '.join(unknown)}")
+        else:
+            columns = table_columns
+        
+        expression = compile_filter(where)
+        if expression is None:
+            # 只需要起始行落在预览范围内的数据块
+            blocks = [block for block in self.get_blocks(table.id) if block.start_row < limit]
+        else:
+            expression.validate(table_columns)
+            blocks = expression.prune(self.get_blocks(table.id))
+        
+        # 追加数据不改变已读数据块的校验和，键中加入总行数，避免返回过期的 total_rows
+        cache_key = self.cache.build_key(
+            "table_preview", table_id, table.row_count, [block.checksum for block in blocks],
+            columns, limit, str(expression) if expression is not None else None
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        rows = []
+        for block in blocks:
+            if len(rows) >= limit:
+                break
+            if expression is None:
+                data = self.storage_engine.head_block(block, limit - len(rows), columns)
+            else:
+                data = self.storage_engine.scan_block(block, columns, expression)
+                data = data.head(limit - len(rows))
+            rows.extend(
+                [to_json_value(value) for value in row]
+                for row in data.itertuples(index=False, name=None)
+            )
+        
         preview_data = {
             "table_id": table_id,
-            "columns": [col.name for col in table.columns],
-            "rows": [],  # 实际数据行
+            "columns": columns,
+            "rows": rows,
             "total_rows": table.row_count,
             "preview_size": limit
         }
+        self.cache.set(cache_key, preview_data, TTL_CONFIG["data_preview"])
         
         return preview_data
     
+    def get_table_rows(self, table_id: int, user_id: int,
+                       limit: int = 100,
+                       cursor: Optional[str] = None,
+                       start_row: Optional[int] = None,
+                       columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """按行分页读取数据表
+        
+        游标记录下一页在表中的位置（数据块索引和块内行偏移），每页直接定位到
+        所在的数据块，只读取覆盖本页的行组，翻到第几页的代价都相同。
+        也可以用start_row直接跳到指定行，按数据块的行范围定位。
+        
+        Args:
+            table_id: 数据表ID
+            user_id: 用户ID
+            limit: 每页行数
+            cursor: 上一页返回的游标
+            start_row: 起始行号（从0开始），与cursor二选一
+            columns: 读取的列，为空时读取全部列
+            
+        Returns:
+            本页数据和下一页游标，没有下一页时游标为None
+        """
+        table = self.get_table(table_id, user_id)
+        
+        table_columns = [col.name for col in table.columns]
+        columns = columns or table_columns
+        unknown = [col for col in columns if col not in table_columns]
+        if unknown:
+            raise ValueError(f"数据表不存在列: {', '.join(unknown)}")
+        
+        query = self.db.query(DataBlock).filter(DataBlock.table_id == table.id)
+        if cursor:
+            if start_row is not None:
+                raise ValueError("cursor和start_row不能同时使用")
+            block_index, offset = decode_row_cursor(cursor)
+            query = query.filter(DataBlock.block_index >= block_index)
+        else:
+            start_row = start_row or 0
+            block_index, offset = None, 0
+            query = query.filter(DataBlock.end_row >= start_row)
+        
+        rows = []
+        first_row = None
+        next_cursor = None
+        for block in query.order_by(DataBlock.block_index):
+            if block_index is None:
+                # 按行号定位：第一个结束行不小于start_row的数据块
+                block_index, offset = block.block_index, max(start_row - block.start_row, 0)
+            elif block.block_index != block_index:
+                offset = 0
+            if offset >= block.row_count:
+                continue
+            if len(rows) >= limit:
+                next_cursor = encode_row_cursor(block.block_index, offset)
+                break
+            
+            data = self.storage_engine.slice_block(block, offset, limit - len(rows), columns)
+            if first_row is None:
+                first_row = block.start_row + offset
+            rows.extend(
+                [to_json_value(value) for value in row]
+                for row in data.itertuples(index=False, name=None)
+            )
+            offset += len(data)
+            if len(rows) >= limit and offset < block.row_count:
+                next_cursor = encode_row_cursor(block.block_index, offset)
+                break
+        
+        return {
+            "table_id": table_id,
+            "columns": columns,
+            "rows": rows,
+            "start_row": first_row,
+            "total_rows": table.row_count,
+            "next_cursor": next_cursor
+        }
+    
+    def get_blocks(self, table_id: int) -> List[DataBlock]:
+        """按块索引顺序获取数据表的所有数据块
+        
+        Args:
+            table_id: 数据表ID
+            
+        Returns:
+            数据块列表
+        """
+        return self.db.query(DataBlock).filter(
+            DataBlock.table_id == table_id
+        ).order_by(DataBlock.block_index).all()
+    
     def export_table(self, table_id: int, export_config: Dict[str, Any], 
-                    user_id: int) -> str:
+                    user_id: int) -> TableExportStream:
         """导出数据表
         
         Args:
@@ -167,7 +335,8 @@ class DataTableService:
             user_id: 用户ID
             
         Returns:
-            导出文件路径
+            导出流，列、过滤条件的类型和第一块数据已在返回前检查和生成，
+            其余数据在迭代chunks时才逐块读取并编码
         """
         table = self.get_table(table_id, user_id)
         
@@ -175,8 +344,182 @@ class DataTableService:
         if not self.permission_service.has_permission(table.dataset_id, user_id, "VIEWER"):
             raise PermissionError("用户没有权限导出该数据表")
             
-        # TODO: 实现实际的数据导出逻辑
-        # 这里需要根据实际的数据存储方式和导出格式来实现
-        export_path = f"exports/table_{table_id}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        exporter = TableExporter(self.storage_engine)
+        return exporter.export(table, self.get_blocks(table.id), TableExport(**export_config))
+    
+    def query_table(self, table_id: int, query: TableQuery, user_id: int) -> TableQueryResult:
+        """对数据表执行即席查询
+        
+        Args:
+            table_id: 数据表ID
+            query: 查询（受限SQL或JSON查询描述）
+            user_id: 用户ID
+            
+        Returns:
+            查询结果，迭代其rows时才扫描数据块
+        """
+        # get_table已检查用户对该表所属数据集的查看权限
+        table = self.get_table(table_id, user_id)
+        engine = TableQueryEngine(self.storage_engine)
+        return engine.execute(table, self.get_blocks(table.id), query)
+    
+    def append_rows(self, table_id: int, chunks: Iterable[pd.DataFrame],
+                    user_id: int) -> DataTable:
+        """向数据表追加行，只写入新的数据块
+        
+        Args:
+            table_id: 数据表ID
+            chunks: 追加的数据，列须为数据表已有的列，缺少的列补为空值
+            user_id: 用户ID
+            
+        Returns:
+            更新后的数据表
+        """
+        table = self._get_editable_table(table_id, user_id)
+        mutator = TableMutator(self.db, self.storage_engine)
+        return mutator.append(table, self.get_blocks(table.id), chunks)
+    
+    def upsert_rows(self, table_id: int, data: pd.DataFrame, user_id: int) -> Dict[str, Any]:
+        """按声明的主键更新插入行，只重写包含变更主键的数据块
+        
+        Args:
+            table_id: 数据表ID
+            data: 更新插入的数据，须包含全部主键列
+            user_id: 用户ID
+            
+        Returns:
+            更新行数、插入行数和重写的数据块数
+        """
+        table = self._get_editable_table(table_id, user_id)
+        mutator = TableMutator(self.db, self.storage_engine)
+        return mutator.upsert(table, self.get_blocks(table.id), data)
+    
+    def _get_editable_table(self, table_id: int, user_id: int) -> DataTable:
+        table = self.get_table(table_id, user_id)
+        if not self.permission_service.has_permission(table.dataset_id, user_id, "EDITOR"):
+            raise PermissionError("用户没有权限编辑该数据表")
+        return table
+    
+    def create_index(self, table_id: int, column: str, kind: str, user_id: int) -> Dict[str, Any]:
+        """为数据表的列建立二级索引，已有索引时重建
+        
+        Args:
+            table_id: 数据表ID
+            column: 索引列
+            kind: 索引类型，hash（等值查找）或sorted（等值和范围查找）
+            user_id: 用户ID
+            
+        Returns:
+            索引信息
+        """
+        table = self._get_editable_table(table_id, user_id)
+        indexer = TableIndexer(self.storage_engine)
+        obsolete = indexer.create(table, self.get_blocks(table.id), column, kind)
+        self.db.commit()
+        remove_index_files(obsolete)
+        return indexer.indexes(table)[column]
+    
+    def drop_index(self, table_id: int, column: str, user_id: int) -> None:
+        """删除数据表列上的二级索引
+        
+        Args:
+            table_id: 数据表ID
+            column: 索引列
+            user_id: 用户ID
+        """
+        table = self._get_editable_table(table_id, user_id)
+        obsolete = TableIndexer(self.storage_engine).drop(table, column)
+        self.db.commit()
+        remove_index_files(obsolete)
+    
+    def lookup_rows(self, table_id: int, column: str, user_id: int,
+                    values: Optional[List[Any]] = None,
+                    low: Any = None, high: Any = None,
+                    columns: Optional[List[str]] = None,
+                    limit: Optional[int] = None) -> Dict[str, Any]:
+        """通过二级索引查找行，只读取命中的数据块
+        
+        Args:
+            table_id: 数据表ID
+            column: 已建立索引的列
+            user_id: 用户ID
+            values: 等值查找的值，指定时忽略low和high
+            low: 范围下界（含）
+            high: 范围上界（含）
+            columns: 返回的列，为空时返回全部列
+            limit: 最多返回的行数
+            
+        Returns:
+            查找结果
+        """
+        table = self.get_table(table_id, user_id)
+        
+        table_columns = [col.name for col in table.columns]
+        columns = columns or table_columns
+        unknown = [col for col in columns if col not in table_columns]
+        if unknown:
+            raise ValueError(f"数据表不存在列: {', '.join(unknown)}")
+        
+        data = TableIndexer(self.storage_engine).lookup(
+            table, self.get_blocks(table.id), column, values, low, high, columns, limit
+        )
+        return {
+            "table_id": table_id,
+            "columns": columns,
+            "rows": [
+                [to_json_value(value) for value in row]
+                for row in data.itertuples(index=False, name=None)
+            ],
+        }
+    
+    def sample_table(self, table_id: int, user_id: int,
+                     n: Optional[int] = None,
+                     fraction: Optional[float] = None,
+                     seed: int = 0,
+                     stratify_by: Optional[str] = None,
+                     columns: Optional[List[str]] = None) -> Dict[str, Any]:
+        """抽取数据表的随机样本
+        
+        一次扫描所有数据块完成抽样，相同种子在相同数据上得到相同的样本。
+        结果按数据块校验和缓存，数据变化后缓存自动失效。
+        
+        Args:
+            table_id: 数据表ID
+            user_id: 用户ID
+            n: 样本行数，分层抽样时为每层的行数
+            fraction: 抽样比例，与n二选一
+            seed: 随机种子
+            stratify_by: 分层列
+            columns: 返回的列，为空时返回全部列
+            
+        Returns:
+            样本数据
+        """
+        table = self.get_table(table_id, user_id)
+        columns = columns or [col.name for col in table.columns]
+        blocks = self.get_blocks(table.id)
+        
+        cache_key = self.cache.build_key(
+            "table_sample", table_id, [block.checksum for block in blocks],
+            columns, n, fraction, seed, stratify_by
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        data = TableSampler(self.storage_engine).sample(
+            table, blocks, n, fraction, seed, stratify_by, columns
+        )
+        sample_data = {
+            "table_id": table_id,
+            "columns": columns,
+            "rows": [
+                [to_json_value(value) for value in row]
+                for row in data.itertuples(index=False, name=None)
+            ],
+            "total_rows": table.row_count,
+            "sample_size": len(data)
+        }
+        self.cache.set(cache_key, sample_data, TTL_CONFIG["data_sample"])
         
-        return export_path 
\ No newline at end of file
+        return sample_data
@@ -0,0 +1,146 @@
+"""
+数据服务后台任务模块
+
+使用Celery在独立的工作进程中执行耗时的数据处理任务，避免占用Web工作进程。
+"""
+
+import os
+import logging
+from typing import Dict, Any
+
+from celery import Celery
+from celery.exceptions import Ignore
+
+from .config import CELERY_BROKER_URL, CELERY_RESULT_BACKEND, IMPORT_JOB_CONFIG
+from .import_service import DataTableImportService, ImportCancelledError
+from ..database import get_db
+from ...common.cache.redis_client import get_redis_connection
+from ...common.cache.config import CACHE_KEY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+celery_app = Celery("ecohub_data", broker=CELERY_BROKER_URL, backend=CELERY_RESULT_BACKEND)
+celery_app.conf.update(
+    task_track_started=True,
+    # 导入任务耗时较长，每个工作进程只预取一个任务
+    worker_prefetch_multiplier=1,
+    task_acks_late=True,
+    result_expires=IMPORT_JOB_CONFIG["ttl"],
+)
+
+
+def job_key(job_id: str, field: str) -> str:
+    """
+    构建后台任务附加信息的Redis键
+
+    Args:
+        job_id (str): 任务ID
+        field (str): 信息字段名
+
+    Returns:
+        str: Redis键
+    """
+    return f"{CACHE_KEY_PREFIX}:import_job:{job_id}:{field}"
+
+
+def is_job_cancelled(job_id: str) -> bool:
+    """
+    检查任务是否已被请求取消
+
+    Args:
+        job_id (str): 任务ID
+
+    Returns:
+        bool: 已请求取消返回True
+    """
+    return bool(get_redis_connection().exists(job_key(job_id, "cancel")))
+
+
+@celery_app.task(bind=True, name="data.import_table")
+def import_table_task(
+    self,
+    file_format: str,
+    file_path: str,
+    dataset_id: int,
+    table_name: str,
+    user_id: int,
+    options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    在后台导入数据表
+
+    Args:
+        file_format (str): 文件格式(csv/excel/json)
+        file_path (str): 已上传文件的路径
+        dataset_id (int): 数据集ID
+        table_name (str): 表名
+        user_id (int): 用户ID
+        options (Dict[str, Any]): 传给导入方法的其他参数
+
+    Returns:
+        Dict[str, Any]: 导入结果
+    """
+    job_id = self.request.id
+    total_bytes = os.path.getsize(file_path)
+
+    def report_progress(rows: int, bytes_processed: int) -> None:
+        if is_job_cancelled(job_id):
+            raise ImportCancelledError("导入任务已取消")
+        self.update_state(state="PROGRESS", meta={
+            "rows": rows,
+            "bytes": bytes_processed,
+            "total_bytes": total_bytes,
+        })
+
+    db_session = get_db()
+    db = next(db_session)
+    try:
+        import_service = DataTableImportService(db, progress_callback=report_progress)
+        importers = {
+            "csv": import_service.import_from_csv,
+            "excel": import_service.import_from_excel,
+            "json": import_service.import_from_json,
+        }
+        table = importers[file_format](file_path, dataset_id, table_name, user_id, **options)
+        return {
+            "table_id": table.id,
+            "rows": table.row_count,
+            "bytes": total_bytes,
+            "total_bytes": total_bytes,
+        }
+    except ImportCancelledError:
+        logger.info(f"导入任务已取消: {job_id}")
+        self.update_state(state="REVOKED", meta={"error": "导入任务已取消"})
+        raise Ignore()
+    finally:
+        db_session.close()
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+@celery_app.task(name="data.run_pipeline")
+def run_pipeline_task(run_id: int) -> Dict[str, Any]:
+    """
+    执行调度器提交的管道任务
+
+    Args:
+        run_id (int): 执行记录ID
+
+    Returns:
+        Dict[str, Any]: 执行结束后的状态
+    """
+    # 调度模块依赖本模块提交任务，在函数内导入避免循环导入
+    from .scheduler import PipelineScheduler
+
+    db_session = get_db()
+    db = next(db_session)
+    try:
+        run = PipelineScheduler(db).execute(run_id)
+        return {
+            "run_id": run.id,
+            "status": run.status,
+            "result_table_id": run.result_table_id,
+            "duration_seconds": run.duration_seconds,
+        }
+    finally:
+        db_session.close()
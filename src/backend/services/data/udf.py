@@ -0,0 +1,261 @@
+"""
+用户自定义函数注册模块
+
+管道步骤通过 custom 验证规则或 custom 转换按名称引用这里注册的函数，如
+{"rule_type": "custom", "rule_params": {"func": "email"}}，其余参数原样传给函数。
+注册的函数默认对整列（pd.Series）向量化执行：验证函数返回同样长度的布尔Series，
+转换函数返回转换后的Series。只能逐值处理的函数须注册为 row_wise，执行时对每个值
+调用一次Python函数，步骤概况中会带有性能警告。
+
+正则表达式按 (模式, 标志) 缓存编译结果，在多次执行和多个数据块之间复用。
+"""
+
+import re
+import threading
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from .config import PIPELINE_CONFIG
+
+# 函数类型
+VALIDATOR = "validator"
+TRANSFORM = "transform"
+
+ROW_WISE_WARNING = "逐值调用Python函数，数据量大时明显慢于向量化函数，建议注册为向量化函数"
+
+
+@lru_cache(maxsize=PIPELINE_CONFIG["pattern_cache_size"])
+def compile_pattern(pattern: str, flags: int = 0) -> Pattern:
+    """
+    编译正则表达式，结果按 (模式, 标志) 缓存
+
+    Args:
+        pattern (str): 正则表达式
+        flags (int): re模块的标志
+
+    Returns:
+        Pattern: 编译后的正则表达式
+    """
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise ValueError(f"无效的正则表达式 {pattern}: {e}")
+
+
+class UserFunction:
+    """注册的验证或转换函数"""
+
+    def __init__(self, name: str, kind: str, func: Callable[..., Any],
+                 row_wise: bool = False, description: Optional[str] = None) -> None:
+        self.name = name
+        self.kind = kind
+        self.func = func
+        self.row_wise = row_wise
+        self.description = description or (func.__doc__ or "").strip()
+
+    def __call__(self, data: pd.Series, **params: Any) -> Any:
+        """对一列执行函数，逐值函数对每个值调用一次"""
+        if self.row_wise:
+            return data.apply(self.func, **params)
+        return self.func(data, **params)
+
+    @property
+    def warning(self) -> Optional[str]:
+        """执行方式的性能警告"""
+        return ROW_WISE_WARNING if self.row_wise else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "vectorized": not self.row_wise,
+            "description": self.description,
+        }
+
+
+class UdfRegistry:
+    """按名称登记验证函数和转换函数"""
+
+    def __init__(self) -> None:
+        self._functions: Dict[Tuple[str, str], UserFunction] = {}
+        self._lock = threading.Lock()
+
+    def register(self, kind: str, name: str, func: Callable[..., Any],
+                 row_wise: bool = False, description: Optional[str] = None) -> UserFunction:
+        """
+        注册函数
+
+        Args:
+            kind (str): validator或transform
+            name (str): 管道中引用的名称
+            func (Callable[..., Any]): 向量化函数接收整列和参数；逐值函数接收单个值和参数
+            row_wise (bool): 是否为逐值函数
+            description (Optional[str]): 说明，默认取函数的文档字符串
+
+        Returns:
+            UserFunction: 注册的函数
+        """
+        if kind not in (VALIDATOR, TRANSFORM):
+            raise ValueError(f"不支持的函数类型: {kind}")
+        function = UserFunction(name, kind, func, row_wise, description)
+        with self._lock:
+            if (kind, name) in self._functions:
+                raise ValueError(f"函数 {name} 已注册")
+            self._functions[(kind, name)] = function
+        return function
+
+    def validator(self, name: str, row_wise: bool = False,
+                  description: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """注册验证函数的装饰器，返回原函数以便按模块路径序列化"""
+        def decorator(func: Callable) -> Callable:
+            self.register(VALIDATOR, name, func, row_wise, description)
+            return func
+        return decorator
+
+    def transform(self, name: str, row_wise: bool = False,
+                  description: Optional[str] = None) -> Callable[[Callable], Callable]:
+        """注册转换函数的装饰器，返回原函数以便按模块路径序列化"""
+        def decorator(func: Callable) -> Callable:
+            self.register(TRANSFORM, name, func, row_wise, description)
+            return func
+        return decorator
+
+    def get(self, kind: str, name: str) -> UserFunction:
+        """按名称获取函数，未注册时抛出ValueError"""
+        function = self._functions.get((kind, name))
+        if function is None:
+            label = "验证" if kind == VALIDATOR else "转换"
+            raise ValueError(f"未注册的{label}函数: {name}")
+        return function
+
+    def resolve(self, kind: str, func: Union[str, Callable[..., Any]]) -> UserFunction:
+        """
+        解析管道步骤中的函数引用
+
+        Args:
+            kind (str): validator或transform
+            func (Union[str, Callable[..., Any]]): 注册的名称，或直接传入的逐值函数
+
+        Returns:
+            UserFunction: 注册的函数；直接传入的函数按逐值函数处理
+        """
+        if isinstance(func, str):
+            return self.get(kind, func)
+        if callable(func):
+            return UserFunction(getattr(func, "__name__", repr(func)), kind, func, row_wise=True)
+        raise ValueError("自定义步骤须通过func参数指定注册的函数名")
+
+    def list(self, kind: Optional[str] = None) -> List[Dict[str, Any]]:
+        """已注册的函数，按类型和名称排序"""
+        return [
+            function.to_dict()
+            for (function_kind, _), function in sorted(self._functions.items())
+            if kind is None or function_kind == kind
+        ]
+
+
+registry = UdfRegistry()
+
+
+def _strings(data: pd.Series) -> pd.Series:
+    return data.astype("string")
+
+
+# 内置验证函数：空值视为通过，由not_null规则检查
+
+@registry.validator("email")
+def validate_email(data: pd.Series) -> pd.Series:
+    """电子邮件地址格式"""
+    pattern = compile_pattern(r"[^@\s]+@[^@\s]+\.[^@\s]+")
+    return _strings(data).str.fullmatch(pattern).fillna(True).astype(bool)
+
+
+@registry.validator("mobile")
+def validate_mobile(data: pd.Series) -> pd.Series:
+    """中国大陆手机号码"""
+    pattern = compile_pattern(r"1[3-9]\d{9}")
+    return _strings(data).str.fullmatch(pattern).fillna(True).astype(bool)
+
+
+@registry.validator("not_blank")
+def validate_not_blank(data: pd.Series) -> pd.Series:
+    """字符串不为空白"""
+    return (_strings(data).str.strip().str.len() > 0).fillna(True).astype(bool)
+
+
+@registry.validator("numeric")
+def validate_numeric(data: pd.Series) -> pd.Series:
+    """可以解析为数值"""
+    return pd.to_numeric(data, errors="coerce").notna() | data.isna()
+
+
+@registry.validator("date")
+def validate_date(data: pd.Series, date_format: Optional[str] = None) -> pd.Series:
+    """可以解析为日期时间，可指定格式"""
+    return pd.to_datetime(data, errors="coerce", format=date_format).notna() | data.isna()
+
+
+@registry.validator("in_set")
+def validate_in_set(data: pd.Series, values: List[Any]) -> pd.Series:
+    """取值在给定集合中"""
+    return data.isin(values) | data.isna()
+
+
+@registry.validator("non_negative")
+def validate_non_negative(data: pd.Series) -> pd.Series:
+    """数值不小于0"""
+    return (pd.to_numeric(data, errors="coerce") >= 0) | data.isna()
+
+
+# 内置转换函数
+
+@registry.transform("strip")
+def transform_strip(data: pd.Series) -> pd.Series:
+    """去除字符串两端空白"""
+    return _strings(data).str.strip()
+
+
+@registry.transform("lower")
+def transform_lower(data: pd.Series) -> pd.Series:
+    """字符串转为小写"""
+    return _strings(data).str.lower()
+
+
+@registry.transform("upper")
+def transform_upper(data: pd.Series) -> pd.Series:
+    """字符串转为大写"""
+    return _strings(data).str.upper()
+
+
+@registry.transform("replace")
+def transform_replace(data: pd.Series, pattern: str, repl: str = "") -> pd.Series:
+    """按正则表达式替换"""
+    return _strings(data).str.replace(compile_pattern(pattern), repl, regex=True)
+
+
+@registry.transform("round")
+def transform_round(data: pd.Series, decimals: int = 0) -> pd.Series:
+    """数值四舍五入"""
+    return pd.to_numeric(data, errors="coerce").round(decimals)
+
+
+@registry.transform("clip")
+def transform_clip(data: pd.Series, lower: Optional[float] = None,
+                   upper: Optional[float] = None) -> pd.Series:
+    """数值截断到给定范围"""
+    return pd.to_numeric(data, errors="coerce").clip(lower, upper)
+
+
+@registry.transform("log1p")
+def transform_log1p(data: pd.Series) -> pd.Series:
+    """log(1 + x)"""
+    return np.log1p(pd.to_numeric(data, errors="coerce"))
+
+
+@registry.transform("fill_null")
+def transform_fill_null(data: pd.Series, value: Any) -> pd.Series:
+    """用给定值填充空值"""
+    return data.fillna(value)
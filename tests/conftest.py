@@ -0,0 +1,191 @@
+"""
+测试公共配置
+
+后端代码位于 src/backend，以 backend 包的形式导入。
+"""
+
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+class _Column:
+    """模型类上的列代理，比较运算生成 FakeSession 查询使用的条件
+
+    不是数据描述符，实例上的同名字段值不受影响。
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _condition(self, test):
+        return lambda obj: test(getattr(obj, self.name))
+
+    def __eq__(self, other):
+        return self._condition(lambda value: value == other)
+
+    def __ne__(self, other):
+        return self._condition(lambda value: value != other)
+
+    def __ge__(self, other):
+        return self._condition(lambda value: value >= other)
+
+    def __le__(self, other):
+        return self._condition(lambda value: value <= other)
+
+    def __gt__(self, other):
+        return self._condition(lambda value: value > other)
+
+    def __lt__(self, other):
+        return self._condition(lambda value: value < other)
+
+    def in_(self, values):
+        return self._condition(lambda value: value in values)
+
+    __hash__ = object.__hash__
+
+
+class _Query:
+    def __init__(self, session, model, conditions=(), order=None):
+        self.session = session
+        self.model = model
+        self.conditions = list(conditions)
+        self.order = order
+
+    def filter(self, *conditions):
+        return _Query(self.session, self.model, self.conditions + list(conditions), self.order)
+
+    def order_by(self, column):
+        return _Query(self.session, self.model, self.conditions, column.name)
+
+    def all(self):
+        rows = [obj for obj in self.session.objects
+                if isinstance(obj, self.model) and all(test(obj) for test in self.conditions)]
+        if self.order is not None:
+            rows.sort(key=lambda obj: getattr(obj, self.order))
+        return rows
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def first(self):
+        rows = self.all()
+        return rows[0] if rows else None
+
+    def count(self):
+        return len(self.all())
+
+    def delete(self):
+        rows = self.all()
+        for obj in rows:
+            self.session.delete(obj)
+        return len(rows)
+
+
+class FakeSession:
+    """内存中的数据库会话，支持服务层用到的增删和按列过滤排序的查询"""
+
+    def __init__(self):
+        self.objects = []
+        self._ids = itertools.count(1)
+        self._added = []
+        self._deleted = []
+
+    def add(self, obj):
+        if not self._contains(obj):
+            self.objects.append(obj)
+            self._added.append(obj)
+
+    def flush(self):
+        for obj in self.objects:
+            if getattr(obj, "id", None) is None:
+                obj.id = next(self._ids)
+
+    def delete(self, obj):
+        if self._contains(obj):
+            self._remove(obj)
+            self._deleted.append(obj)
+
+    def commit(self):
+        self.flush()
+        self._added, self._deleted = [], []
+
+    def rollback(self):
+        for obj in self._added:
+            if self._contains(obj):
+                self._remove(obj)
+        self.objects.extend(self._deleted)
+        self._added, self._deleted = [], []
+
+    def refresh(self, obj):
+        pass
+
+    def query(self, model):
+        return _Query(self, model)
+
+    def _contains(self, obj):
+        # 模型按字段值比较相等，会话中的对象按身份区分
+        return any(item is obj for item in self.objects)
+
+    def _remove(self, obj):
+        self.objects = [item for item in self.objects if item is not obj]
+
+
+# FakeSession 查询中用到的模型列
+QUERY_COLUMNS = {
+    "DataTable": ("id", "dataset_id"),
+    "DataBlock": ("table_id", "block_index", "end_row", "file_path"),
+    "DataPipeline": ("id",),
+}
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    """内存数据库会话，权限检查一律通过"""
+    from backend.services.data.models import DataTable
+    from backend.services.data.permission import DatasetPermissionService
+    from backend.services.data.storage import DataBlock, DataPipeline
+
+    for model in (DataTable, DataBlock, DataPipeline):
+        for name in QUERY_COLUMNS[model.__name__]:
+            monkeypatch.setattr(model, name, _Column(name), raising=False)
+    monkeypatch.setattr(DatasetPermissionService, "has_permission", lambda *args: True)
+    return FakeSession()
+
+
+@pytest.fixture
+def storage_engine(tmp_path, monkeypatch):
+    """临时目录中的文件存储引擎，索引文件也写在临时目录中"""
+    from backend.services.data.config import INDEX_CONFIG
+    from backend.services.data.storage import StorageConfig, StorageType
+    from backend.services.data.storage_engine import FileStorageEngine
+
+    monkeypatch.setitem(INDEX_CONFIG, "dir", str(tmp_path / "indexes"))
+    return FileStorageEngine(StorageConfig(type=StorageType.FILE, path=str(tmp_path / "blocks")))
+
+
+@pytest.fixture
+def make_table(fake_db, storage_engine):
+    """按给定的数据块创建数据表，返回 (数据表, 按块索引排序的数据块)"""
+    from backend.services.data.import_service import DataTableImportService
+    from backend.services.data.models import ColumnMetadata
+    from backend.services.data.storage import DataBlock
+
+    def make(chunks, primary_key=(), name="t"):
+        service = DataTableImportService(fake_db, storage_engine)
+        table = service.import_from_chunks(iter(chunks), 1, name, 1)
+        if primary_key:
+            table.columns = [
+                ColumnMetadata(**{**col.dict(), "is_primary_key": col.name in primary_key})
+                for col in table.columns
+            ]
+        blocks = fake_db.query(DataBlock).filter(
+            DataBlock.table_id == table.id
+        ).order_by(DataBlock.block_index).all()
+        return table, blocks
+
+    return make
@@ -0,0 +1,83 @@
+"""
+过滤表达式测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.data.filters import FilterSyntaxError, compile_filter
+from backend.services.data.profiling import TableProfiler
+
+DATA = pd.DataFrame({
+    "gdp": [500.0, 1500.0, 2500.0, np.nan, 4000.0],
+    "region": ["华东", "华北", "西南", "华东", None],
+    "name": ["测试A", "城市B", "城市C", "测试D", "城市E"],
+})
+
+
+@pytest.mark.parametrize("expression, expected", [
+    ("gdp > 1000", DATA["gdp"] > 1000),
+    ("gdp >= 1500 AND gdp <= 2500", DATA["gdp"].between(1500, 2500)),
+    ("gdp BETWEEN 1500 AND 2500", DATA["gdp"].between(1500, 2500)),
+    ("region IN ('华东', '华北')", DATA["region"].isin(["华东", "华北"])),
+    ("gdp IS NULL", DATA["gdp"].isna()),
+    ("name LIKE '测试%'", DATA["name"].str.startswith("测试")),
+    ("NOT name LIKE '测试%'", ~DATA["name"].str.startswith("测试")),
+    ("gdp < 1000 OR region = '西南'", (DATA["gdp"] < 1000) | (DATA["region"] == "西南")),
+])
+def test_mask_matches_pandas(expression, expected):
+    assert compile_filter(expression).mask(DATA).tolist() == expected.fillna(False).tolist()
+
+
+def test_null_never_matches_negated_comparison():
+    # 空值在除IS NULL以外的条件下都不匹配，NOT下推后同样如此
+    mask = compile_filter("NOT gdp > 1000").mask(DATA)
+    assert mask.tolist() == [True, False, False, False, False]
+
+
+def test_dict_spec_equals_text():
+    by_dict = compile_filter({"gdp": {"gt": 1000, "le": 2500}, "region": ["华北", "西南"]})
+    by_text = compile_filter("gdp > 1000 AND gdp <= 2500 AND region IN ('华北', '西南')")
+    assert by_dict.mask(DATA).tolist() == by_text.mask(DATA).tolist()
+
+
+def test_empty_spec():
+    assert compile_filter(None) is None
+    assert compile_filter("  ") is None
+    assert compile_filter({}) is None
+
+
+@pytest.mark.parametrize("expression", ["gdp >", "gdp > 1 AND", "(gdp > 1", "gdp ~ 1"])
+def test_syntax_errors(expression):
+    with pytest.raises(FilterSyntaxError):
+        compile_filter(expression)
+
+
+def test_validate_unknown_columns():
+    with pytest.raises(ValueError):
+        compile_filter("missing = 1").validate(list(DATA.columns))
+
+
+def test_may_match_uses_block_statistics():
+    statistics = TableProfiler.profile(DATA).to_statistics()
+    assert compile_filter("gdp > 3000").may_match(statistics)
+    assert not compile_filter("gdp > 5000").may_match(statistics)
+    assert not compile_filter("gdp BETWEEN 0 AND 100").may_match(statistics)
+    assert compile_filter("gdp IS NULL").may_match(statistics)
+
+
+def test_may_match_keeps_blocks_with_infinite_values():
+    statistics = TableProfiler.profile(pd.DataFrame({"a": [1.0, np.inf]})).to_statistics()
+    assert compile_filter("a > 1e300").may_match(statistics)
+
+
+def test_pruned_blocks_never_lose_matching_rows():
+    rng = np.random.default_rng(1)
+    chunks = [pd.DataFrame({"x": rng.normal(loc=i, size=100)}) for i in range(10)]
+    statistics = [TableProfiler.profile(chunk).to_statistics() for chunk in chunks]
+    for expression in ("x > 8", "x < 0.5", "x BETWEEN 3 AND 3.2", "NOT x <= 9"):
+        expr = compile_filter(expression)
+        for chunk, stats in zip(chunks, statistics):
+            if expr.mask(chunk).any():
+                assert expr.may_match(stats), expression
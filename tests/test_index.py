@@ -0,0 +1,146 @@
+"""
+二级索引测试
+
+索引查找的结果与直接扫描全表过滤得到的行一致。
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.data.index import TableIndexer
+from backend.services.data.mutation import TableMutator
+from backend.services.data.storage import DataBlock
+
+
+def _data(start, stop, seed=11):
+    rng = np.random.default_rng(seed + start)
+    rows = stop - start
+    score = rng.integers(0, 40, rows).astype(float)
+    score[rng.random(rows) < 0.1] = np.nan
+    return pd.DataFrame({
+        "id": np.arange(start, stop),
+        "group": rng.integers(0, 25, rows),
+        "score": score,
+        "city": rng.choice(["北京", "上海", "成都"], rows),
+    })
+
+
+def _chunks(data, size):
+    return [data.iloc[start:start + size].reset_index(drop=True)
+            for start in range(0, len(data), size)]
+
+
+def _blocks(db, table):
+    return db.query(DataBlock).filter(DataBlock.table_id == table.id) \
+        .order_by(DataBlock.block_index).all()
+
+
+def _read(storage_engine, blocks):
+    return pd.concat([storage_engine.load_block(block) for block in blocks], ignore_index=True)
+
+
+def _assert_lookup_matches_scan(storage_engine, table, blocks, column, values=None,
+                                low=None, high=None):
+    data = _read(storage_engine, blocks)
+    if values is not None:
+        expected = data[data[column].isin(values)]
+    else:
+        mask = data[column].notna()
+        if low is not None:
+            mask &= data[column] >= low
+        if high is not None:
+            mask &= data[column] <= high
+        expected = data[mask]
+    found = TableIndexer(storage_engine).lookup(table, blocks, column, values, low, high)
+    pd.testing.assert_frame_equal(found, expected.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.mark.parametrize("kind", ["hash", "sorted"])
+@pytest.mark.parametrize("column, values", [
+    ("group", [3, 7, 24]),
+    ("score", [0.0, 15.0, 99.0]),
+    ("city", ["成都"]),
+    ("id", []),
+])
+def test_equal_lookup_matches_scan(make_table, storage_engine, kind, column, values):
+    table, blocks = make_table(_chunks(_data(0, 300), 70))
+    TableIndexer(storage_engine).create(table, blocks, column, kind)
+    _assert_lookup_matches_scan(storage_engine, table, blocks, column, values)
+
+
+@pytest.mark.parametrize("low, high", [(5, 12), (None, 3), (30, None), (20, 20), (50, 60)])
+def test_range_lookup_matches_scan(make_table, storage_engine, low, high):
+    table, blocks = make_table(_chunks(_data(0, 300), 70))
+    TableIndexer(storage_engine).create(table, blocks, "score", "sorted")
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "score", low=low, high=high)
+
+
+def test_hash_index_rejects_range_lookup(make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(0, 50), 50))
+    TableIndexer(storage_engine).create(table, blocks, "group", "hash")
+    with pytest.raises(ValueError):
+        TableIndexer(storage_engine).lookup(table, blocks, "group", low=1, high=2)
+
+
+def test_lookup_coerces_values_and_limits_rows(make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(0, 300), 70))
+    indexer = TableIndexer(storage_engine)
+    indexer.create(table, blocks, "group", "hash")
+
+    data = _read(storage_engine, blocks)
+    expected = data.loc[data["group"] == 4, ["id"]].head(3).reset_index(drop=True)
+    found = indexer.lookup(table, blocks, "group", ["4"], columns=["id"], limit=3)
+    pd.testing.assert_frame_equal(found, expected)
+
+
+def test_string_index_over_mixed_block_types(make_table, storage_engine):
+    # 第一块的code推断为整数，第二块为字符串，整列按字符串索引
+    table, blocks = make_table([
+        pd.DataFrame({"code": [1, 2, 3]}),
+        pd.DataFrame({"code": ["2", "x", None]}),
+    ])
+    TableIndexer(storage_engine).create(table, blocks, "code", "hash")
+    found = TableIndexer(storage_engine).lookup(table, blocks, "code", ["2"])
+    assert found["code"].astype(str).tolist() == ["2", "2"]
+
+
+def test_index_after_append(fake_db, make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(0, 200), 70))
+    TableIndexer(storage_engine).create(table, blocks, "group", "hash")
+    TableIndexer(storage_engine).create(table, blocks, "score", "sorted")
+
+    TableMutator(fake_db, storage_engine, block_rows=70).append(table, blocks, [_data(200, 350)])
+    blocks = _blocks(fake_db, table)
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "group", [0, 5, 9])
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "score", low=10, high=25)
+
+
+def test_index_after_upsert(fake_db, make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(0, 200), 70), primary_key=("id",))
+    TableIndexer(storage_engine).create(table, blocks, "group", "hash")
+    TableIndexer(storage_engine).create(table, blocks, "score", "sorted")
+
+    # 更新已有行的索引列，并插入新行
+    changes = pd.DataFrame({"id": [5, 80, 150, 400, 401], "group": [99, 99, 99, 99, 3],
+                            "score": [100.0, np.nan, 7.0, 100.0, 7.0]})
+    TableMutator(fake_db, storage_engine, block_rows=70).upsert(table, blocks, changes)
+    blocks = _blocks(fake_db, table)
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "group", [99, 3])
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "score", low=7, high=7)
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "score", low=90)
+
+
+def test_index_after_rebuild(fake_db, make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(0, 280), 70))
+    TableIndexer(storage_engine).create(table, blocks, "group", "hash")
+    TableIndexer(storage_engine).create(table, blocks, "score", "sorted")
+
+    # 块2移到最前，块0保留在新数据之后，块1、3被删除
+    layout = [blocks[2], _data(1000, 1040), blocks[0]]
+    TableMutator(fake_db, storage_engine).rebuild(table, blocks, layout)
+    blocks = _blocks(fake_db, table)
+    assert len(blocks) == 3
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "group", list(range(25)))
+    _assert_lookup_matches_scan(storage_engine, table, blocks, "score", low=None, high=None)
+    assert table.metadata["indexes"]["group"]["entries"] == 180
@@ -0,0 +1,182 @@
+"""
+数据表增量写入测试
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.data.import_service import DataTableImportService
+from backend.services.data.index import TableIndexer
+from backend.services.data.mutation import TableMutator
+from backend.services.data.profiling import TableProfiler
+from backend.services.data.storage import DataBlock
+
+
+def _data(start, stop, seed=5):
+    rng = np.random.default_rng(seed + start)
+    ids = np.arange(start, stop)
+    value = rng.normal(100, 20, len(ids))
+    value[::17] = np.nan
+    return pd.DataFrame({"id": ids, "value": value, "label": [f"r{i}" for i in ids]})
+
+
+def _chunks(data, size):
+    return [data.iloc[start:start + size].reset_index(drop=True)
+            for start in range(0, len(data), size)]
+
+
+def _blocks(db, table):
+    return db.query(DataBlock).filter(DataBlock.table_id == table.id) \
+        .order_by(DataBlock.block_index).all()
+
+
+def _read(storage_engine, blocks):
+    return pd.concat([storage_engine.load_block(block) for block in blocks], ignore_index=True)
+
+
+def _assert_statistics(table, data):
+    """表的列统计（由块统计合并得出）与整表数据直接剖析的结果一致"""
+    expected = TableProfiler.profile(data).to_statistics()
+    for col in table.columns:
+        stats, want = col.statistics, expected[col.name]
+        for key in ("kind", "count", "null_count", "min", "max"):
+            assert stats.get(key) == want.get(key), (col.name, key)
+        for key in ("mean", "variance"):
+            if want.get(key) is not None:
+                assert stats[key] == pytest.approx(want[key]), (col.name, key)
+
+
+def _assert_contiguous(blocks):
+    start = 0
+    for index, block in enumerate(blocks):
+        assert (block.block_index, block.start_row) == (index, start)
+        assert block.end_row == start + block.row_count - 1
+        start += block.row_count
+
+
+def test_append_writes_new_blocks_only(fake_db, storage_engine, make_table):
+    data = _data(0, 200)
+    table, blocks = make_table(_chunks(data, 100))
+    before = [(block.id, block.file_path, block.checksum) for block in blocks]
+
+    extra = _data(200, 350)
+    TableMutator(fake_db, storage_engine, block_rows=100).append(
+        table, blocks, [extra.iloc[:60], extra.iloc[60:]]
+    )
+
+    current = _blocks(fake_db, table)
+    expected = pd.concat([data, extra], ignore_index=True)
+    assert table.row_count == len(expected)
+    assert [(block.id, block.file_path, block.checksum) for block in current[:2]] == before
+    assert [block.row_count for block in current[2:]] == [60, 90]
+    _assert_contiguous(current)
+    pd.testing.assert_frame_equal(_read(storage_engine, current), expected)
+    _assert_statistics(table, expected)
+
+
+def test_append_fills_missing_columns(fake_db, storage_engine, make_table):
+    table, blocks = make_table(_chunks(_data(0, 50), 50))
+    TableMutator(fake_db, storage_engine).append(table, blocks, [pd.DataFrame({"id": [50, 51]})])
+
+    appended = storage_engine.load_block(_blocks(fake_db, table)[-1])
+    assert list(appended.columns) == ["id", "value", "label"]
+    assert appended["value"].isna().all()
+    assert table.columns[1].statistics["null_count"] == _data(0, 50)["value"].isna().sum() + 2
+
+
+def test_upsert_rewrites_only_matching_blocks(fake_db, storage_engine, make_table):
+    data = _data(0, 200)
+    table, blocks = make_table(_chunks(data, 50), primary_key=("id",))
+    original = {block.block_index: block for block in blocks}
+
+    changes = pd.DataFrame({"id": [10, 60, 61, 250, 255], "value": [1.0, 2.0, 3.0, 4.0, 5.0]})
+    result = TableMutator(fake_db, storage_engine, block_rows=50).upsert(table, blocks, changes)
+
+    assert result == {"table_id": table.id, "updated": 3, "inserted": 2,
+                      "blocks_rewritten": 2, "row_count": 202}
+    current = _blocks(fake_db, table)
+    _assert_contiguous(current)
+    # 块0、1被重写为新的数据块，块2、3保持不动
+    assert [block.id == original[block.block_index].id for block in current[:4]] == \
+        [False, False, True, True]
+
+    expected = data.set_index("id")
+    expected.loc[[10, 60, 61], "value"] = [1.0, 2.0, 3.0]
+    expected = expected.reset_index()
+    inserted = pd.DataFrame({"id": [250, 255], "value": [4.0, 5.0], "label": [np.nan, np.nan]})
+    expected = pd.concat([expected, inserted], ignore_index=True)
+    pd.testing.assert_frame_equal(_read(storage_engine, current), expected)
+    _assert_statistics(table, expected)
+    assert table.columns[1].statistics["min"] == 1.0
+
+
+def test_upsert_with_duplicate_keys_keeps_last(fake_db, storage_engine, make_table):
+    table, blocks = make_table(_chunks(_data(0, 20), 20), primary_key=("id",))
+    changes = pd.DataFrame({"id": [3, 3, 30, 30], "label": ["a", "b", "c", "d"]})
+    result = TableMutator(fake_db, storage_engine).upsert(table, blocks, changes)
+
+    data = _read(storage_engine, _blocks(fake_db, table)).set_index("id")
+    assert (result["updated"], result["inserted"]) == (1, 1)
+    assert data.loc[3, "label"] == "b" and data.loc[30, "label"] == "d"
+
+
+def test_upsert_skips_blocks_outside_key_range(fake_db, storage_engine, make_table, monkeypatch):
+    table, blocks = make_table(_chunks(_data(0, 200), 50), primary_key=("id",))
+    loaded = []
+    load_block = storage_engine.load_block
+
+    def record(block, columns=None):
+        loaded.append(block.block_index)
+        return load_block(block, columns)
+
+    monkeypatch.setattr(storage_engine, "load_block", record)
+    result = TableMutator(fake_db, storage_engine).upsert(
+        table, blocks, pd.DataFrame({"id": [120, 130], "value": [0.0, 0.0]})
+    )
+
+    # 按块统计只有块2可能包含这些主键
+    assert set(loaded) == {2}
+    assert result["blocks_rewritten"] == 1
+
+
+def test_upsert_updates_indexes(fake_db, storage_engine, make_table):
+    table, blocks = make_table(_chunks(_data(0, 100), 50), primary_key=("id",))
+    TableIndexer(storage_engine).create(table, blocks, "id", "hash")
+
+    TableMutator(fake_db, storage_engine).upsert(
+        table, blocks, pd.DataFrame({"id": [7, 500], "value": [-1.0, -2.0]})
+    )
+    rows = TableIndexer(storage_engine).lookup(table, _blocks(fake_db, table), "id", [7, 500])
+    assert list(zip(rows["id"], rows["value"])) == [(7, -1.0), (500, -2.0)]
+
+
+def test_upsert_requires_primary_key(fake_db, storage_engine, make_table):
+    table, blocks = make_table(_chunks(_data(0, 10), 10))
+    with pytest.raises(ValueError):
+        TableMutator(fake_db, storage_engine).upsert(table, blocks, pd.DataFrame({"id": [1]}))
+
+
+def test_upsert_keeps_block_files_shared_with_other_tables(fake_db, storage_engine, make_table):
+    data = _data(0, 100)
+    table, blocks = make_table(_chunks(data, 50), primary_key=("id",))
+    copy = DataTableImportService(fake_db, storage_engine).copy_table(table, 1, "copy", 1)
+    replaced = blocks[0].file_path
+
+    TableMutator(fake_db, storage_engine).upsert(
+        table, blocks, pd.DataFrame({"id": [1], "value": [0.0]})
+    )
+
+    # 复制的表仍引用原数据块文件，文件保留且内容不变
+    assert os.path.exists(replaced)
+    pd.testing.assert_frame_equal(_read(storage_engine, _blocks(fake_db, copy)), data)
+
+    # 不再被引用的文件随更新删除
+    current = _blocks(fake_db, table)
+    rewritten = current[0].file_path
+    TableMutator(fake_db, storage_engine).upsert(
+        table, current, pd.DataFrame({"id": [2], "value": [0.0]})
+    )
+    assert not os.path.exists(rewritten)
@@ -0,0 +1,90 @@
+"""
+管道结果缓存测试，未连接Redis时使用FakeRedis
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from backend.common.cache.cache_manager import CacheManager
+from backend.common.cache.config import TTL_CONFIG
+from backend.services.data import pipeline_cache
+from backend.services.data.pipeline_cache import PipelineResultCache
+from backend.services.data.storage import DataPipeline
+
+
+def _pipeline(pipeline_id, steps=None):
+    return DataPipeline(id=pipeline_id, name="test", table_id=1, steps=steps or [])
+
+
+@pytest.fixture
+def cache():
+    # 每个测试使用独立的键前缀，互不影响
+    return PipelineResultCache(CacheManager(prefix=f"test_{uuid.uuid4().hex}"), max_entries=3)
+
+
+def test_hits_and_misses(cache):
+    key = cache.key(_pipeline(1), "records", ["a"])
+    assert cache.get(key) is None
+    assert cache.set(key, {"rows": [1, 2]})
+    assert cache.get(key) == {"rows": [1, 2]}
+    assert cache.get(key) == {"rows": [1, 2]}
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+
+
+def test_key_changes_with_definition_and_input(cache):
+    pipeline = _pipeline(1, [{"type": "filter", "params": {"where": "a > 1"}}])
+    changed = _pipeline(1, [{"type": "filter", "params": {"where": "a > 2"}}])
+    key = cache.key(pipeline, "records", ["a"])
+    assert key != cache.key(changed, "records", ["a"])
+    assert key != cache.key(pipeline, "records", ["b"])
+    assert key == cache.key(_pipeline(1, pipeline.steps), "records", ["a"])
+
+
+def test_evicts_earliest_entries(cache):
+    keys = [cache.key(_pipeline(1), "records", [str(i)]) for i in range(5)]
+    for key in keys:
+        cache.set(key, {"value": key})
+    assert cache.stats()["entries"] == 3
+    assert [cache.get(key) is not None for key in keys] == [False, False, True, True, True]
+
+
+def test_oversized_result_is_not_cached(cache):
+    cache.max_bytes = 10
+    key = cache.key(_pipeline(1), "records", ["a"])
+    assert not cache.set(key, {"value": "x" * 100})
+    assert cache.get(key) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_expired_entries_leave_the_index(cache, monkeypatch):
+    now = pipeline_cache.time.time()
+    for i in range(3):
+        cache.set(cache.key(_pipeline(1), "records", [str(i)]), {"value": i})
+
+    # 前3个条目已随TTL过期，不再计入条目数，也不占用条目上限
+    later = now + TTL_CONFIG["pipeline_result"] + 1
+    monkeypatch.setattr(pipeline_cache, "time", SimpleNamespace(time=lambda: later))
+    assert cache.stats()["entries"] == 0
+    live = [cache.key(_pipeline(1), "records", [f"live{i}"]) for i in range(3)]
+    for key in live:
+        cache.set(key, {"value": key})
+    assert cache.stats()["entries"] == 3
+    assert all(cache.get(key) is not None for key in live)
+
+
+def test_invalidate_removes_only_that_pipeline(cache):
+    first = [cache.key(_pipeline(1), kind, ["a"]) for kind in ("records", "table")]
+    other = cache.key(_pipeline(2), "records", ["a"])
+    for key in first + [other]:
+        cache.set(key, {"value": key})
+
+    assert cache.invalidate(1) == 2
+    assert all(cache.get(key) is None for key in first)
+    assert cache.get(other) is not None
+    assert cache.stats()["entries"] == 1
+    assert cache.invalidate(1) == 0
@@ -0,0 +1,102 @@
+"""
+编译执行计划测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pipeline = pytest.importorskip("backend.services.data.pipeline")
+
+from backend.services.data.pipeline_plan import compile_pipeline  # noqa: E402
+from backend.services.data.storage import (  # noqa: E402
+    DataPipeline, DataTransform, DataValidationRule
+)
+
+
+def _plan(steps, pipeline_id):
+    definition = DataPipeline(id=pipeline_id, name="test", table_id=1, steps=steps)
+    return compile_pipeline(definition, pipeline.DataValidator(), pipeline.DataTransformer())
+
+
+def _validate(column, rule_type, message, **params):
+    return {"type": "validate", "params": {
+        "table_id": 1, "column_name": column, "rule_type": rule_type,
+        "rule_params": params, "error_message": message,
+    }}
+
+
+def _transform(transform_type, source, target, **params):
+    return {"type": "transform", "params": {
+        "table_id": 1, "name": target, "transform_type": transform_type,
+        "source_columns": [source], "target_columns": [target], "transform_params": params,
+    }}
+
+
+def _sequential(steps, data):
+    """按步骤顺序逐个执行，与编译前的执行方式一致"""
+    validator, transformer = pipeline.DataValidator(), pipeline.DataTransformer()
+    result = data.copy()
+    for step in steps:
+        if step["type"] == "validate":
+            rule = DataValidationRule(**step["params"])
+            func = getattr(validator, f"validate_{rule.rule_type}")
+            if not func(result[rule.column_name], **rule.rule_params).all():
+                raise ValueError(f"数据验证失败: {rule.error_message}")
+        else:
+            transform = DataTransform(**step["params"])
+            func = getattr(transformer, f"transform_{transform.transform_type}")
+            for source, target in zip(transform.source_columns, transform.target_columns):
+                result[target] = func(result[source], **transform.transform_params)
+    return result
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(7)
+    return pd.DataFrame({
+        "id": np.arange(1000),
+        "a": rng.normal(100, 15, 1000),
+        "b": rng.uniform(0, 50, 1000),
+        "code": rng.integers(0, 1000, 1000).astype(str),
+    })
+
+
+STEPS = [
+    _validate("id", "unique", "id重复"),
+    _validate("b", "range", "b超出范围", min_val=0, max_val=50),
+    _transform("scale", "a", "a_std", method="standard"),
+    _transform("scale", "b", "b_minmax", method="minmax"),
+    _transform("type", "code", "code_int", target_type="int"),
+    _validate("a_std", "not_null", "a_std为空"),
+    _transform("type", "code_int", "code_float", target_type="float"),
+    _transform("bin", "b", "b_bin", bins=4),
+]
+
+
+def test_compiled_plan_matches_sequential(data):
+    expected = _sequential(STEPS, data)
+    result = _plan(STEPS, 9101).execute(data)
+    pd.testing.assert_frame_equal(result, expected)
+    # 不修改输入
+    assert list(data.columns) == ["id", "a", "b", "code"]
+
+
+def test_compiled_plan_reports_same_failure_as_sequential(data):
+    steps = STEPS + [_validate("code_float", "range", "code超出范围", min_val=0, max_val=10)]
+    with pytest.raises(ValueError) as expected:
+        _sequential(steps, data)
+    with pytest.raises(ValueError) as actual:
+        _plan(steps, 9102).execute(data)
+    assert str(actual.value) == str(expected.value)
+
+
+def test_concurrent_failures_report_first_step(data):
+    # 相互独立的验证在同一阶段并发执行，失败时仍按步骤顺序报告第一个
+    steps = [_validate(column, "range", f"{column}失败", min_val=-1, max_val=-1)
+             for column in ("id", "a", "b")]
+    plan = _plan(steps, 9103)
+    for _ in range(20):
+        with pytest.raises(ValueError, match="数据验证失败: id失败"):
+            plan.execute(data)
+
@@ -0,0 +1,203 @@
+"""
+管道结果表增量更新测试
+
+每次增量更新后的结果表都与在当前输入表上完整执行管道得到的结果表一致。
+"""
+
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pipeline = pytest.importorskip("backend.services.data.pipeline")
+
+from backend.common.cache.cache_manager import CacheManager  # noqa: E402
+from backend.services.data.mutation import TableMutator  # noqa: E402
+from backend.services.data.pipeline_cache import PipelineResultCache  # noqa: E402
+from backend.services.data.storage import DataBlock, DataPipeline  # noqa: E402
+from backend.services.data.storage_engine import StorageEngineFactory  # noqa: E402
+
+USER_ID = 1
+
+ROW_STEPS = [
+    {"type": "filter", "params": {"where": "score > 10"}},
+    {"type": "transform", "params": {
+        "table_id": 1, "name": "code_int", "transform_type": "type",
+        "source_columns": ["code"], "target_columns": ["code_int"],
+        "transform_params": {"target_type": "int"},
+    }},
+]
+
+SCALE_STEP = {"type": "transform", "params": {
+    "table_id": 1, "name": "score_std", "transform_type": "scale",
+    "source_columns": ["score"], "target_columns": ["score_std"],
+    "transform_params": {"method": "standard"},
+}}
+
+
+def _data(start, stop):
+    rng = np.random.default_rng(start)
+    ids = np.arange(start, stop)
+    return pd.DataFrame({
+        "id": ids,
+        "score": rng.uniform(0, 100, len(ids)),
+        "code": rng.integers(0, 1000, len(ids)).astype(str),
+    })
+
+
+@pytest.fixture
+def service(fake_db, storage_engine, monkeypatch):
+    monkeypatch.setattr(StorageEngineFactory, "create_default_engine",
+                        staticmethod(lambda: storage_engine))
+    service = pipeline.PipelineService(fake_db)
+    # 每个测试使用独立的缓存键前缀
+    service.result_cache = PipelineResultCache(CacheManager(prefix=f"test_{uuid.uuid4().hex}"))
+    return service
+
+
+@pytest.fixture
+def source(make_table):
+    chunks = [_data(0, 50), _data(50, 100), _data(100, 150), _data(150, 200)]
+    # 块1的score都不超过10，过滤后结果为空
+    chunks[1]["score"] = chunks[1]["score"] / 10
+    return make_table(chunks, primary_key=("id",), name="source")
+
+
+def _create_pipeline(db, source_table, steps):
+    definition = DataPipeline(name="refresh", table_id=source_table.id, steps=steps)
+    db.add(definition)
+    db.commit()
+    return definition
+
+
+def _blocks(db, table):
+    return db.query(DataBlock).filter(DataBlock.table_id == table.id) \
+        .order_by(DataBlock.block_index).all()
+
+
+def _read(db, storage_engine, table):
+    blocks = _blocks(db, table)
+    if not blocks:
+        return pd.DataFrame()
+    return pd.concat([storage_engine.load_block(block) for block in blocks], ignore_index=True)
+
+
+def _run(service, definition, source_table, name="result"):
+    return service.execute_pipeline_on_table(
+        definition.id, USER_ID, name, source_table_id=source_table.id
+    )
+
+
+def _assert_matches_full_run(service, storage_engine, definition, source_table, refreshed):
+    # 清除缓存，保证重新执行而不是复用刚更新的结果表
+    service.result_cache.invalidate(definition.id)
+    rerun = _run(service, definition, source_table, f"rerun_{uuid.uuid4().hex}")
+    expected = _read(service.db, storage_engine, rerun)
+    pd.testing.assert_frame_equal(
+        _read(service.db, storage_engine, refreshed), expected, check_exact=False
+    )
+    assert refreshed.row_count == rerun.row_count == len(expected)
+    assert [col.name for col in refreshed.columns] == [col.name for col in rerun.columns]
+    assert [block.start_row for block in _blocks(service.db, refreshed)] == \
+        [block.start_row for block in _blocks(service.db, rerun)]
+
+
+def _refresh(service, definition, result):
+    return service.refresh_pipeline_result(definition.id, USER_ID, result.id)
+
+
+def test_refresh_without_changes_keeps_result(service, source):
+    source_table, _ = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS)
+    result = _run(service, definition, source_table)
+    before = [block.id for block in _blocks(service.db, result)]
+
+    refreshed = _refresh(service, definition, result)
+    assert refreshed.metadata["pipeline_run"]["processed_blocks"] == 4
+    assert [block.id for block in _blocks(service.db, refreshed)] == before
+
+
+def test_refresh_changed_block(service, storage_engine, source):
+    source_table, blocks = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS)
+    result = _run(service, definition, source_table)
+    kept = _blocks(service.db, result)
+
+    TableMutator(service.db, storage_engine).upsert(
+        source_table, blocks, pd.DataFrame({"id": [120, 121], "score": [99.0, 1.0]})
+    )
+    refreshed = _refresh(service, definition, result)
+
+    assert refreshed.metadata["pipeline_run"]["processed_blocks"] == 1
+    # 块0、3的结果数据块保持不动
+    current = {block.id for block in _blocks(service.db, refreshed)}
+    assert {kept[0].id, kept[-1].id} <= current
+    _assert_matches_full_run(service, storage_engine, definition, source_table, refreshed)
+
+
+def test_refresh_appended_blocks(service, storage_engine, source):
+    source_table, blocks = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS)
+    result = _run(service, definition, source_table)
+
+    TableMutator(service.db, storage_engine, block_rows=40).append(
+        source_table, blocks, [_data(200, 280)]
+    )
+    refreshed = _refresh(service, definition, result)
+
+    assert refreshed.metadata["pipeline_run"]["processed_blocks"] == 2
+    _assert_matches_full_run(service, storage_engine, definition, source_table, refreshed)
+
+
+def test_refresh_deleted_block(service, storage_engine, source):
+    source_table, blocks = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS)
+    result = _run(service, definition, source_table)
+
+    # 删除块2，其余数据块保留并前移
+    TableMutator(service.db, storage_engine).rebuild(
+        source_table, blocks, [blocks[0], blocks[1], blocks[3]]
+    )
+    refreshed = _refresh(service, definition, result)
+
+    assert refreshed.metadata["pipeline_run"]["processed_blocks"] == 0
+    assert len(refreshed.metadata["pipeline_run"]["blocks"]) == 3
+    _assert_matches_full_run(service, storage_engine, definition, source_table, refreshed)
+
+
+def test_refresh_after_pipeline_change(service, storage_engine, source):
+    source_table, _ = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS)
+    result = _run(service, definition, source_table)
+
+    steps = [{"type": "filter", "params": {"where": "score > 50"}}] + ROW_STEPS[1:]
+    service.update_pipeline(
+        definition.id, DataPipeline(name="refresh", table_id=source_table.id, steps=steps), USER_ID
+    )
+    refreshed = _refresh(service, definition, result)
+
+    assert refreshed.metadata["pipeline_run"]["processed_blocks"] == 4
+    assert (_read(service.db, storage_engine, refreshed)["score"] > 50).all()
+    _assert_matches_full_run(service, storage_engine, definition, source_table, refreshed)
+
+
+def test_refresh_with_full_scan_step_reruns_all_blocks(service, storage_engine, source):
+    source_table, blocks = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS + [SCALE_STEP])
+    result = _run(service, definition, source_table)
+    assert result.metadata["pipeline_run"]["full_scan_steps"] == ["score_std"]
+
+    TableMutator(service.db, storage_engine).append(source_table, blocks, [_data(200, 250)])
+    refreshed = _refresh(service, definition, result)
+
+    # 新数据改变了全局标准化的均值和标准差，所有数据块都重新处理
+    assert refreshed.metadata["pipeline_run"]["processed_blocks"] == 5
+    _assert_matches_full_run(service, storage_engine, definition, source_table, refreshed)
+
+
+def test_refresh_rejects_unrelated_table(service, source):
+    source_table, _ = source
+    definition = _create_pipeline(service.db, source_table, ROW_STEPS)
+    with pytest.raises(ValueError):
+        service.refresh_pipeline_result(definition.id, USER_ID, source_table.id)
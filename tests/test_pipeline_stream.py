@@ -0,0 +1,80 @@
+"""
+数据处理管道流式执行测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pipeline = pytest.importorskip("backend.services.data.pipeline")
+
+from backend.services.data.pipeline_plan import ValidationReport, compile_pipeline  # noqa: E402
+from backend.services.data.pipeline_stream import (  # noqa: E402
+    PipelineStreamer, QUARANTINE_COLUMN, SOURCE_ROW_COLUMN
+)
+from backend.services.data.storage import DataPipeline  # noqa: E402
+
+
+def _plan(steps, pipeline_id):
+    definition = DataPipeline(id=pipeline_id, name="test", table_id=1, steps=steps)
+    return compile_pipeline(definition, pipeline.DataValidator(), pipeline.DataTransformer())
+
+
+def _validate(table_id, column, rule_type, message, **params):
+    return {"type": "validate", "params": {
+        "table_id": table_id, "column_name": column, "rule_type": rule_type,
+        "rule_params": params, "error_message": message,
+    }}
+
+
+def test_quarantine_includes_duplicates_across_blocks():
+    plan = _plan([
+        _validate(1, "k", "unique", "k重复"),
+        _validate(1, "v", "range", "v超出范围", min_val=0, max_val=10),
+    ], 9001)
+    data = pd.DataFrame({"k": [1, 2, 3, 1, 2, 5, 5, 3, 9, 1],
+                         "v": [1, 1, 1, 1, 50, 1, 1, 1, 1, 1]})
+
+    def source():
+        return (data.iloc[start:start + 4].copy() for start in range(0, len(data), 4))
+
+    report = ValidationReport()
+    rows = pd.concat(list(PipelineStreamer(plan, 1).validate(source, report, quarantine=True)))
+    rows = rows.set_index(SOURCE_ROW_COLUMN).sort_index()
+
+    rules = report.to_dict()["rules"]
+    # 块内重复（行3、6）和跨块重复（行4、7、9）
+    assert rules[0]["failed"] == 5
+    assert rules[1]["failed"] == 1
+    assert list(rows.index) == [3, 4, 6, 7, 9]
+    assert all("k重复" in errors for errors in rows[QUARANTINE_COLUMN])
+    assert "v超出范围" in rows.loc[4, QUARANTINE_COLUMN]
+    assert len(rows) == max(rule["failed"] for rule in rules)
+
+
+def test_streamed_result_matches_whole_table():
+    rng = np.random.default_rng(7)
+    data = pd.DataFrame({
+        "a": rng.normal(100, 15, 1000),
+        "b": rng.uniform(0, 50, 1000),
+        "code": rng.integers(0, 1000, 1000).astype(str),
+    })
+    plan = _plan([
+        {"type": "transform", "params": {
+            "table_id": 1, "name": "code_int", "transform_type": "type",
+            "source_columns": ["code"], "target_columns": ["code_int"],
+            "transform_params": {"target_type": "int"},
+        }},
+        {"type": "transform", "params": {
+            "table_id": 1, "name": "a_std", "transform_type": "scale",
+            "source_columns": ["a"], "target_columns": ["a_std"],
+            "transform_params": {"method": "standard"},
+        }},
+        _validate(1, "b", "range", "b超出范围", min_val=0, max_val=50),
+    ], 9002)
+
+    def source():
+        return (data.iloc[start:start + 128].copy() for start in range(0, len(data), 128))
+
+    streamed = pd.concat(list(PipelineStreamer(plan, 1).run(source)))
+    pd.testing.assert_frame_equal(streamed, plan.execute(data), check_exact=False)
@@ -0,0 +1,122 @@
+"""
+数据剖析模块测试
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.data.profiling import (
+    ColumnProfile, MomentsAccumulator, QuantileSketch, TableProfiler
+)
+
+
+def test_profile_with_infinite_values():
+    """CSV中的inf被解析为浮点无穷，剖析时不应失败"""
+    df = pd.read_csv(io.StringIO("a,b\n1,x\ninf,y\n2,z\n-inf,w\n"))
+    statistics = TableProfiler.profile(df).to_statistics()["a"]
+
+    assert statistics["count"] == 4
+    assert statistics["infinite_count"] == 2
+    # 取值范围包含无穷，按块统计跳过数据块时不会漏掉这些行
+    assert statistics["min"] == -np.inf
+    assert statistics["max"] == np.inf
+    # 均值、方差和直方图只统计有限值
+    assert statistics["mean"] == pytest.approx(1.5)
+    assert statistics["variance"] == pytest.approx(0.5)
+    assert sum(count for _, count in statistics["histogram"]) == 2
+
+
+def test_profile_all_nan_column():
+    df = pd.DataFrame({"a": [np.nan, np.nan], "b": [1.0, 2.0]})
+    statistics = TableProfiler.profile(df).to_statistics()["a"]
+
+    assert statistics["count"] == 0
+    assert statistics["null_count"] == 2
+    assert statistics["mean"] is None
+    assert statistics["histogram"] == []
+
+
+def test_profile_only_infinite_values():
+    statistics = TableProfiler.profile(pd.DataFrame({"a": [np.inf, np.inf]})).to_statistics()["a"]
+
+    assert statistics["infinite_count"] == 2
+    assert statistics["mean"] is None
+    assert statistics["histogram"] == []
+
+
+def test_merged_profiles_match_single_profile():
+    rng = np.random.default_rng(0)
+    values = pd.Series(np.append(rng.normal(size=1000), [np.inf, np.nan]))
+    whole = ColumnProfile()
+    whole.update(values)
+    merged = ColumnProfile()
+    for part in (values.iloc[:400], values.iloc[400:]):
+        profile = ColumnProfile()
+        profile.update(part)
+        merged.merge(ColumnProfile.from_dict(profile.to_dict()))
+
+    expected, actual = whole.to_dict(), merged.to_dict()
+    for key in ("count", "null_count", "infinite_count", "min", "max"):
+        assert actual[key] == expected[key]
+    assert actual["mean"] == pytest.approx(expected["mean"])
+    assert actual["variance"] == pytest.approx(expected["variance"])
+
+
+def test_moments_ignore_infinite_values():
+    moments = MomentsAccumulator()
+    moments.update(np.array([1.0, np.inf, 3.0, -np.inf]))
+
+    assert moments.count == 2
+    assert moments.mean == pytest.approx(2.0)
+    assert (moments.min, moments.max) == (1.0, 3.0)
+
+
+QS = [0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99]
+
+
+def _rank_errors(sketch, values):
+    ordered = np.sort(values)
+    estimates = sketch.quantiles(QS)
+    ranks = np.searchsorted(ordered, estimates, side="right") / len(ordered)
+    return np.abs(ranks - np.asarray(QS))
+
+
+def test_sketch_rank_error_within_bound():
+    values = np.random.default_rng(3).lognormal(size=200_000)
+    sketch = QuantileSketch(seed=1)
+    for start in range(0, len(values), 7_000):
+        sketch.update(values[start:start + 7_000])
+    assert sketch.count == len(values)
+    assert _rank_errors(sketch, values).max() < 0.0165
+
+
+def test_sketch_merge_with_different_seeds():
+    values = np.random.default_rng(4).normal(size=100_000)
+    parts = []
+    for seed, chunk in enumerate(np.array_split(values, 8)):
+        part = QuantileSketch(seed=seed)
+        part.update(chunk)
+        parts.append(part)
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(part)
+    assert merged.count == len(values)
+    assert _rank_errors(merged, values).max() < 0.0165
+
+
+def test_sketch_round_trip():
+    sketch = QuantileSketch(seed=5)
+    sketch.update(np.arange(50_000, dtype=np.float64))
+    restored = QuantileSketch.from_dict(sketch.to_dict())
+    assert restored.count == sketch.count
+    np.testing.assert_array_equal(restored.quantiles(QS), sketch.quantiles(QS))
+
+
+def test_empty_sketch():
+    sketch = QuantileSketch()
+    sketch.update(np.empty(0))
+    assert sketch.count == 0
+    assert np.isnan(sketch.quantiles([0.5])).all()
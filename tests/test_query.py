@@ -0,0 +1,154 @@
+"""
+数据表查询测试
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.services.data.filters import FilterSyntaxError
+from backend.services.data.models import TableQuery
+from backend.services.data.query import TableQueryEngine, parse_sql
+
+
+def _data(seed=3, rows=500):
+    rng = np.random.default_rng(seed)
+    gdp = rng.uniform(0, 1000, rows)
+    gdp[rng.random(rows) < 0.1] = np.nan
+    return pd.DataFrame({
+        "region": rng.choice(["华东", "华北", "西南", "东北"], rows),
+        "year": rng.integers(1990, 2020, rows),
+        "gdp": gdp,
+    })
+
+
+def _chunks(data, sizes):
+    bounds = np.cumsum([0] + list(sizes))
+    return [data.iloc[start:end].reset_index(drop=True) for start, end in zip(bounds, bounds[1:])]
+
+
+def _run(storage_engine, table, blocks, sql):
+    return list(TableQueryEngine(storage_engine).execute(table, blocks, TableQuery(sql=sql)).rows)
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t", {"select": [], "where": None, "group_by": [], "limit": None}),
+    ("select region, sum(gdp) AS total from t group by region order by total desc limit 5;", {
+        "select": ["region", "sum(gdp) AS total"],
+        "group_by": ["region"],
+        "order_by": [{"column": "total", "order": "desc"}],
+        "limit": 5,
+    }),
+    # 引号和括号中的逗号、关键字不切分子句
+    ("SELECT name WHERE name IN ('a, b', 'LIMIT 1') AND (gdp > 1 OR gdp < 0)", {
+        "select": ["name"],
+        "where": "name IN ('a, b', 'LIMIT 1') AND (gdp > 1 OR gdp < 0)",
+    }),
+    ('SELECT "order", count(*) GROUP BY "order" ORDER BY "order"', {
+        "select": ['"order"', "count(*)"],
+        "group_by": ["order"],
+        "order_by": [{"column": "order", "order": "asc"}],
+    }),
+])
+def test_parse_sql(sql, expected):
+    query = parse_sql(sql)
+    for field, value in expected.items():
+        assert getattr(query, field) == value, field
+
+
+@pytest.mark.parametrize("sql", [
+    "region FROM t",
+    "FROM t SELECT region",
+    "SELECT region WHERE gdp > 1 WHERE gdp < 2",
+    "SELECT region ORDER BY region GROUP BY region",
+    "SELECT region LIMIT -1",
+    "SELECT region ORDER BY region sideways",
+])
+def test_parse_sql_syntax_errors(sql):
+    with pytest.raises(FilterSyntaxError):
+        parse_sql(sql)
+
+
+def test_grouped_aggregates_match_pandas(make_table, storage_engine):
+    data = _data()
+    table, blocks = make_table(_chunks(data, [120, 80, 200, 100]))
+    rows = _run(storage_engine, table, blocks, (
+        "SELECT region, count(*) AS n, count(gdp) AS n_gdp, sum(gdp) AS total, avg(gdp) AS mean, "
+        "min(year) AS first, max(gdp) AS top GROUP BY region ORDER BY region"
+    ))
+
+    grouped = data.groupby("region")
+    expected = pd.DataFrame({
+        "n": grouped.size(),
+        "n_gdp": grouped["gdp"].count(),
+        "total": grouped["gdp"].sum(),
+        "mean": grouped["gdp"].mean(),
+        "first": grouped["year"].min(),
+        "top": grouped["gdp"].max(),
+    }).reset_index().sort_values("region")
+
+    assert [row["region"] for row in rows] == expected["region"].tolist()
+    for row, (_, want) in zip(rows, expected.iterrows()):
+        assert row["n"] == want["n"] and row["n_gdp"] == want["n_gdp"]
+        assert row["first"] == want["first"]
+        assert row["total"] == pytest.approx(want["total"])
+        assert row["mean"] == pytest.approx(want["mean"])
+        assert row["top"] == pytest.approx(want["top"])
+
+
+def test_group_by_only_returns_distinct_groups(make_table, storage_engine):
+    data = _data()
+    table, blocks = make_table(_chunks(data, [250, 250]))
+    rows = _run(storage_engine, table, blocks,
+                "SELECT region, year WHERE gdp > 500 GROUP BY region, year")
+
+    matched = data[data["gdp"] > 500]
+    expected = set(zip(matched["region"], matched["year"].tolist()))
+    assert len(rows) == len(expected)
+    assert {(row["region"], row["year"]) for row in rows} == expected
+
+
+def test_statistics_fast_path_matches_scan(make_table, storage_engine, monkeypatch):
+    data = _data()
+    table, blocks = make_table(_chunks(data, [150, 150, 200]))
+    select = ("SELECT count(*), count(gdp), min(year), max(year), min(gdp), max(gdp)")
+    # 条件对所有行成立，但有过滤时必须扫描数据
+    scanned = _run(storage_engine, table, blocks, select + " WHERE year > -1")
+
+    def no_scan(*args, **kwargs):
+        raise AssertionError("统计可以回答的查询不应扫描数据块")
+
+    monkeypatch.setattr(storage_engine, "scan_block", no_scan)
+    from_statistics = _run(storage_engine, table, blocks, select)
+
+    assert from_statistics == scanned
+    assert type(from_statistics[0]["min(year)"]) is int
+    assert from_statistics[0]["count(*)"] == len(data)
+
+
+def test_statistics_fast_path_skips_non_numeric_columns(make_table, storage_engine):
+    # 第二块中code为字符串，整列被放宽为字符串类型
+    chunks = [
+        pd.DataFrame({"code": [5, 12, 40], "name": ["b", "a", "c"]}),
+        pd.DataFrame({"code": ["7", "100"], "name": ["z", "y"]}),
+    ]
+    table, blocks = make_table(chunks)
+    rows = _run(storage_engine, table, blocks, "SELECT min(code), max(code), min(name), max(name)")
+    scanned = _run(storage_engine, table, blocks,
+                   "SELECT min(code), max(code), min(name), max(name) WHERE name IS NOT NULL")
+    assert rows == scanned
+    # code声明为字符串，按字符串比较
+    assert rows[0] == {"min(code)": "100", "max(code)": "7", "min(name)": "a", "max(name)": "z"}
+
+
+def test_limit_zero_on_statistics(make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(), [500]))
+    assert _run(storage_engine, table, blocks, "SELECT count(*) LIMIT 0") == []
+
+
+def test_literal_type_errors_raise_before_scanning(make_table, storage_engine):
+    table, blocks = make_table(_chunks(_data(), [500]))
+    with pytest.raises(ValueError):
+        TableQueryEngine(storage_engine).execute(
+            table, blocks, TableQuery(sql="SELECT region WHERE gdp > 'abc'")
+        )
@@ -0,0 +1,86 @@
+"""
+管道调度配置测试
+"""
+
+from datetime import datetime
+
+import pytest
+
+from backend.services.data.schedule import CronSchedule, PipelineSchedule
+
+
+@pytest.mark.parametrize("expression, moment, expected", [
+    ("0 3 * * *", datetime(2026, 1, 1, 3, 0), datetime(2026, 1, 2, 3, 0)),
+    ("0 3 * * *", datetime(2026, 1, 1, 2, 59, 30), datetime(2026, 1, 1, 3, 0)),
+    # 周五收盘后到下周一
+    ("*/15 9-17 * * 1-5", datetime(2026, 10, 16, 17, 50), datetime(2026, 10, 19, 9, 0)),
+    # 跨年，星期中的7表示周日
+    ("0 0 1 1 7", datetime(2026, 12, 31, 12, 0), datetime(2027, 1, 1)),
+    # 闰年2月29日
+    ("30 2 29 2 *", datetime(2026, 3, 1), datetime(2028, 2, 29, 2, 30)),
+    ("5,35 */6 * * *", datetime(2026, 5, 1, 6, 5), datetime(2026, 5, 1, 6, 35)),
+])
+def test_cron_next_after(expression, moment, expected):
+    assert CronSchedule(expression).next_after(moment) == expected
+
+
+def test_cron_day_and_weekday_or_when_both_restricted():
+    # 13日或周五
+    cron = CronSchedule("0 0 13 * 5")
+    assert cron.next_after(datetime(2026, 10, 13, 0, 0)) == datetime(2026, 10, 16)
+
+
+def test_cron_stepped_day_is_unrestricted():
+    # */2 以*开头，与星期取交集：奇数日且为周一
+    cron = CronSchedule("0 0 */2 * 1")
+    moment = datetime(2026, 10, 1)
+    for _ in range(10):
+        moment = cron.next_after(moment)
+        assert moment.day % 2 == 1 and moment.weekday() == 0
+
+
+@pytest.mark.parametrize("expression", [
+    "* * *", "61 * * * *", "*/0 * * * *", "a * * * *", "5-1 * * * *", "* * * 13 *",
+])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronSchedule(expression)
+
+
+def test_cron_without_any_run_time():
+    with pytest.raises(ValueError):
+        CronSchedule("0 0 30 2 *").next_after(datetime(2026, 1, 1))
+
+
+def test_schedule_timezone():
+    schedule = PipelineSchedule({"cron": "0 3 * * *", "timezone": "Asia/Shanghai"})
+    assert schedule.next_run(datetime(2026, 1, 1, 0, 0)) == datetime(2026, 1, 1, 19, 0)
+
+
+def test_schedule_windows():
+    quiet = PipelineSchedule({"interval": 3600, "quiet_hours": True, "timezone": "UTC"})
+    assert quiet.in_window(datetime(2026, 1, 1, 2)) and not quiet.in_window(datetime(2026, 1, 1, 7))
+
+    overnight = PipelineSchedule({"interval": 3600, "window": "22:00-02:00", "timezone": "UTC"})
+    assert overnight.in_window(datetime(2026, 1, 1, 23))
+    assert overnight.in_window(datetime(2026, 1, 1, 1))
+    assert not overnight.in_window(datetime(2026, 1, 1, 12))
+
+
+@pytest.mark.parametrize("config", [
+    {},
+    {"cron": "0 * * * *", "interval": 60},
+    {"interval": 5},
+    {"interval": 60, "window": "x"},
+    {"interval": 60, "timezone": "Mars/Olympus"},
+])
+def test_schedule_rejects_invalid_config(config):
+    with pytest.raises(ValueError):
+        PipelineSchedule(config)
+
+
+def test_check_schedule_rejects_cron_without_run_time():
+    pipeline = pytest.importorskip("backend.services.data.pipeline")
+    with pytest.raises(ValueError):
+        pipeline._check_schedule({"cron": "0 0 30 2 *"}, 1)
+    assert pipeline._check_schedule({"interval": 3600}, 7)["user_id"] == 7